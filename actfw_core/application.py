@@ -2,11 +2,19 @@ import json
 import os
 import signal
 import sys
+import threading
 import time
 from types import FrameType
-from typing import Any, Dict, Iterable, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Set
 
+from actfw_core.flight_recorder import get_flight_recorder
+from actfw_core.supervisor import RestartPolicy, _restart, _Supervised
 from actfw_core.task import Task
+from actfw_core.task.consumer import _ConsumerMixin
+from actfw_core.task.producer import _ProducerMixin
+from actfw_core.task.scheduler import _CooperativeScheduler
+from actfw_core.task_stats import TaskSample, TaskStatsSampler
+from actfw_core.trace import enable_tracing, get_tracer
 
 
 class SettingSchema:
@@ -90,6 +98,11 @@ class Application:
     running: bool
     tasks: List[Task]
     settings: Optional[Dict[str, Any]]
+    task_stats_sampler: Optional[TaskStatsSampler]
+    trace_path: Optional[str]
+    flight_recorder_path: Optional[str]
+    stall_threshold: Optional[float]
+    supervised: Dict[int, _Supervised]
 
     """Actcast Application"""
 
@@ -102,6 +115,12 @@ class Application:
             signal.signal(sig, self._handler)  # type: ignore[arg-type]
         self.tasks = []
         self.settings = None
+        self.task_stats_sampler = None
+        self.trace_path = None
+        self.flight_recorder_path = None
+        self.stall_threshold = None
+        self.supervised = {}
+        self._wake = threading.Event()
         env = "ACT_SETTINGS_PATH"
         if env in os.environ:
             try:
@@ -147,26 +166,247 @@ class Application:
             self.schema = json.load(f, object_hook=SettingSchema.decoder)["properties"]
         return AppSettings(self.get_settings({}), self.schema)
 
-    def register_task(self, task: Task) -> None:
+    def register_task(
+        self,
+        task: Task,
+        affinity: Optional[Iterable[int]] = None,
+        nice: Optional[int] = None,
+        restart: Optional[RestartPolicy] = None,
+    ) -> None:
         """
 
         Register the application task.
 
         Args:
             task (:class:`~actfw_core.task.Task`): task
+            affinity (iterable of int, optional): CPUs the task's thread may run on
+            nice (int, optional): nice value of the task's thread
+            restart (:class:`~actfw_core.supervisor.RestartPolicy`, optional): restart the task when it exits (e.g. by an exception)
+
+        Notes:
+            See :meth:`~actfw_core.task.Task.set_scheduling`.
+            In the cooperative mode, they are applied only to tasks running in their own threads,
+            and tasks are not restarted.
+
         """
         if not issubclass(type(task), Task):
             raise TypeError("type(task) must be a subclass of actfw_core.task.Task.")
+        if affinity is not None or nice is not None:
+            task.set_scheduling(affinity, nice)
+        if restart is not None:
+            self.supervised[id(task)] = _Supervised(restart)
         self.tasks.append(task)
 
-    def run(self) -> None:
-        """Start application"""
+    def enable_task_stats(self, interval: float = 1.0, history: int = 3600) -> None:
+        """
+
+        Sample per-task CPU usage, context switches and process RSS while the application runs.
+
+        Args:
+            interval (float): sampling interval [sec]
+            history (int): number of samples kept for each task
+
+        Notes:
+            Tasks stepped in the cooperative mode share the thread calling `run` and are not sampled.
+
+        """
+        self.task_stats_sampler = TaskStatsSampler(lambda: self.tasks, interval, history)
+
+    def get_task_stats(self, task: Optional[str] = None) -> List[TaskSample]:
+        """
+
+        Get the samples taken since `enable_task_stats`.
+
+        Args:
+            task (str, optional): class name of the tasks to get samples of (default: all tasks)
+
+        Returns:
+            list of :class:`~actfw_core.task_stats.TaskSample`: samples in time order
+
+        """
+        if self.task_stats_sampler is None:
+            raise RuntimeError("task stats are not enabled. Call enable_task_stats() first.")
+        return self.task_stats_sampler.get_samples(task)
+
+    def dump_task_stats(self, path: str, format: Optional[str] = None) -> None:
+        """
+
+        Write the samples taken since `enable_task_stats` to a file.
+
+        Args:
+            path (str): output file path
+            format (str, optional): 'csv' or 'json' (default: inferred from the extension of `path`)
+
+        """
+        if self.task_stats_sampler is None:
+            raise RuntimeError("task stats are not enabled. Call enable_task_stats() first.")
+        self.task_stats_sampler.dump(path, format)
+
+    def enable_tracing(self, path: Optional[str] = None, capacity: int = 65536) -> None:
+        """
+
+        Record spans of each frame at every stage (capture, pads and `proc` of tasks).
+
+        Args:
+            path (str, optional): file to write the spans to as Chrome trace event JSON when `run` finishes
+            capacity (int): maximum number of spans kept
+
+        Notes:
+            The spans can also be written on demand with `actfw_core.trace.get_tracer().write_chrome_trace(path)`.
+
+        """
+        enable_tracing(capacity)
+        self.trace_path = path
+
+    def configure_flight_recorder(self, path: Optional[str] = None, stall_threshold: Optional[float] = None) -> None:
+        """
+
+        Configure when and where the flight recorder is dumped.
+
+        The flight recorder (see :mod:`actfw_core.flight_recorder`) always keeps recent frame timings,
+        V4L2 control writes and task state transitions. It is dumped with the pad fill levels
+        when a task exits with an exception, and when a task has not received or sent an item for `stall_threshold` seconds
+        although an input is waiting for it (for a task without inputs, although its outputs have been taken).
+
+        Args:
+            path (str, optional): file to append dumps to (default: stderr)
+            stall_threshold (float, optional): stall detection threshold [sec] (default: no stall detection)
+
+        Notes:
+            The stall detection is not performed in the cooperative mode.
+
+        """
+        self.flight_recorder_path = path
+        self.stall_threshold = stall_threshold
+
+    def _dump_flight_recorder(self, reason: str) -> None:
+        recorder = get_flight_recorder()
+        if self.flight_recorder_path is None:
+            recorder.dump(reason, self.tasks)
+        else:
+            with open(self.flight_recorder_path, "a") as f:
+                recorder.dump(reason, self.tasks, f)
+
+    def _excepthook(self, args: "threading.ExceptHookArgs") -> None:
+        name = args.thread.name if args.thread is not None else "unknown thread"
+        get_flight_recorder().record("task", f"{name} crashed: {args.exc_type.__name__}: {args.exc_value}")
+        self._dump_flight_recorder(f"{name} crashed")
+        # let the supervisor handle it now
+        self._wake.set()
+
+    def _stalled_tasks(self) -> List[Task]:
+        if self.stall_threshold is None:
+            return []
+        now = time.monotonic()
+        stalled = []
+        for task in self.tasks:
+            if now - task.last_progress <= self.stall_threshold:
+                continue
+            in_queues = task.in_queues if isinstance(task, _ConsumerMixin) else []
+            out_queues = task.out_queues if isinstance(task, _ProducerMixin) else []
+            if len(in_queues) == 0 and len(out_queues) == 0:
+                # not connected to the pipeline
+                continue
+            if len(in_queues) > 0 and all(q.empty() for q in in_queues):
+                # waiting for its inputs
+                continue
+            if any(q.qsize() > 0 for q in out_queues):
+                # waiting for its followers
+                continue
+            stalled.append(task)
+        return stalled
+
+    def _supervise(self) -> None:
+        now = time.monotonic()
+        for n, task in enumerate(self.tasks):
+            supervised = self.supervised.get(id(task))
+            # exited without being stopped
+            if supervised is None or task.ident is None or task.is_alive() or not task.running:
+                continue
+            if supervised.failed_at is None:
+                supervised.failed_at = now
+                if supervised.restarts >= supervised.policy.max_restarts:
+                    message = f"{task.name} exited {supervised.restarts + 1} times. Stopping the application."
+                    print(message, file=sys.stderr, flush=True)
+                    get_flight_recorder().record("task", message)
+                    self.stop()
+                    return
+            restart_at = supervised.restart_at()
+            if restart_at is not None and restart_at <= now:
+                new = _restart(task, supervised.policy.factory)
+                get_flight_recorder().record("task", f"{task.name} restarted as {new.name}")
+                self.tasks[n] = new
+                supervised.restarts += 1
+                supervised.failed_at = None
+                del self.supervised[id(task)]
+                self.supervised[id(new)] = supervised
+
+    def _wait_timeout(self) -> float:
+        timeout = 1.0
+        now = time.monotonic()
+        for supervised in self.supervised.values():
+            restart_at = supervised.restart_at()
+            if restart_at is not None:
+                timeout = min(timeout, max(0.0, restart_at - now))
+        return timeout
+
+    def run(self, cooperative: bool = False) -> None:
+        """
+
+        Start application
+
+        Args:
+            cooperative (bool): run the registered tasks cooperatively in the calling thread instead of one thread per task.
+                Producers, Pipes, Consumers, Tees and Joins are stepped in dependency order;
+                tasks overriding `run` (e.g. capture producers) still run in their own threads.
+                This reduces context switches on devices with few cores.
+
+        """
+        if self.task_stats_sampler is not None:
+            self.task_stats_sampler.start()
+        excepthook = threading.excepthook
+
+        def hook(args: "threading.ExceptHookArgs") -> None:
+            self._excepthook(args)
+            excepthook(args)
+
+        threading.excepthook = hook
+        try:
+            self._run(cooperative)
+        finally:
+            threading.excepthook = excepthook
+            if self.task_stats_sampler is not None:
+                self.task_stats_sampler.stop()
+            tracer = get_tracer()
+            if self.trace_path is not None and tracer is not None:
+                tracer.write_chrome_trace(self.trace_path)
+
+    def _run(self, cooperative: bool) -> None:
+        if cooperative:
+            try:
+                _CooperativeScheduler(self.tasks).run(lambda: self.running)
+            except KeyboardInterrupt:
+                pass
+            return
+
         for task in self.tasks:
             task.start()
 
+        # tasks already reported as stalled, to dump once per stall
+        stalled: Set[int] = set()
         try:
             while self.running:
-                time.sleep(1)
+                self._wake.wait(self._wait_timeout())
+                self._wake.clear()
+                if not self.running:
+                    break
+                self._supervise()
+                stalled_tasks = self._stalled_tasks()
+                newly_stalled = [task for task in stalled_tasks if id(task) not in stalled]
+                if len(newly_stalled) > 0:
+                    names = ", ".join(task.name for task in newly_stalled)
+                    self._dump_flight_recorder(f"no progress for {self.stall_threshold} sec: {names}")
+                stalled = {id(task) for task in stalled_tasks}
         except KeyboardInterrupt:
             pass
 
@@ -178,3 +418,4 @@ class Application:
     def stop(self) -> None:
         """Stop application"""
         self.running = False
+        self._wake.set()
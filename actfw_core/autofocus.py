@@ -1,7 +1,11 @@
+import warnings
 from abc import ABCMeta, abstractmethod
+from ctypes import string_at
 from enum import Enum
+from operator import mul
 from typing import Any, Callable, Dict, List, Optional, Tuple
 
+from actfw_core.isp_stats import IspStatsView
 from actfw_core.v4l2.types import bcm2835_isp_stats
 from actfw_core.v4l2.video import VideoBuffer  # type: ignore
 
@@ -227,11 +231,56 @@ class PdafData:
 
 
 class PdafRegions:
-    def __init__(self, height: int, width: int) -> None:
+    """PDAF confidence and phase of the regions, in parallel row-major arrays."""
+
+    def __init__(self, height: int, width: int, conf: Optional[List[int]] = None, phase: Optional[List[int]] = None) -> None:
         self.height = height
         self.width = width
-        self.pdaf_grid = [[PdafData(0, 0) for _ in range(width)] for _ in range(height)]
         self.numRegions = height * width
+        self.conf = conf if conf is not None else [0] * self.numRegions
+        self.phase = phase if phase is not None else [0] * self.numRegions
+
+    @property
+    def pdaf_grid(self) -> List[List[PdafData]]:
+        """
+        Regions as a grid of :class:`PdafData`, built on every access.
+
+        Deprecated: use `conf` and `phase`. The confidence and phase of the cells are read from and written to them.
+        """
+        warnings.warn("PdafRegions.pdaf_grid is deprecated. Use conf and phase.", DeprecationWarning, stacklevel=2)
+        return [[_PdafRegion(self, r * self.width + c) for c in range(self.width)] for r in range(self.height)]
+
+    @pdaf_grid.setter
+    def pdaf_grid(self, grid: List[List[PdafData]]) -> None:
+        warnings.warn("PdafRegions.pdaf_grid is deprecated. Use conf and phase.", DeprecationWarning, stacklevel=2)
+        for r, row in enumerate(grid):
+            for c, data in enumerate(row):
+                self.conf[r * self.width + c] = data.conf
+                self.phase[r * self.width + c] = data.phase
+
+
+class _PdafRegion(PdafData):
+    """Cell of `PdafRegions.pdaf_grid`, reading and writing the arrays of the regions."""
+
+    def __init__(self, regions: PdafRegions, index: int) -> None:
+        self.regions = regions
+        self.index = index
+
+    @property
+    def conf(self) -> int:
+        return self.regions.conf[self.index]
+
+    @conf.setter
+    def conf(self, conf: int) -> None:
+        self.regions.conf[self.index] = conf
+
+    @property
+    def phase(self) -> int:
+        return self.regions.phase[self.index]
+
+    @phase.setter
+    def phase(self, phase: int) -> None:
+        self.regions.phase[self.index] = phase
 
 
 class ScanRecord:
@@ -248,6 +297,8 @@ class RegionWeights:
         self.cols = cols
         self.sum = 0.0
         self.w = [0.0] * rows * cols
+        # (index, weight) of the regions with non-zero weight
+        self.nonzero: List[Tuple[int, float]] = []
 
 
 class AutoFocuserBase(metaclass=ABCMeta):
@@ -497,6 +548,7 @@ class AutoFocuserBase(metaclass=ABCMeta):
                 for c in range(cols // 4, cols - cols // 4):
                     weights.w[r * cols + c] = 1
                     weights.sum += 1
+        weights.nonzero = [(i, w) for (i, w) in enumerate(weights.w) if w != 0]
 
     def __invalidate_weights(self) -> None:
         self.phaseWeights.sum = 0
@@ -506,20 +558,20 @@ class AutoFocuserBase(metaclass=ABCMeta):
         if regions.height != self.phaseWeights.rows or regions.width != self.phaseWeights.cols or self.phaseWeights.sum == 0:
             self.__compute_weights(self.phaseWeights, regions.height, regions.width)
 
+        # one pass over the weighted regions only
+        conf_thresh = self.cfg.confThresh
+        conf_clip = self.cfg.confClip
+        conf_offset = conf_thresh >> 2
+        confs = regions.conf
+        phases = regions.phase
         sumWc = 0
         sumWcp = 0
-        for i in range(regions.numRegions):
-            w = self.phaseWeights.w[i]
-            if w != 0:
-                data = regions.pdaf_grid[i // PDAF_STATS_COLS][i % PDAF_STATS_COLS]
-                c = data.conf
-                if c >= self.cfg.confThresh:
-                    if c > self.cfg.confClip:
-                        c = self.cfg.confClip
-                    c -= self.cfg.confThresh >> 2
-                    sumWc += int(w * c)
-                    c -= self.cfg.confThresh >> 2
-                    sumWcp += int(w * c) * int(data.phase)
+        for i, w in self.phaseWeights.nonzero:
+            c = confs[i]
+            if c >= conf_thresh:
+                c = (c if c <= conf_clip else conf_clip) - conf_offset
+                sumWc += int(w * c)
+                sumWcp += int(w * (c - conf_offset)) * phases[i]
 
         if 0 < self.phaseWeights.sum and self.phaseWeights.sum <= sumWc:
             phase = sumWcp / sumWc
@@ -561,11 +613,9 @@ class AutoFocuserBase(metaclass=ABCMeta):
     def __get_contrast(self, stats: bcm2835_isp_stats) -> float:
         if self.contrastWeights.sum == 0:
             self.__compute_weights(self.contrastWeights, CONTRAST_STATS_ROWS, CONTRAST_STATS_COLS)
-        sumWc = 0
-        for i in range(CONTRAST_STATS_ROWS * CONTRAST_STATS_COLS):
-            # https://github.com/raspberrypi/libcamera/blob/v0.3.2%2Brpt20240927/src/ipa/rpi/vc4/vc4.cpp#L245
-            val = stats.focus_stats[i].contrast_val[1][1] / 1000
-            sumWc += self.contrastWeights.w[i] * val
+        # https://github.com/raspberrypi/libcamera/blob/v0.3.2%2Brpt20240927/src/ipa/rpi/vc4/vc4.cpp#L245
+        vals = [val / 1000 for val in IspStatsView(stats).focus_contrast(1, 1)]
+        sumWc = sum(map(mul, self.contrastWeights.w, vals))
         return sumWc / self.contrastWeights.sum if self.contrastWeights.sum > 0 else 0.0
 
     def set_unicam_config(
@@ -675,20 +725,19 @@ class AutoFocuserIMX708(AutoFocuserBase):
     def parse_pdaf(self, meta_buffer: VideoBuffer) -> PdafRegions:
         # https://github.com/raspberrypi/libcamera/blob/v0.3.2%2Brpt20240927/src/ipa/rpi/cam_helper/cam_helper_imx708.cpp#L267-L293
         bpp = 10  # hardcode
-        pdaf = PdafRegions(height=PDAF_STATS_ROWS, width=PDAF_STATS_COLS)
-        ptr = meta_buffer.mapped_buf[2 * self.bytes_per_line : 3 * self.bytes_per_line]
+        ptr = string_at(meta_buffer.mapped_buf, 3 * self.bytes_per_line)[2 * self.bytes_per_line :]
         step = bpp >> 1
 
         if bpp < 10 or bpp > 14 or self.bytes_per_line < 194 * step or ptr[0] != 0 or ptr[1] >= 0x40:
             raise RuntimeError("PDAF data in unsupported format")
 
+        # the first 3 bytes of each `step` bytes hold the confidence and phase of a region
+        n = PDAF_STATS_ROWS * PDAF_STATS_COLS
         offset = 2 * step
-        for i in range(PDAF_STATS_ROWS):
-            for j in range(PDAF_STATS_COLS):
-                conf = (ptr[offset] << 3) | (ptr[offset + 1] >> 5)
-                phase = 0
-                if conf != 0:
-                    phase = (((ptr[offset + 1] & 0x0F) - (ptr[offset + 1] & 0x10)) << 6) | (ptr[offset + 2] >> 2)
-                pdaf.pdaf_grid[i][j] = PdafData(conf, phase)
-                offset += step
-        return pdaf
+        byte0 = ptr[offset : offset + n * step : step]
+        byte1 = ptr[offset + 1 : offset + 1 + n * step : step]
+        byte2 = ptr[offset + 2 : offset + 2 + n * step : step]
+        conf = [(b0 << 3) | (b1 >> 5) for (b0, b1) in zip(byte0, byte1)]
+        # the phase of a region without confidence is 0
+        phase = [((((b1 & 0x0F) - (b1 & 0x10)) << 6) | (b2 >> 2)) if c != 0 else 0 for (c, b1, b2) in zip(conf, byte1, byte2)]
+        return PdafRegions(height=PDAF_STATS_ROWS, width=PDAF_STATS_COLS, conf=conf, phase=phase)
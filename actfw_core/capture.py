@@ -1,22 +1,85 @@
 import enum
-from typing import Callable, Generic, Iterable, Tuple, TypeVar, Union
+import io
+from typing import Callable, Generic, Iterable, Optional, Tuple, TypeVar, Union
+
+from PIL import Image
+from PIL.Image import Image as PIL_Image
 
 from actfw_core.system import DeviceInfo, EnvironmentVariableNotSet, get_actcast_firmware_type
 from actfw_core.v4l2.video import V4L2_PIX_FMT, Video, VideoPort  # type: ignore
 
+from . import flight_recorder
 from .task import Producer
 from .util.pad import _PadBase, _PadDiscardingOld
 
 T = TypeVar("T")
 
+# DHT segment with the Huffman tables of ITU T.81 Annex K.3, which MJPEG frames of UVC cameras usually omit.
+_STANDARD_DHT = bytes.fromhex(
+    # marker and length
+    "ffc401a2"
+    # luminance DC
+    "0000010501010101010100000000000000000102030405060708090a0b"
+    # luminance AC
+    "100002010303020403050504040000017d01020300041105122131410613516107227114328191a1082342b1c11552d1"
+    "f02433627282090a161718191a25262728292a3435363738393a434445464748494a535455565758595a636465666768"
+    "696a737475767778797a838485868788898a92939495969798999aa2a3a4a5a6a7a8a9aab2b3b4b5b6b7b8b9bac2c3c4"
+    "c5c6c7c8c9cad2d3d4d5d6d7d8d9dae1e2e3e4e5e6e7e8e9eaf1f2f3f4f5f6f7f8f9fa"
+    # chrominance DC
+    "0100030101010101010101010000000000000102030405060708090a0b"
+    # chrominance AC
+    "1100020102040403040705040400010277000102031104052131061241510761711322328108144291a1b1c109233352"
+    "f0156272d10a162434e125f11718191a262728292a35363738393a434445464748494a535455565758595a6364656667"
+    "68696a737475767778797a82838485868788898a92939495969798999aa2a3a4a5a6a7a8a9aab2b3b4b5b6b7b8b9bac2"
+    "c3c4c5c6c7c8c9cad2d3d4d5d6d7d8d9dae2e3e4e5e6e7e8e9eaf2f3f4f5f6f7f8f9fa"
+)
+
+
+def _with_huffman_tables(data: bytes) -> bytes:
+    # Insert the standard Huffman tables before the scan of a JPEG without them.
+    i = 2
+    while i + 4 <= len(data) and data[i] == 0xFF:
+        marker = data[i + 1]
+        if marker == 0xFF:
+            # fill byte
+            i += 1
+            continue
+        if marker == 0xC4:
+            return data
+        if marker == 0xDA:
+            return data[:i] + _STANDARD_DHT + data[i:]
+        i += 2 + int.from_bytes(data[i + 2 : i + 4], "big")
+    return data
+
 
 class Frame(Generic[T]):
     value: T
+    timestamp: Optional[float]
+    sequence: Optional[int]
+    dropped: int
 
     """Captured Frame"""
 
-    def __init__(self, value: T) -> None:
+    def __init__(
+        self,
+        value: T,
+        timestamp: Optional[float] = None,
+        sequence: Optional[int] = None,
+        dropped: int = 0,
+    ) -> None:
+        """
+
+        Args:
+            value: captured data
+            timestamp (float, optional): capture timestamp [sec] on CLOCK_MONOTONIC (comparable with `time.monotonic()`)
+            sequence (int, optional): frame sequence number given by the driver
+            dropped (int): number of frames dropped by the driver just before this frame
+
+        """
         self.value = value
+        self.timestamp = timestamp
+        self.sequence = sequence
+        self.dropped = dropped
 
     def getvalue(self) -> T:
         """
@@ -29,6 +92,89 @@ class Frame(Generic[T]):
         return self.value
 
 
+COMPRESSED_FORMATS = (V4L2_PIX_FMT.MJPEG, V4L2_PIX_FMT.JPEG)
+
+
+class CompressedFrame(Frame[bytes]):
+    format: V4L2_PIX_FMT
+    size: Tuple[int, int]
+
+    """Captured Frame holding a compressed (JPEG) payload"""
+
+    def __init__(
+        self,
+        value: bytes,
+        format: V4L2_PIX_FMT,
+        size: Tuple[int, int],
+        timestamp: Optional[float] = None,
+        sequence: Optional[int] = None,
+        dropped: int = 0,
+    ) -> None:
+        super().__init__(value, timestamp, sequence, dropped)
+        self.format = format
+        self.size = size
+
+    def decode(self, reduce: int = 1, box: Optional[Tuple[int, int, int, int]] = None) -> PIL_Image:
+        """
+        Decode the compressed payload.
+
+        The standard Huffman tables are used if the payload has none, as MJPEG frames of UVC cameras usually do.
+
+        Args:
+            reduce (int): scale down factor (1, 2, 4 or 8) applied while decoding with DCT scaling
+            box ((int, int, int, int)): region (left, upper, right, lower) to crop, in the coordinates of the reduced image
+
+        Returns:
+            :class:`~PIL.Image`: decoded RGB image
+        """
+        image = Image.open(io.BytesIO(_with_huffman_tables(self.value)))
+        if reduce != 1:
+            width, height = self.size
+            image.draft("RGB", (width // reduce, height // reduce))
+        image = image.convert("RGB")
+        if box is not None:
+            image = image.crop(box)
+        return image
+
+
+class CaptureStats:
+    captured: int
+    dropped: int
+
+    """Frame counters of a capture producer"""
+
+    def __init__(self) -> None:
+        self.captured = 0
+        self.dropped = 0
+        self._last_sequence: Optional[int] = None
+        self._unreported = 0
+
+    def count_sequence(self, sequence: int) -> None:
+        """
+        Count frames dropped by the driver from a gap of sequence numbers.
+
+        Args:
+            sequence (int): sequence number of a dequeued buffer
+        """
+        if self._last_sequence is not None and sequence > self._last_sequence + 1:
+            lost = sequence - self._last_sequence - 1
+            self.dropped += lost
+            self._unreported += lost
+        self._last_sequence = sequence
+
+    def count_frame(self) -> int:
+        """
+        Count a delivered frame.
+
+        Returns:
+            int: number of frames dropped since the previous delivered frame
+        """
+        self.captured += 1
+        dropped = self._unreported
+        self._unreported = 0
+        return dropped
+
+
 CONFIGURATOR_RETURN = TypeVar("CONFIGURATOR_RETURN")
 
 
@@ -37,6 +183,8 @@ class V4LCameraCapture(Producer[Frame[bytes]]):
     capture_width: int
     capture_height: int
     capture_format: V4L2_PIX_FMT
+    passthrough: bool
+    stats: CaptureStats
 
     FormatSelector = enum.Enum("FormatSelector", "DEFAULT PROPER MAXIMUM")
 
@@ -74,8 +222,12 @@ class V4LCameraCapture(Producer[Frame[bytes]]):
             If a camera doesn't support the expected_format,
             try to capture one of the fallback_formats and convert it to expected_format.
 
+            If expected_format is a compressed format (MJPEG or JPEG), fallback_formats are ignored and
+            the compressed payload is delivered without decoding as :class:`~actfw_core.capture.CompressedFrame`.
+
         """
         super().__init__()
+        self.stats = CaptureStats()
         if isinstance(device, DeviceInfo):
             device_path = None
             for node in device.nodes:
@@ -131,8 +283,10 @@ class V4LCameraCapture(Producer[Frame[bytes]]):
             def cmp(config):  # type: ignore
                 return 1
 
+        self.passthrough = expected_format in COMPRESSED_FORMATS
+
         config = None
-        fmts = [expected_format] + [f for f in fallback_formats]
+        fmts = [expected_format] + ([] if self.passthrough else [f for f in fallback_formats])
         for fmt in fmts:
             expected_framerate = 1 if format_selector == V4LCameraCapture.FormatSelector.MAXIMUM else framerate
             candidates = self.video.lookup_config(width, height, expected_framerate, fmt, expected_format)
@@ -142,7 +296,9 @@ class V4LCameraCapture(Producer[Frame[bytes]]):
                 break
         if config is None:
             raise RuntimeError("expected capture format is unsupported")
-        if format_selector == V4LCameraCapture.FormatSelector.MAXIMUM:
+        if self.passthrough:
+            fmt = self.video.set_passthrough_format(config)
+        elif format_selector == V4LCameraCapture.FormatSelector.MAXIMUM:
             fmt = self.video.set_format(config, expected_format=expected_format)
         else:
             fmt = self.video.set_format(config, width, height, expected_format=expected_format)
@@ -154,6 +310,15 @@ class V4LCameraCapture(Producer[Frame[bytes]]):
         self.video.request_buffers(4)
         self.video.queue_buffer()
 
+    def capture_stats(self) -> CaptureStats:
+        """
+        Get frame counters.
+
+        Returns:
+            :class:`~actfw_core.capture.CaptureStats`: numbers of captured frames and frames dropped by the driver
+        """
+        return self.stats
+
     def capture_size(self) -> Tuple[int, int]:
         """
         Get configured capture resolution.
@@ -178,12 +343,29 @@ class V4LCameraCapture(Producer[Frame[bytes]]):
 
     def run(self) -> None:
         """Run producer activity"""
+        try:
+            self._capture_loop()
+        finally:
+            # close the device even on an error, so that a restarted capture can open it again
+            self.video.close()
+
+    def _capture_loop(self) -> None:
         with self.video.start_streaming() as stream:
             while self._is_running():
-                value = stream.capture(timeout=5)
-                frame = Frame(value)
+                frame: Frame[bytes]
+                value = stream.capture(timeout=5, in_expected_format=not self.passthrough)
+                self.stats.count_sequence(stream.sequence)
+                dropped = self.stats.count_frame()
+                flight_recorder.record(
+                    "frame", f"sequence={stream.sequence} timestamp={stream.timestamp:.6f} dropped={dropped}"
+                )
+                if self.passthrough:
+                    frame = CompressedFrame(
+                        value, self.capture_format, self.capture_size(), stream.timestamp, stream.sequence, dropped
+                    )
+                else:
+                    frame = Frame(value, stream.timestamp, stream.sequence, dropped)
                 self._outlet(frame)
-        self.video.close()
 
     def _new_pad(self) -> _PadBase[Frame[bytes]]:
         return _PadDiscardingOld()
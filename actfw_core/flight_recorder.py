@@ -0,0 +1,96 @@
+import sys
+import threading
+import time
+from collections import deque
+from typing import IO, Any, Deque, Iterable, List, Optional, Tuple
+
+# (time [sec] (CLOCK_MONOTONIC), thread name, kind, detail)
+_Event = Tuple[float, str, str, str]
+
+
+class FlightRecorder:
+    """Always-on bounded log of recent pipeline events.
+
+    Frame timings of captures, control writes to V4L2 devices and task state transitions are recorded.
+    The log is dumped with the pad fill levels of the tasks when a task crashes or the pipeline stalls,
+    to tell what happened in the seconds leading up to the failure.
+    """
+
+    capacity: int
+    events: Deque[_Event]
+
+    def __init__(self, capacity: int = 4096) -> None:
+        """
+
+        Args:
+            capacity (int): maximum number of events kept; the oldest ones are discarded first
+
+        """
+        self.capacity = capacity
+        self.events = deque(maxlen=capacity)
+
+    def record(self, kind: str, detail: str) -> None:
+        """
+        Record an event of the calling thread.
+
+        Args:
+            kind (str): kind of the event (e.g. 'frame', 'control', 'task')
+            detail (str): description of the event
+        """
+        # deque.append is atomic, so no lock is needed.
+        self.events.append((time.monotonic(), threading.current_thread().name, kind, detail))
+
+    def dump(self, reason: str, tasks: Iterable[Any] = (), file: Optional[IO[str]] = None) -> None:
+        """
+        Write the recorded events and the pad fill levels of the tasks.
+
+        Args:
+            reason (str): why the log is dumped
+            tasks (iterable of :class:`~actfw_core.task.Task`): tasks to report the pad fill levels of
+            file (file, optional): output (default: stderr)
+        """
+        out = file if file is not None else sys.stderr
+        now = time.monotonic()
+        lines = [f"=== flight recorder: {reason} ==="]
+        for t, thread, kind, detail in list(self.events):
+            lines.append(f"[{t - now:+.3f}s] {thread} {kind}: {detail}")
+        lines.append("--- pads (queued items) ---")
+        for task in tasks:
+            lines.append(f"{task.name} ({type(task).__name__}, alive={task.is_alive()}): {_pad_levels(task)}")
+        lines.append("=== end of flight recorder ===")
+        print("\n".join(lines), file=out, flush=True)
+
+
+def _pad_levels(task: Any) -> str:
+    levels: List[str] = []
+    in_queues = getattr(task, "in_queues", [])
+    if len(in_queues) > 0:
+        levels.append(f"in={[q._pad.qsize() for q in in_queues]}")
+    out_queues = getattr(task, "out_queues", [])
+    if len(out_queues) > 0:
+        levels.append(f"out={[q._pad.qsize() for q in out_queues]}")
+    return " ".join(levels) if len(levels) > 0 else "-"
+
+
+_recorder = FlightRecorder()
+
+
+def get_flight_recorder() -> FlightRecorder:
+    """
+    Get the process-wide flight recorder.
+
+    Returns:
+        :class:`FlightRecorder`: flight recorder
+    """
+    return _recorder
+
+
+def record(kind: str, detail: str) -> None:
+    """
+    Record an event to the process-wide flight recorder.
+
+    Args:
+        kind (str): kind of the event (e.g. 'frame', 'control', 'task')
+        detail (str): description of the event
+    """
+    _recorder.record(kind, detail)
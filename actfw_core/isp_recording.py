@@ -0,0 +1,127 @@
+import json
+import struct
+from ctypes import POINTER, c_uint8, cast
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import IO, Any, Dict, List
+
+from actfw_core.v4l2.types import buffer
+
+# magic, format version, length of the JSON setup
+_HEADER = struct.Struct("<8sII")
+# kind, sequence, timestamp [sec], length of the data
+_RECORD = struct.Struct("<BxxxIdI")
+MAGIC = b"ACTFWISP"
+VERSION = 1
+
+
+class RecordKind(IntEnum):
+    ISP_STATS = 1  # raw `bcm2835_isp_stats`
+    UNICAM_META = 2  # embedded data lines of the unicam metadata device
+
+
+@dataclass(frozen=True)
+class StatsRecord:
+    kind: RecordKind
+    sequence: int
+    timestamp: float
+    data: bytes
+
+
+@dataclass(frozen=True)
+class StatsRecording:
+    # capture settings the 3A algorithms depend on, see `UnicamIspCapture`
+    setup: Dict[str, Any]
+    records: List[StatsRecord]
+
+
+class StatsRecorder:
+    """Writer of ISP statistics and unicam metadata to a file, to be replayed by :mod:`actfw_core.isp_replay`.
+
+    The file starts with the capture setup as JSON, followed by the records in the order they were received,
+    each a fixed-size header and the raw buffer contents.
+    """
+
+    file: IO[bytes]
+    records: int
+
+    def __init__(self, path: str, setup: Dict[str, Any]) -> None:
+        """
+
+        Args:
+            path (str): file to write
+            setup (dict): capture settings, which must be encodable to JSON
+
+        """
+        encoded = json.dumps(setup).encode()
+        self.file = open(path, "wb")
+        self.file.write(_HEADER.pack(MAGIC, VERSION, len(encoded)))
+        self.file.write(encoded)
+        self.records = 0
+
+    def record(self, kind: RecordKind, sequence: int, timestamp: float, data: bytes) -> None:
+        """
+        Append a buffer.
+
+        Args:
+            kind (:class:`RecordKind`): kind of the buffer
+            sequence (int): frame sequence number of the buffer
+            timestamp (float): timestamp [sec] of the buffer
+            data (bytes): contents of the buffer
+        """
+        self.file.write(_RECORD.pack(kind, sequence, timestamp, len(data)))
+        self.file.write(data)
+        self.records += 1
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self) -> "StatsRecorder":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
+def load_stats_recording(path: str) -> StatsRecording:
+    """
+    Read a file written by :class:`StatsRecorder`.
+
+    Args:
+        path (str): file to read
+
+    Returns:
+        :class:`StatsRecording`: capture setup and records
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    (magic, version, setup_length) = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise RuntimeError(f"not an ISP statistics recording of version {VERSION}: {path}")
+    offset = _HEADER.size
+    setup = json.loads(data[offset : offset + setup_length])
+    offset += setup_length
+    records = []
+    while offset < len(data):
+        (kind, sequence, timestamp, length) = _RECORD.unpack_from(data, offset)
+        offset += _RECORD.size
+        if offset + length > len(data):
+            raise RuntimeError(f"truncated ISP statistics recording: {path}")
+        records.append(StatsRecord(RecordKind(kind), sequence, timestamp, data[offset : offset + length]))
+        offset += length
+    return StatsRecording(setup, records)
+
+
+class RecordedBuffer:
+    """Recorded contents in place of a mapped :class:`~actfw_core.v4l2.video.VideoBuffer`."""
+
+    def __init__(self, record: StatsRecord) -> None:
+        self.data = (c_uint8 * len(record.data)).from_buffer_copy(record.data)
+        self.mapped_buf = cast(self.data, POINTER(c_uint8))
+        self.buf = buffer()
+        self.buf.bytesused = len(record.data)
+        self.buf.sequence = record.sequence
+        self._timestamp = record.timestamp
+
+    def timestamp(self) -> float:
+        return self._timestamp
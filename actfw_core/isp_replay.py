@@ -0,0 +1,130 @@
+import os
+import time
+from ctypes import POINTER, cast
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from actfw_core.autofocus import AutoFocuserBase
+from actfw_core.isp_recording import RecordKind, StatsRecording
+from actfw_core.unicam_isp_capture import UnicamIspCapture
+from actfw_core.v4l2.types import v4l2_ext_controls
+from actfw_core.v4l2.video import _VIDIOC, RawVideo, _control_value  # type: ignore
+
+# (device, control id, value or payload of a compound control)
+ControlWrite = Tuple[str, int, Union[int, bytes]]
+
+
+class ControlRecordingVideo(RawVideo):  # type: ignore
+    """Stand-in of a V4L2 device, which keeps the controls written to it instead of writing them.
+
+    Staging and skipping of unchanged controls work as with :class:`~actfw_core.v4l2.video.RawVideo`.
+    """
+
+    def __init__(self, name: str) -> None:
+        """
+
+        Args:
+            name (str): name of the device, reported with its control writes
+
+        """
+        super().__init__(os.devnull)
+        self.name = name
+        self.written: List[ControlWrite] = []
+
+    def _ioctl(self, request: int, arg: Any) -> int:
+        if request != _VIDIOC.S_EXT_CTRLS:
+            raise RuntimeError(f"{self.name} only takes control writes: {request:#x}")
+        ctrls = cast(arg, POINTER(v4l2_ext_controls)).contents
+        for i in range(ctrls.count):
+            self.written.append((self.name, ctrls.controls[i].id, _control_value(ctrls.controls[i])))
+        return 0
+
+    def take_written(self) -> List[ControlWrite]:
+        written = self.written
+        self.written = []
+        return written
+
+
+@dataclass
+class ReplayFrame:
+    kind: RecordKind
+    sequence: int
+    # time [sec] the 3A algorithms or the autofocus took for the record
+    seconds: float
+    # controls written for the record, in order
+    controls: List[ControlWrite] = field(default_factory=list)
+
+
+def replay_stats(recording: StatsRecording, auto_focuser: Optional[AutoFocuserBase] = None) -> List[ReplayFrame]:
+    """
+    Run recorded ISP statistics and unicam metadata through the 3A algorithms and the autofocus of :class:`~actfw_core.unicam_isp_capture.UnicamIspCapture`.
+
+    The records are processed in the recorded order in the calling thread, without devices.
+
+    Args:
+        recording (:class:`~actfw_core.isp_recording.StatsRecording`): recording by `UnicamIspCapture(stats_record=...)`
+        auto_focuser (:class:`~actfw_core.autofocus.AutoFocuserBase`, optional): autofocus to take the unicam metadata
+
+    Returns:
+        list of :class:`ReplayFrame`: timing and control writes of each record
+    """
+    isp_in = ControlRecordingVideo("isp_in")
+    unicam_subdev = ControlRecordingVideo("unicam_subdev")
+    unicam_subdev_meta = ControlRecordingVideo("unicam_subdev_meta")
+    devices = [isp_in, unicam_subdev, unicam_subdev_meta]
+    try:
+        capture = UnicamIspCapture._replaying(recording.setup, isp_in, unicam_subdev, unicam_subdev_meta, auto_focuser)
+        frames = []
+        for record in recording.records:
+            t_0 = time.perf_counter()
+            capture._replay_record(record)
+            seconds = time.perf_counter() - t_0
+            controls = [write for device in devices for write in device.take_written()]
+            frames.append(ReplayFrame(record.kind, record.sequence, seconds, controls))
+        return frames
+    finally:
+        for device in devices:
+            device.close()
+
+
+def dump_control_writes(frames: List[ReplayFrame]) -> List[Dict[str, Any]]:
+    """
+    Convert the control writes of a replay to a list encodable to JSON, to be kept as a baseline.
+
+    Args:
+        frames (list of :class:`ReplayFrame`): result of :func:`replay_stats`
+
+    Returns:
+        list of dict: kind, sequence and control writes of each record; payloads are in hex
+    """
+    return [
+        {
+            "kind": frame.kind.name,
+            "sequence": frame.sequence,
+            "controls": [
+                [device, cid, value.hex() if isinstance(value, bytes) else value] for (device, cid, value) in frame.controls
+            ],
+        }
+        for frame in frames
+    ]
+
+
+def diff_control_writes(frames: List[ReplayFrame], baseline: List[Dict[str, Any]]) -> List[str]:
+    """
+    Compare the control writes of a replay with a baseline.
+
+    Args:
+        frames (list of :class:`ReplayFrame`): result of :func:`replay_stats`
+        baseline (list of dict): result of :func:`dump_control_writes` for the same recording
+
+    Returns:
+        list of str: descriptions of the records whose control writes differ, empty if none
+    """
+    current = dump_control_writes(frames)
+    diffs = []
+    if len(current) != len(baseline):
+        diffs.append(f"{len(current)} records replayed, {len(baseline)} in the baseline")
+    for i, (got, expected) in enumerate(zip(current, baseline)):
+        if got != expected:
+            diffs.append(f"record {i} ({got['kind']} sequence={got['sequence']}): {expected['controls']} -> {got['controls']}")
+    return diffs
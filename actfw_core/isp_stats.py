@@ -0,0 +1,161 @@
+from ctypes import sizeof
+from itertools import repeat
+from operator import mul
+from typing import List, Tuple
+
+from .v4l2.types import (
+    AGC_REGIONS,
+    AWB_REGIONS,
+    FLOATING_REGIONS,
+    FOCUS_REGIONS,
+    NUM_HISTOGRAM_BINS,
+    bcm2835_isp_stats,
+    bcm2835_isp_stats_focus,
+    bcm2835_isp_stats_hist,
+    bcm2835_isp_stats_region,
+)
+
+_U32 = 4
+_U64 = 8
+_HIST_CHANNELS = {"r": 0, "g": 1, "b": 2}
+_REGION_SIZE = sizeof(bcm2835_isp_stats_region)
+_REGION_COUNTED = bcm2835_isp_stats_region.counted.offset
+_REGION_SUMS = {
+    "r": bcm2835_isp_stats_region.r_sum.offset,
+    "g": bcm2835_isp_stats_region.g_sum.offset,
+    "b": bcm2835_isp_stats_region.b_sum.offset,
+}
+_REGIONS = {
+    "awb": (bcm2835_isp_stats.awb_stats.offset, AWB_REGIONS),
+    "floating": (bcm2835_isp_stats.floating_stats.offset, FLOATING_REGIONS),
+    "agc": (bcm2835_isp_stats.agc_stats.offset, AGC_REGIONS),
+}
+_FOCUS_SIZE = sizeof(bcm2835_isp_stats_focus)
+
+
+class IspStatsView:
+    """Typed views of the fields of a `bcm2835_isp_stats` buffer.
+
+    The views share memory with the buffer; nothing is copied.
+    They must not be used after the buffer is queued back to the ISP.
+    """
+
+    def __init__(self, stats: bcm2835_isp_stats) -> None:
+        """
+
+        Args:
+            stats (:class:`~actfw_core.v4l2.types.bcm2835_isp_stats`): statistics, typically mapped from a V4L2 buffer
+
+        """
+        raw = memoryview(stats).cast("B")
+        self._u32 = raw.cast("I")
+        self._u64 = raw.cast("Q")
+
+    def histogram(self, channel: str, index: int = 0) -> memoryview:
+        """
+        Get a histogram.
+
+        Args:
+            channel (str): 'r', 'g' or 'b'
+            index (int): histogram index
+
+        Returns:
+            memoryview: `NUM_HISTOGRAM_BINS` counts of unsigned 32-bit integers
+        """
+        offset = bcm2835_isp_stats.hist.offset + index * sizeof(bcm2835_isp_stats_hist)
+        start = offset // _U32 + _HIST_CHANNELS[channel] * NUM_HISTOGRAM_BINS
+        return self._u32[start : start + NUM_HISTOGRAM_BINS]
+
+    def counted(self, regions: str) -> memoryview:
+        """
+        Get the numbers of counted pixels of regions.
+
+        Args:
+            regions (str): 'awb', 'floating' or 'agc'
+
+        Returns:
+            memoryview: one unsigned 32-bit integer per region
+        """
+        (offset, n) = _REGIONS[regions]
+        start = (offset + _REGION_COUNTED) // _U32
+        step = _REGION_SIZE // _U32
+        return self._u32[start : start + n * step : step]
+
+    def sums(self, regions: str, channel: str) -> memoryview:
+        """
+        Get the pixel value sums of a channel of regions.
+
+        Args:
+            regions (str): 'awb', 'floating' or 'agc'
+            channel (str): 'r', 'g' or 'b'
+
+        Returns:
+            memoryview: one unsigned 64-bit integer per region
+        """
+        (offset, n) = _REGIONS[regions]
+        start = (offset + _REGION_SUMS[channel]) // _U64
+        step = _REGION_SIZE // _U64
+        return self._u64[start : start + n * step : step]
+
+    def focus_contrast(self, i: int, j: int) -> memoryview:
+        """
+        Get `contrast_val[i][j]` of the focus regions.
+
+        Args:
+            i (int): first index of `contrast_val`
+            j (int): second index of `contrast_val`
+
+        Returns:
+            memoryview: one unsigned 64-bit integer per focus region
+        """
+        start = (bcm2835_isp_stats.focus_stats.offset + bcm2835_isp_stats_focus.contrast_val.offset) // _U64 + i * 2 + j
+        step = _FOCUS_SIZE // _U64
+        return self._u64[start : start + FOCUS_REGIONS * step : step]
+
+    def total_sums(self, regions: str) -> Tuple[int, int, int]:
+        """
+        Get the pixel value sums of all regions.
+
+        Args:
+            regions (str): 'awb', 'floating' or 'agc'
+
+        Returns:
+            (int, int, int): sums of red, green and blue
+        """
+        return (sum(self.sums(regions, "r")), sum(self.sums(regions, "g")), sum(self.sums(regions, "b")))
+
+
+class ClippedRegionSums:
+    """Sums of pixel values of regions, each clipped to the saturation level after applying a gain.
+
+    The region fields are read once, so the sums can be evaluated for many gains cheaply.
+    """
+
+    def __init__(self, view: IspStatsView, regions: str, pipeline_bits: int) -> None:
+        """
+
+        Args:
+            view (:class:`IspStatsView`): statistics
+            regions (str): 'awb', 'floating' or 'agc'
+            pipeline_bits (int): bit depth of the ISP pipeline
+
+        """
+        counted: List[int] = view.counted(regions).tolist()
+        self.pixel_sum = sum(counted)
+        saturation = (1 << pipeline_bits) - 1
+        self._limits = [saturation * c for c in counted]
+        self._sums = [view.sums(regions, channel).tolist() for channel in "rgb"]
+
+    def evaluate(self, gain: float) -> Tuple[float, float, float]:
+        """
+        Get the clipped sums for a gain.
+
+        Args:
+            gain (float): gain applied to the pixel values
+
+        Returns:
+            (float, float, float): sums of red, green and blue
+        """
+        limits = self._limits
+        (r, g, b) = [sum(map(min, map(mul, sums, repeat(gain)), limits)) for sums in self._sums]
+        return (r, g, b)
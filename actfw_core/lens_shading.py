@@ -0,0 +1,70 @@
+from array import array
+from math import floor
+from typing import List, Sequence, Tuple
+
+# (lower source index, upper source index, weight of the upper one)
+BilinearWeight = Tuple[int, int, float]
+
+# Maximum gain of the U4P10 gain format.
+_MAX_GAIN = 16383
+
+
+def bilinear_weights(start: float, step: float, n: int, src_size: int) -> List[BilinearWeight]:
+    """
+    Compute the source indices and weights of linear interpolation along one axis.
+
+    Args:
+        start (float): source coordinate of the first destination sample
+        step (float): source coordinate increment between destination samples
+        n (int): number of destination samples
+        src_size (int): number of source samples
+
+    Returns:
+        list of (int, int, float): lower index, upper index and weight of the upper one for each destination sample
+    """
+    weights = []
+    x = start
+    for _ in range(n):
+        lo = floor(x)
+        f = x - lo
+        weights.append((max(lo, 0), min(lo + 1, src_size - 1), f))
+        x += step
+    return weights
+
+
+def resample_table(
+    src: Sequence[float], src_width: int, x_weights: List[BilinearWeight], y_weights: List[BilinearWeight]
+) -> List[float]:
+    """
+    Resample a row-major table with bilinear interpolation.
+
+    Args:
+        src (list of float): source table
+        src_width (int): width of the source table
+        x_weights (list of (int, int, float)): weights along the rows, from :func:`bilinear_weights`
+        y_weights (list of (int, int, float)): weights along the columns, from :func:`bilinear_weights`
+
+    Returns:
+        list of float: resampled table of `len(x_weights)` x `len(y_weights)`
+    """
+    table: List[float] = []
+    for y_lo, y_hi, yf in y_weights:
+        row_above = src[y_lo * src_width : (y_lo + 1) * src_width]
+        row_below = src[y_hi * src_width : (y_hi + 1) * src_width]
+        above = [row_above[lo] * (1 - f) + row_above[hi] * f for (lo, hi, f) in x_weights]
+        below = [row_below[lo] * (1 - f) + row_below[hi] * f for (lo, hi, f) in x_weights]
+        table.extend([a * (1 - yf) + b * yf for (a, b) in zip(above, below)])
+    return table
+
+
+def pack_gains(table: Sequence[float]) -> "array[int]":
+    """
+    Convert gains to the U4P10 format of the ISP lens shading grid.
+
+    Args:
+        table (list of float): gains
+
+    Returns:
+        array of int: signed 16-bit gains, which can be assigned to a `memoryview.cast('h')` of the grid
+    """
+    return array("h", [min(floor(1024 * gain + 0.5), _MAX_GAIN) for gain in table])
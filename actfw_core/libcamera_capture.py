@@ -10,9 +10,11 @@ import selectors
 from typing import Any, Dict, List, Optional, Tuple, Union
 
 import libcamera as libcam
-from actfw_core.capture import Frame
+from actfw_core import flight_recorder
+from actfw_core.capture import CaptureStats, Frame
 from actfw_core.system import EnvironmentVariableNotSet, get_actcast_firmware_type
 from actfw_core.task import Producer
+from actfw_core.trace import _now, _span
 from actfw_core.unicam_isp_capture import Auto
 from actfw_core.util.pad import _PadBase, _PadDiscardingOld
 
@@ -151,6 +153,7 @@ class LibcameraCapture(Producer[Frame[bytes]]):
     _depad: bool
     _stride: int
     _scaler_crop: Optional[ScalerCrop]
+    _stats: CaptureStats
 
     def __init__(
         self,
@@ -216,6 +219,7 @@ class LibcameraCapture(Producer[Frame[bytes]]):
         self._analogue_gain = Auto.AUTO
         self._depad = depad
         self._scaler_crop = scaler_crop
+        self._stats = CaptureStats()
         self._camera = self._cm.cameras[camera_index]
         self._camera.acquire()
         self._camera_config = self._camera.generate_configuration([libcam.StreamRole.Viewfinder])
@@ -243,6 +247,10 @@ class LibcameraCapture(Producer[Frame[bytes]]):
         stream_config: libcam.StreamConfiguration = self._camera_config.at(0)
         return (stream_config.size.width, stream_config.size.height)
 
+    def capture_stats(self) -> CaptureStats:
+        """Return the frame counters (numbers of captured frames and frames dropped by the driver)."""
+        return self._stats
+
     def stride(self) -> int:
         """Return the stride (bytes per line) of the captured buffer, including padding.
 
@@ -297,10 +305,18 @@ class LibcameraCapture(Producer[Frame[bytes]]):
             assert len(frame_buffer.planes) == 1
             plane = next(iter(frame_buffer.planes))
 
+            t_0 = _now()
             with mmap.mmap(plane.fd, plane.length, offset=plane.offset) as mm:
                 dst = self._strip_stride_padding(mm) if self._depad else mm[:]
 
-            frame = Frame(dst)
+            # The buffer timestamp is in nanoseconds on CLOCK_MONOTONIC.
+            metadata = frame_buffer.metadata
+            self._stats.count_sequence(metadata.sequence)
+            frame = Frame(dst, metadata.timestamp / 1e9, metadata.sequence, self._stats.count_frame())
+            _span("copy", "capture", t_0, frame)
+            flight_recorder.record(
+                "frame", f"sequence={frame.sequence} timestamp={frame.timestamp:.6f} dropped={frame.dropped}"
+            )
             self._outlet(frame)
 
             req.reuse()
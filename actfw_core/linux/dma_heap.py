@@ -30,3 +30,7 @@ class DMAHeap(object):
             raise RuntimeError(f"ioctl(_DMA_BUF_SET_NAME){errno.errorcode[get_errno()]}")
 
         return alloc.fd
+
+    def close(self) -> None:
+        # allocated buffers stay valid
+        os.close(self.heap_fd)
@@ -2,7 +2,7 @@ import http.server
 import io
 import socketserver
 import threading
-from typing import Any, Generic, Optional, TypeVar
+from typing import Any, Generic, Optional, TypeVar, Union
 
 from PIL.Image import Image as PIL_Image
 
@@ -34,7 +34,7 @@ class _ObservableValue(Generic[T]):
 class _LocalVideoStreamHandler(http.server.BaseHTTPRequestHandler):
     def __init__(
         self,
-        image: _ObservableValue[PIL_Image],
+        image: _ObservableValue[Union[PIL_Image, bytes]],
         quality: int,
         *args: Any,
     ) -> None:
@@ -60,15 +60,20 @@ class _LocalVideoStreamHandler(http.server.BaseHTTPRequestHandler):
                 except Exception:
                     continue
                 else:
-                    jpgimg = io.BytesIO()
-                    frame.save(
-                        jpgimg,
-                        format="JPEG",
-                        quality=self.quality,
-                    )
+                    if isinstance(frame, bytes):
+                        # already encoded JPEG
+                        jpg = frame
+                    else:
+                        jpgimg = io.BytesIO()
+                        frame.save(
+                            jpgimg,
+                            format="JPEG",
+                            quality=self.quality,
+                        )
+                        jpg = jpgimg.getvalue()
                     self.wfile.write(b"--FRAME\r\n")
                     self.wfile.write(b"Content-Type: image/jpeg\r\n\r\n")
-                    self.wfile.write(jpgimg.getvalue())
+                    self.wfile.write(jpg)
                     self.wfile.write(b"\r\n")
         except Exception:
             pass
@@ -80,7 +85,7 @@ class _LocalVideoStreamServer(socketserver.ThreadingMixIn, http.server.HTTPServe
 
 
 class LocalVideoServer(Isolated):
-    image: _ObservableValue[PIL_Image]
+    image: _ObservableValue[Union[PIL_Image, bytes]]
     server: _LocalVideoStreamServer
 
     """Local Video Server
@@ -132,6 +137,21 @@ class LocalVideoServer(Isolated):
         except Exception:
             pass
 
+    def update_jpeg(self, jpeg: bytes) -> None:
+        """
+
+        Update the video image with an already encoded JPEG image.
+
+        The given data is sent as is, without decoding and re-encoding.
+        This is useful with :class:`~actfw_core.capture.CompressedFrame`.
+
+        Args:
+            jpeg (bytes): JPEG image
+
+        """
+
+        self.image.set(jpeg)
+
     def run(self) -> None:
         self.server.serve_forever()
 
@@ -0,0 +1,80 @@
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from .task import Task, Tee
+from .task.consumer import _ConsumerMixin
+from .task.producer import _ProducerMixin
+
+
+@dataclass
+class RestartPolicy:
+    """How `Application` restarts a task which has exited while the application is running.
+
+    A task thread cannot be started twice, so `factory` creates a new task in place of the failed one.
+    The new task takes over the connections (pads) of the failed one, so the rest of the pipeline keeps running.
+
+    Attributes:
+        factory: creates a task of the same class as the failed one
+        max_restarts: maximum number of restarts; the application stops when the task exits once more
+        backoff: delay [sec] before the first restart, doubled for every following restart
+        max_backoff: upper limit of the delay [sec]
+    """
+
+    factory: Callable[[], Task]
+    max_restarts: int = 3
+    backoff: float = 0.1
+    max_backoff: float = 5.0
+
+    def delay(self, restarts: int) -> float:
+        """
+        Get the delay before a restart.
+
+        Args:
+            restarts (int): number of restarts done so far
+
+        Returns:
+            float: delay [sec]
+        """
+        return float(min(self.backoff * (2**restarts), self.max_backoff))
+
+
+class _Supervised:
+    policy: RestartPolicy
+    restarts: int
+    failed_at: Optional[float]
+
+    def __init__(self, policy: RestartPolicy) -> None:
+        self.policy = policy
+        self.restarts = 0
+        self.failed_at = None
+
+    def restart_at(self) -> Optional[float]:
+        if self.failed_at is None:
+            return None
+        return self.failed_at + self.policy.delay(self.restarts)
+
+
+def _transfer_connections(old: Task, new: Task) -> None:
+    if type(new) is not type(old):
+        raise TypeError(f"factory must create a {type(old).__name__}, not {type(new).__name__}.")
+    if isinstance(old, _ProducerMixin) and isinstance(new, _ProducerMixin):
+        new.out_queues = old.out_queues
+        new.out_queue_id = old.out_queue_id
+        new.dispatch_mode = old.dispatch_mode
+        new.dispatched = old.dispatched
+    if isinstance(old, _ConsumerMixin) and isinstance(new, _ConsumerMixin):
+        new.in_queues = old.in_queues
+        new.max_frame_age = old.max_frame_age
+    if isinstance(old, Tee) and isinstance(new, Tee):
+        new.policies = old.policies
+        new.sent = old.sent
+        new.timed_out = old.timed_out
+    if new.affinity is None and new.nice is None:
+        new.set_scheduling(old.affinity, old.nice)
+
+
+def _restart(old: Task, factory: Callable[[], Task]) -> Task:
+    new = factory()
+    _transfer_connections(old, new)
+    new.start()
+    return new
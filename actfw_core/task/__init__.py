@@ -1,7 +1,10 @@
+from .async_task import AsyncConsumer, AsyncPipe  # noqa: F401
+from .batch import BatchPipe  # noqa: F401
 from .consumer import Consumer  # noqa: F401
+from .fused import FusedPipe  # noqa: F401
 from .isolated import Isolated  # noqa: F401
 from .join import Join  # noqa: F401
 from .pipe import Pipe  # noqa: F401
-from .producer import Producer  # noqa: F401
+from .producer import DispatchMode, Producer  # noqa: F401
 from .task import Task  # noqa: F401
-from .tee import Tee  # noqa: F401
+from .tee import Tee, TeePolicy  # noqa: F401
@@ -0,0 +1,212 @@
+import asyncio
+import concurrent.futures
+import threading
+from abc import abstractmethod
+from collections import deque
+from typing import Any, Deque, Generic, Optional, TypeVar
+
+from .consumer import _NOTHING, _ConsumerMixin
+from .producer import _ProducerMixin
+from .task import Task
+
+T_OUT = TypeVar("T_OUT")
+T_IN = TypeVar("T_IN")
+
+# Longest wait for an input or a finished request, which bounds the latency of `stop`.
+_WAIT_TIMEOUT = 1.0
+
+_shared_loop: Optional[asyncio.AbstractEventLoop] = None
+_shared_loop_lock = threading.Lock()
+
+
+def shared_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Get the event loop shared by async tasks.
+
+    The loop runs forever in a daemon thread started on the first call.
+
+    Returns:
+        asyncio.AbstractEventLoop: event loop
+    """
+    global _shared_loop
+    with _shared_loop_lock:
+        if _shared_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="actfw-event-loop", daemon=True).start()
+            _shared_loop = loop
+        return _shared_loop
+
+
+class _AsyncConsumerMixin(Generic[T_IN], _ConsumerMixin[T_IN]):
+    concurrency: int
+    loop: asyncio.AbstractEventLoop
+    in_flight: Deque["concurrent.futures.Future[Any]"]
+    # set on the loop when an input is put or a request finishes, see `_wait_for_input`
+    _changed: Optional[asyncio.Event]
+
+    def __init__(self, concurrency: int, loop: Optional[asyncio.AbstractEventLoop]) -> None:
+        _ConsumerMixin.__init__(self)
+        if concurrency < 1:
+            raise ValueError("concurrency must be positive.")
+        self.concurrency = concurrency
+        self.loop = loop if loop is not None else shared_event_loop()
+        self.in_flight = deque()
+        self._changed = None
+
+    @abstractmethod
+    def _collect(self) -> None:
+        # Take the finished requests out of `in_flight`.
+        pass
+
+    @abstractmethod
+    def _wait_for_slot(self) -> None:
+        # Wait until a request in `in_flight` finishes, or for a while.
+        pass
+
+    def _notify(self) -> None:
+        # Called from any thread. Wakes up `_wait_for_input` on the loop.
+        try:
+            self.loop.call_soon_threadsafe(self._set_changed)
+        except RuntimeError:
+            # the loop is closed
+            pass
+
+    def _set_changed(self) -> None:
+        if self._changed is not None:
+            self._changed.set()
+
+    async def _input_or_finished(self) -> None:
+        # Runs on the loop, where `_changed` is set, so that a change after the checks below is not missed.
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        self._changed.clear()
+        if not self.in_queues[self.in_queue_id].empty() or any(future.done() for future in self.in_flight):
+            return
+        try:
+            await asyncio.wait_for(self._changed.wait(), _WAIT_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+
+    def _wait_for_input(self) -> None:
+        # Wait until the next input to take is put or a request in flight finishes.
+        asyncio.run_coroutine_threadsafe(self._input_or_finished(), self.loop).result()
+
+    def _run_async(self) -> None:
+        for in_queue in self.in_queues:
+            in_queue._pad._on_transfer.append(self._notify)
+        try:
+            while self._is_running():
+                self._collect()
+                if len(self.in_flight) >= self.concurrency:
+                    self._wait_for_slot()
+                    continue
+                i = self._inlet_once(0)
+                if i is _NOTHING:
+                    self._wait_for_input()
+                    continue
+                future = asyncio.run_coroutine_threadsafe(self.proc(i), self.loop)
+                future.add_done_callback(lambda _: self._notify())
+                self.in_flight.append(future)
+        finally:
+            for in_queue in self.in_queues:
+                in_queue._pad._on_transfer.remove(self._notify)
+            for future in self.in_flight:
+                future.cancel()
+            self.in_flight.clear()
+            self._processed(len(self._taken))
+            self.cleanup()
+
+    def cleanup(self) -> None:
+        """
+        Perform cleanup before exiting.
+
+        This method is executed at the end of `run`, even if an exception is raised.
+        Requests still in flight are cancelled before this method is called.
+        Since a long-running cleanup may cause the entire process to be terminated with SIGKILL,
+        it must be implemented to complete quickly.
+        """
+        pass
+
+    async def proc(self, i: T_IN) -> Any:
+        raise NotImplementedError("'proc' must be overridden.")
+
+
+class AsyncPipe(Generic[T_OUT, T_IN], Task, _ProducerMixin[T_OUT], _AsyncConsumerMixin[T_IN]):
+    """Pipeline Task whose processor is a coroutine.
+
+    `proc` runs on a shared event loop (see :func:`shared_event_loop`), and up to `concurrency` inputs
+    are processed at the same time. The outputs are sent to the following tasks in the input order.
+    """
+
+    def __init__(self, concurrency: int = 1, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        """
+
+        Args:
+            concurrency (int): maximum number of `proc` calls in flight
+            loop (asyncio.AbstractEventLoop, optional): event loop to run `proc` on (default: shared event loop)
+
+        """
+        Task.__init__(self)
+        _ProducerMixin.__init__(self)
+        _AsyncConsumerMixin.__init__(self, concurrency, loop)
+
+    def _collect(self) -> None:
+        while len(self.in_flight) > 0 and self.in_flight[0].done():
+            o = self.in_flight.popleft().result()
+            self._outlet(o)
+            self._processed(1)
+
+    def _wait_for_slot(self) -> None:
+        concurrent.futures.wait([self.in_flight[0]], timeout=1)
+
+    def run(self) -> None:
+        """Run and start the activity"""
+        self._run_async()
+
+    async def proc(self, i: T_IN) -> T_OUT:
+        """
+        Pipeline Task Processor (coroutine)
+        """
+        raise NotImplementedError("'proc' must be overridden.")
+
+
+class AsyncConsumer(Generic[T_IN], Task, _AsyncConsumerMixin[T_IN]):
+    """Consumer Task whose processor is a coroutine.
+
+    `proc` runs on a shared event loop (see :func:`shared_event_loop`), and up to `concurrency` inputs
+    are processed at the same time.
+    """
+
+    def __init__(self, concurrency: int = 1, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        """
+
+        Args:
+            concurrency (int): maximum number of `proc` calls in flight
+            loop (asyncio.AbstractEventLoop, optional): event loop to run `proc` on (default: shared event loop)
+
+        """
+        Task.__init__(self)
+        _AsyncConsumerMixin.__init__(self, concurrency, loop)
+
+    def _collect(self) -> None:
+        for future in [future for future in self.in_flight if future.done()]:
+            self.in_flight.remove(future)
+            self._processed(1)
+            # propagate the exception raised in `proc`
+            future.result()
+
+    def _wait_for_slot(self) -> None:
+        concurrent.futures.wait(self.in_flight, timeout=1, return_when=concurrent.futures.FIRST_COMPLETED)
+
+    def run(self) -> None:
+        """Run and start the activity"""
+        self._run_async()
+
+    async def proc(self, i: T_IN) -> None:
+        """
+        Pipeline Task Processor (coroutine)
+
+        Args:
+            i : task input
+        """
+        raise NotImplementedError("'proc' must be overridden.")
@@ -0,0 +1,98 @@
+import time
+from typing import Generic, List, TypeVar
+
+from ..trace import _now, _span
+from .consumer import _NOTHING
+from .pipe import Pipe
+
+T_OUT = TypeVar("T_OUT")
+T_IN = TypeVar("T_IN")
+
+
+class BatchPipe(Generic[T_OUT, T_IN], Pipe[T_OUT, T_IN]):
+    max_batch_size: int
+    max_wait: float
+    batch_count: int
+    item_count: int
+
+    """Pipeline Task processing inputs in batches.
+
+    Up to `max_batch_size` inputs are collected, waiting at most `max_wait` seconds after the first one arrives.
+    The batch is passed to `proc_batch`, and its results are sent to the following tasks one by one in order.
+    """
+
+    def __init__(self, max_batch_size: int, max_wait: float) -> None:
+        """
+
+        Args:
+            max_batch_size (int): maximum number of inputs in a batch
+            max_wait (float): maximum time [sec] to wait for a batch to be filled after its first input arrives
+
+        """
+        super().__init__()
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be positive.")
+        if max_wait < 0:
+            raise ValueError("max_wait must not be negative.")
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batch_count = 0
+        self.item_count = 0
+
+    def _collect_batch(self) -> List[T_IN]:
+        batch: List[T_IN] = []
+        i = self._inlet_once(1)
+        if i is _NOTHING:
+            return batch
+        batch.append(i)
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size and self._is_running():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            i = self._inlet_once(remaining)
+            if i is not _NOTHING:
+                batch.append(i)
+        return batch
+
+    def run(self) -> None:
+        """Run and start the activity"""
+        name = f"{type(self).__name__}.proc_batch"
+        try:
+            while self._is_running():
+                batch = self._collect_batch()
+                if len(batch) == 0:
+                    continue
+                try:
+                    t_0 = _now()
+                    outputs = self.proc_batch(batch)
+                    _span(name, "task", t_0, batch[0])
+                    if len(outputs) != len(batch):
+                        raise RuntimeError(f"proc_batch returned {len(outputs)} outputs for {len(batch)} inputs.")
+                    self.batch_count += 1
+                    self.item_count += len(batch)
+                    for o in outputs:
+                        if not self._outlet(o):
+                            break
+                finally:
+                    self._processed(len(batch))
+        finally:
+            self.cleanup()
+
+    def proc(self, i: T_IN) -> T_OUT:
+        """
+        Process a single input as a batch of one.
+        """
+        return self.proc_batch([i])[0]
+
+    def proc_batch(self, batch: List[T_IN]) -> List[T_OUT]:
+        """
+        Pipeline Task Processor for a batch
+
+        Args:
+            batch (list): inputs in arrival order
+
+        Returns:
+            list: outputs, one for each input in the same order
+        """
+        raise NotImplementedError("'proc_batch' must be overridden.")
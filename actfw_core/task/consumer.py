@@ -1,28 +1,101 @@
+import time
+from collections import deque
 from queue import Empty
-from typing import Generator, Generic, List, TypeVar
+from typing import Any, Deque, Generator, Generic, List, Optional, TypeVar
 
-from ..util.pad import _PadOut
+from ..trace import _now, _span
+from ..util.pad import _PadBase, _PadOut
 from .task import Task, _TaskI
 
 T_IN = TypeVar("T_IN")
 
+# Marker of "no input was received". `None` is a valid input.
+_NOTHING = object()
+
 
 class _ConsumerMixin(Generic[T_IN], _TaskI):
     in_queues: List[_PadOut[T_IN]]
+    max_frame_age: Optional[float]
+    expired_frames: int
+    in_queue_id: int
+    # pads of the inputs taken by `_inlet_once` and not processed yet, oldest first
+    _taken: Deque[_PadBase[T_IN]]
 
     def __init__(self) -> None:
         self.in_queues = []
+        self.max_frame_age = None
+        self.expired_frames = 0
+        self.in_queue_id = 0
+        self._taken = deque()
 
     def _add_in_queue(self, q: _PadOut[T_IN]) -> None:
         self.in_queues.append(q)
 
+    def set_max_frame_age(self, seconds: Optional[float]) -> None:
+        """
+        Discard frames older than the given age before processing them.
+
+        The age of a frame is computed from its capture timestamp
+        (see :class:`~actfw_core.capture.Frame`). Inputs without a timestamp are never discarded.
+        The number of discarded frames is counted in `expired_frames`.
+        A limit given by `connect(..., max_frame_age=...)` takes precedence on that connection.
+
+        Args:
+            seconds (float, optional): maximum frame age [sec] (None means no limit)
+        """
+        self.max_frame_age = seconds
+
+    def _is_expired(self, i: T_IN, q: _PadOut[T_IN]) -> bool:
+        max_age = q.max_frame_age if q.max_frame_age is not None else self.max_frame_age
+        if max_age is None:
+            return False
+        timestamp: Optional[float] = getattr(i, "timestamp", None)
+        if timestamp is None:
+            return False
+        return time.monotonic() - timestamp > max_age
+
+    def _inlet_once(self, timeout: float) -> Any:
+        # One step of `_inlet`. Returns `_NOTHING` if no input is available.
+        q = self.in_queues[self.in_queue_id]
+        t_0 = _now()
+        try:
+            i = q.get(timeout=timeout)
+        except Empty:
+            return _NOTHING
+        _span("inlet", "pad", t_0, i)
+        self.last_progress = time.monotonic()
+        self.in_queue_id = (self.in_queue_id + 1) % len(self.in_queues)
+        if self._is_expired(i, q):
+            self.expired_frames += 1
+            return _NOTHING
+        q._pad.processing_started()
+        self._taken.append(q._pad)
+        return i
+
+    def _processed(self, count: int) -> None:
+        # Mark the oldest `count` inputs taken by `_inlet_once` as processed.
+        for _ in range(min(count, len(self._taken))):
+            self._taken.popleft().processing_finished()
+
     def _inlet(self) -> Generator[T_IN, None, None]:
         in_queue_id = 0
         length = len(self.in_queues)
+        t_0 = _now()
         while self._is_running():
             try:
-                i = self.in_queues[in_queue_id].get(timeout=1)
-                yield i
+                q = self.in_queues[in_queue_id]
+                i = q.get(timeout=1)
+                _span("inlet", "pad", t_0, i)
+                self.last_progress = time.monotonic()
+                if self._is_expired(i, q):
+                    self.expired_frames += 1
+                else:
+                    q._pad.processing_started()
+                    try:
+                        yield i
+                    finally:
+                        q._pad.processing_finished()
+                t_0 = _now()
                 in_queue_id = (in_queue_id + 1) % length
             except Empty:
                 pass
@@ -49,9 +122,12 @@ class Consumer(Generic[T_IN], Task, _ConsumerMixin[T_IN]):
 
     def run(self) -> None:
         """Run and start the activity"""
+        name = f"{type(self).__name__}.proc"
         try:
             for i in self._inlet():
+                t_0 = _now()
                 self.proc(i)
+                _span(name, "task", t_0, i)
                 if not self._is_running():
                     break
         finally:
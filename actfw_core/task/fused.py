@@ -0,0 +1,78 @@
+from typing import Any, List, Sequence, Tuple
+
+from ..trace import _now, _span
+from .pipe import Pipe
+
+
+class FusedPipe(Pipe[Any, Any]):
+    stages: List[Pipe[Any, Any]]
+    stage_counts: List[int]
+    stage_times: List[float]
+
+    """Pipeline Task running a chain of Pipes in one thread.
+
+    Each stage's `proc` is called in order within this task's thread,
+    so no queue handoff or context switch happens between the stages.
+    The stages must not be registered to the application or connected to each other.
+    """
+
+    def __init__(self, stages: Sequence[Pipe[Any, Any]]) -> None:
+        """
+
+        Args:
+            stages (list of :class:`~actfw_core.task.Pipe`): pipes to run, in order
+
+        """
+        super().__init__()
+        if len(stages) == 0:
+            raise ValueError("stages must not be empty.")
+        self.stages = list(stages)
+        self.stage_counts = [0] * len(self.stages)
+        self.stage_times = [0.0] * len(self.stages)
+
+    def proc(self, i: Any) -> Any:
+        """
+        Apply `proc` of each stage in order.
+        """
+        for n, stage in enumerate(self.stages):
+            t_0 = _now()
+            o = stage.proc(i)
+            self.stage_times[n] += (_now() - t_0) * 1e-9
+            self.stage_counts[n] += 1
+            _span(f"{type(stage).__name__}.proc", "task", t_0, i)
+            i = o
+        return i
+
+    def cleanup(self) -> None:
+        """
+        Call `cleanup` of all stages in order.
+
+        Every stage is cleaned up even if a preceding one raises; the first exception is re-raised afterwards.
+        """
+        error = None
+        for stage in self.stages:
+            try:
+                stage.cleanup()
+            except Exception as e:
+                if error is None:
+                    error = e
+        if error is not None:
+            raise error
+
+    def stop(self) -> None:
+        """Stop the activity"""
+        super().stop()
+        for stage in self.stages:
+            stage.stop()
+
+    def stage_stats(self) -> List[Tuple[str, int, float]]:
+        """
+        Get per-stage timing.
+
+        Returns:
+            list of (str, int, float): (stage class name, number of processed items, total time of `proc` [sec])
+        """
+        return [
+            (type(stage).__name__, count, total)
+            for (stage, count, total) in zip(self.stages, self.stage_counts, self.stage_times)
+        ]
@@ -1,21 +1,90 @@
+import threading
+import time
+from collections import deque
 from queue import Empty
-from typing import Any, Generator, Tuple
+from typing import Any, Deque, Generator, List, Optional, Tuple
 
 from .consumer import _ConsumerMixin
 from .producer import _ProducerMixin
 from .task import Task
 
+ALIGN_KEYS = ("sequence", "timestamp")
+
+# Longest wait for an input in the aligned mode, which bounds the latency of `stop`.
+_WAIT_TIMEOUT = 1.0
+
+
+class _Pending:
+    key: float
+    arrival: float
+    value: Any
+
+    def __init__(self, key: float, arrival: float, value: Any) -> None:
+        self.key = key
+        self.arrival = arrival
+        self.value = value
+
 
 class Join(Task, _ProducerMixin[Tuple[Any, ...]], _ConsumerMixin[Any]):
-    """Join Task."""
+    align: Optional[str]
+    tolerance: float
+    timeout: Optional[float]
+    partial: bool
+    max_buffer: int
+    buffers: List[Deque[_Pending]]
+    partial_tuples: int
+    dropped_items: int
+
+    """Join Task.
+
+    By default, one item is taken from each input in turn.
+
+    With `align`, items are matched by their `sequence` or `timestamp` attribute
+    (see :class:`~actfw_core.capture.Frame`) instead, so that a frame lost on one input
+    does not shift the pairing of the following ones.
+    Unmatched items older than the maximum frame age (see `set_max_frame_age`) are discarded.
+    """
+
+    def __init__(
+        self,
+        align: Optional[str] = None,
+        tolerance: float = 0,
+        timeout: Optional[float] = None,
+        partial: bool = False,
+        max_buffer: int = 8,
+    ) -> None:
+        """
 
-    def __init__(self) -> None:
-        """"""
+        Args:
+            align (str, optional): attribute to match items by, 'sequence' or 'timestamp' (default: take items in turn)
+            tolerance (float): maximum difference of the attribute between matched items
+            timeout (float, optional): maximum time [sec] to wait for the missing items of a tuple
+            partial (bool): emit tuples with `None` for the missing items instead of dropping them
+            max_buffer (int): maximum number of unmatched items kept for each input
+
+        """
         Task.__init__(self)
         _ProducerMixin.__init__(self)
         _ConsumerMixin.__init__(self)
+        if align is not None and align not in ALIGN_KEYS:
+            raise ValueError(f"align must be one of {ALIGN_KEYS}.")
+        if max_buffer < 1:
+            raise ValueError("max_buffer must be positive.")
+        self.align = align
+        self.tolerance = tolerance
+        self.timeout = timeout
+        self.partial = partial
+        self.max_buffer = max_buffer
+        self.buffers = []
+        self.partial_tuples = 0
+        self.dropped_items = 0
+        # set when an item is put to an input or the task is stopped, see `_receive`
+        self._arrived = threading.Event()
 
     def _inlet(self) -> Generator[Tuple[Any, ...], None, None]:
+        if self.align is not None:
+            yield from self._aligned_inlet()
+            return
         while self._is_running():
             try:
                 results = []
@@ -34,6 +103,99 @@ class Join(Task, _ProducerMixin[Tuple[Any, ...]], _ConsumerMixin[Any]):
             except GeneratorExit:
                 break
 
+    def _buffer(self, n: int, i: Any) -> None:
+        key = getattr(i, self.align, None)  # type: ignore
+        if key is None:
+            # cannot be matched
+            self.dropped_items += 1
+            return
+        buffer = self.buffers[n]
+        if len(buffer) == self.max_buffer:
+            buffer.popleft()
+            self.dropped_items += 1
+        buffer.append(_Pending(key, time.monotonic(), i))
+
+    def _wait_timeout(self) -> float:
+        # until the oldest buffered item times out
+        arrivals = [buffer[0].arrival for buffer in self.buffers if len(buffer) > 0]
+        if self.timeout is None or len(arrivals) == 0:
+            return _WAIT_TIMEOUT
+        return min(_WAIT_TIMEOUT, max(0.0, min(arrivals) + self.timeout - time.monotonic()))
+
+    def _receive(self) -> None:
+        # Cleared before the inputs are looked at, so that an item put from now on ends the wait below.
+        self._arrived.clear()
+        received = False
+        for n, in_queue in enumerate(self.in_queues):
+            while True:
+                try:
+                    i = in_queue.get(block=False)
+                except Empty:
+                    break
+                received = True
+                self.last_progress = time.monotonic()
+                if self._is_expired(i, in_queue):
+                    self.expired_frames += 1
+                else:
+                    self._buffer(n, i)
+        if not received:
+            self._arrived.wait(self._wait_timeout())
+
+    def _discard_expired(self) -> None:
+        # Items are buffered in the order of their capture, so the expired ones are at the heads.
+        for buffer, in_queue in zip(self.buffers, self.in_queues):
+            while len(buffer) > 0 and self._is_expired(buffer[0].value, in_queue):
+                buffer.popleft()
+                self.expired_frames += 1
+
+    def _match(self) -> List[Tuple[Any, ...]]:
+        # The oldest buffered item is the reference. Items of the other inputs within `tolerance` match it.
+        # Since items arrive in order, an input whose oldest item is newer than that will never match.
+        tuples: List[Tuple[Any, ...]] = []
+        self._discard_expired()
+        while True:
+            heads = [buffer[0] for buffer in self.buffers if len(buffer) > 0]
+            if len(heads) == 0:
+                return tuples
+            reference = min(heads, key=lambda head: head.key)
+            matched = [len(buffer) > 0 and buffer[0].key - reference.key <= self.tolerance for buffer in self.buffers]
+            if not all(matched):
+                waiting = any(len(buffer) == 0 for buffer in self.buffers)
+                oldest = min(buffer[0].arrival for (buffer, m) in zip(self.buffers, matched) if m)
+                timed_out = self.timeout is not None and time.monotonic() - oldest > self.timeout
+                if waiting and not timed_out:
+                    return tuples
+            results = tuple(buffer.popleft().value if m else None for (buffer, m) in zip(self.buffers, matched))
+            if all(matched):
+                tuples.append(results)
+            elif self.partial:
+                self.partial_tuples += 1
+                tuples.append(results)
+            else:
+                self.dropped_items += sum(matched)
+
+    def _aligned_inlet(self) -> Generator[Tuple[Any, ...], None, None]:
+        self.buffers = [deque() for _ in self.in_queues]
+        for in_queue in self.in_queues:
+            in_queue._pad._on_transfer.append(self._arrived.set)
+        try:
+            while self._is_running():
+                try:
+                    self._receive()
+                    if not self._is_running():
+                        break
+                    yield from self._match()
+                except GeneratorExit:
+                    break
+        finally:
+            for in_queue in self.in_queues:
+                in_queue._pad._on_transfer.remove(self._arrived.set)
+
+    def stop(self) -> None:
+        """Stop the activity"""
+        super().stop()
+        self._arrived.set()
+
     def run(self) -> None:
         """Run and start the activity"""
         for i in self._inlet():
@@ -1,5 +1,6 @@
 from typing import Generic, TypeVar
 
+from ..trace import _now, _span
 from .consumer import _ConsumerMixin
 from .producer import _ProducerMixin
 from .task import Task
@@ -29,9 +30,12 @@ class Pipe(Generic[T_OUT, T_IN], Task, _ProducerMixin[T_OUT], _ConsumerMixin[T_I
 
     def run(self) -> None:
         """Run and start the activity"""
+        name = f"{type(self).__name__}.proc"
         try:
             for i in self._inlet():
+                t_0 = _now()
                 o = self.proc(i)
+                _span(name, "task", t_0, i)
                 self._outlet(o)
                 if not self._is_running():
                     break
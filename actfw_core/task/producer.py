@@ -1,49 +1,145 @@
+import time
+from enum import Enum, auto
 from queue import Full
-from typing import Generic, List, TypeVar
+from typing import Generic, List, Optional, Tuple, TypeVar
 
+from ..trace import _now, _span
 from ..util.pad import _PadBase, _PadBlocking, _PadIn
 from .consumer import _ConsumerMixin
 from .task import Task, _TaskI
 
 T_OUT = TypeVar("T_OUT")
 
+# Time to wait on the most promising follower before looking at all of them again.
+_DISPATCH_POLL_INTERVAL = 0.005
+
+
+class DispatchMode(Enum):
+    """How a producer hands its outputs to multiple following tasks."""
+
+    # Each follower in turn, waiting for the next one even if another is idle.
+    ROUND_ROBIN = auto()
+    # The first follower that can accept the output, starting from the one after the last used.
+    FIRST_AVAILABLE = auto()
+    # The follower with the fewest outputs queued or being processed.
+    LEAST_LOADED = auto()
+
 
 class _ProducerMixin(Generic[T_OUT], _TaskI):
     out_queues: List[_PadIn[T_OUT]]
     out_queue_id: int
+    dispatch_mode: DispatchMode
+    dispatched: List[int]
+    dispatch_wait: float
 
     def __init__(self) -> None:
         """"""
         self.out_queues = []
         self.out_queue_id = 0
+        self.dispatch_mode = DispatchMode.ROUND_ROBIN
+        self.dispatched = []
+        self.dispatch_wait = 0.0
 
     def _add_out_queue(self, q: _PadIn[T_OUT]) -> None:
         self.out_queues.append(q)
+        self.dispatched.append(0)
+
+    def set_dispatch_mode(self, mode: DispatchMode) -> None:
+        """
+        Set how outputs are handed to the following tasks when more than one is connected.
+
+        Args:
+            mode (:class:`~actfw_core.task.DispatchMode`): dispatch mode (default: `ROUND_ROBIN`)
+        """
+        self.dispatch_mode = mode
+
+    def dispatch_stats(self) -> List[Tuple[int, int, float]]:
+        """
+        Get per-follower dispatch counts and load.
+
+        The time spent waiting for a follower to accept an output is accumulated in `dispatch_wait` [sec].
+
+        Returns:
+            list of (int, int, float): (number of outputs handed to the follower, number of outputs it is processing,
+            fraction of the time since it took the first output in which it was processing outputs)
+        """
+        return [
+            (count, out_queue._pad.in_flight, out_queue._pad.utilization())
+            for (count, out_queue) in zip(self.dispatched, self.out_queues)
+        ]
 
     def _new_pad(self) -> _PadBase[T_OUT]:
         return _PadBlocking()
 
-    def connect(self, follow: _ConsumerMixin[T_OUT]) -> None:
+    def connect(self, follow: _ConsumerMixin[T_OUT], max_frame_age: Optional[float] = None) -> None:
         """
         Connect following task.
+
+        Args:
+            follow : following task
+            max_frame_age (float, optional): discard frames older than this age [sec] at the inlet of the following task
         """
+        self._connect(follow, self._new_pad(), max_frame_age)
+
+    def _connect(self, follow: _ConsumerMixin[T_OUT], pad: _PadBase[T_OUT], max_frame_age: Optional[float]) -> None:
         assert isinstance(follow, _ConsumerMixin)
 
-        pad_out, pad_in = self._new_pad().into_pad_pair()
+        pad_out, pad_in = pad.into_pad_pair()
+        pad_out.max_frame_age = max_frame_age
         follow._add_in_queue(pad_out)
         self._add_out_queue(pad_in)
 
-    def _outlet(self, o: T_OUT) -> bool:
+    def _dispatch_order(self) -> List[int]:
         length = len(self.out_queues)
-        while self._is_running():
+        if self.dispatch_mode == DispatchMode.ROUND_ROBIN:
+            return [self.out_queue_id]
+        order = [(self.out_queue_id + k) % length for k in range(length)]
+        if self.dispatch_mode == DispatchMode.LEAST_LOADED:
+            # stable, so that ties are broken in turn
+            order.sort(key=lambda n: self.out_queues[n].load())
+        return order
+
+    def _dispatched_to(self, n: int) -> None:
+        self.last_progress = time.monotonic()
+        self.dispatched[n] += 1
+        self.out_queue_id = (n + 1) % len(self.out_queues)
+
+    def _dispatch_nowait(self, o: T_OUT) -> bool:
+        for n in self._dispatch_order():
             try:
-                self.out_queues[self.out_queue_id].put(o, timeout=1)
-                self.out_queue_id = (self.out_queue_id + 1) % length
-                return True
+                self.out_queues[n].put(o, block=False)
             except Full:
-                pass
+                continue
+            self._dispatched_to(n)
+            return True
         return False
 
+    def _outlet(self, o: T_OUT) -> bool:
+        start = _now()
+        if self.dispatch_mode != DispatchMode.ROUND_ROBIN and self._dispatch_nowait(o):
+            _span("outlet", "pad", start, o)
+            return True
+        t_0 = time.monotonic()
+        try:
+            while self._is_running():
+                if self.dispatch_mode == DispatchMode.ROUND_ROBIN:
+                    n, timeout = self.out_queue_id, 1.0
+                else:
+                    if self._dispatch_nowait(o):
+                        _span("outlet", "pad", start, o)
+                        return True
+                    n, timeout = self._dispatch_order()[0], _DISPATCH_POLL_INTERVAL
+                try:
+                    self.out_queues[n].put(o, timeout=timeout)
+                    self._dispatched_to(n)
+                    _span("outlet", "pad", start, o)
+                    return True
+                except Full:
+                    pass
+            return False
+        finally:
+            self.dispatch_wait += time.monotonic() - t_0
+
 
 class Producer(Generic[T_OUT], Task, _ProducerMixin[T_OUT]):
     """Producer Task."""
@@ -65,9 +161,12 @@ class Producer(Generic[T_OUT], Task, _ProducerMixin[T_OUT]):
 
     def run(self) -> None:
         """Run and start the activity"""
+        name = f"{type(self).__name__}.proc"
         try:
             while True:
+                t_0 = _now()
                 o = self.proc()
+                _span(name, "task", t_0, o)
                 self._outlet(o)
                 if not self._is_running():
                     break
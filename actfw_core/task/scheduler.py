@@ -0,0 +1,329 @@
+import os
+import selectors
+import threading
+import time
+from queue import Empty, Full
+from typing import Any, Callable, Dict, List, Optional
+
+from ..trace import _now, _span
+from ..util.pad import _PadBase
+from .consumer import _NOTHING, Consumer, _ConsumerMixin
+from .join import Join
+from .pipe import Pipe
+from .producer import Producer, _ProducerMixin
+from .task import Task
+from .tee import Tee
+
+# Tee drops an output for a branch that stays full this long, like `Tee._outlet` does.
+_TEE_PUT_TIMEOUT = 1.0
+
+# Longest wait of an iteration which made no progress. Pads changed by threaded tasks wake the scheduler up earlier;
+# the timeout bounds the latency of `stop`.
+_IDLE_WAIT = 0.1
+
+
+class _TaskState:
+    # output waiting to be delivered, or `_NOTHING`
+    pending: Any
+    pending_since: float
+    delivered: List[bool]
+    partial: List[Any]
+
+    def __init__(self) -> None:
+        self.pending = _NOTHING
+        self.pending_since = 0.0
+        self.delivered = []
+        self.partial = []
+
+
+class _Wakeup:
+    """Self-pipe waking up the scheduler waiting in `select` when another thread puts to or gets from a pad."""
+
+    def __init__(self) -> None:
+        (self.r, self.w) = os.pipe()
+        os.set_blocking(self.r, False)
+        os.set_blocking(self.w, False)
+        self.signaled = False
+        # transfers by the scheduler thread itself are seen by its next iteration
+        self.owner = threading.get_ident()
+
+    def set(self) -> None:
+        if self.signaled or threading.get_ident() == self.owner:
+            return
+        self.signaled = True
+        try:
+            os.write(self.w, b"\0")
+        except BlockingIOError:
+            pass
+
+    def drain(self) -> None:
+        try:
+            os.read(self.r, 4096)
+        except BlockingIOError:
+            pass
+
+    def close(self) -> None:
+        os.close(self.r)
+        os.close(self.w)
+
+
+def _is_steppable(task: Task) -> bool:
+    # Only tasks whose activity is fully described by `proc` can be stepped.
+    # Tasks overriding `run` (e.g. capture producers or Isolated tasks) keep running in their own thread.
+    if isinstance(task, Join):
+        # the aligned mode waits for inputs with timeouts
+        return type(task).run is Join.run and task.align is None
+    if isinstance(task, Tee):
+        return type(task).run is Tee.run
+    if isinstance(task, Pipe):
+        return type(task).run is Pipe.run
+    if isinstance(task, Consumer):
+        return type(task).run is Consumer.run
+    if isinstance(task, Producer):
+        return type(task).run is Producer.run
+    return False
+
+
+def _dependency_order(tasks: List[Task]) -> List[Task]:
+    # Sort tasks so that every producer comes before its followers (Kahn's algorithm).
+    # Edges are found by the pads shared between `out_queues` and `in_queues`.
+    producer_of: Dict[int, Task] = {}
+    for task in tasks:
+        if isinstance(task, _ProducerMixin):
+            for q in task.out_queues:
+                producer_of[id(q._pad)] = task
+    preceding: Dict[int, List[Task]] = {id(task): [] for task in tasks}
+    for task in tasks:
+        if isinstance(task, _ConsumerMixin):
+            for in_queue in task.in_queues:
+                p = producer_of.get(id(in_queue._pad))
+                if p is not None:
+                    preceding[id(task)].append(p)
+
+    ordered: List[Task] = []
+    done = set()
+    remaining = list(tasks)
+    while len(remaining) > 0:
+        ready = [task for task in remaining if all(id(p) in done for p in preceding[id(task)])]
+        if len(ready) == 0:
+            # a cycle; keep the registration order for the rest
+            ready = remaining
+        for task in ready:
+            ordered.append(task)
+            done.add(id(task))
+        remaining = [task for task in remaining if id(task) not in done]
+    return ordered
+
+
+class _CooperativeScheduler:
+    """Run a task graph cooperatively in the calling thread.
+
+    Producers, pipes and consumers are stepped in dependency order: a step calls `proc` once
+    when an input is available and the previous output has been delivered.
+    Followers are stepped before their producers so that the pads are drained first.
+    Inputs are taken and accounted as in the threads of the tasks (see `_ConsumerMixin._inlet_once`).
+
+    Tasks overriding `run` (e.g. captures) are started in their own threads and exchange data through the pads as usual.
+    When no task can make progress, the scheduler sleeps until a pad changed by another thread wakes it up.
+
+    A stepped task raising an exception is reported to `threading.excepthook`, like a task thread dying of it,
+    and is not stepped any more.
+    """
+
+    tasks: List[Task]
+    stepped: List[Task]
+    threaded: List[Task]
+    states: Dict[int, _TaskState]
+    pads: List[_PadBase[Any]]
+    selector: selectors.BaseSelector
+    wakeup: _Wakeup
+    # iterations which made no progress and waited
+    idle_waits: int
+
+    def __init__(self, tasks: List[Task]) -> None:
+        self.tasks = tasks
+        self.stepped = _dependency_order([task for task in tasks if _is_steppable(task)])
+        self.threaded = [task for task in tasks if not _is_steppable(task)]
+        self.states = {id(task): _TaskState() for task in self.stepped}
+        # the pads of the stepped tasks, each once
+        pads: Dict[int, _PadBase[Any]] = {}
+        for task in self.stepped:
+            if isinstance(task, _ConsumerMixin):
+                for in_queue in task.in_queues:
+                    pads[id(in_queue._pad)] = in_queue._pad
+            if isinstance(task, _ProducerMixin):
+                for out_queue in task.out_queues:
+                    pads[id(out_queue._pad)] = out_queue._pad
+        self.pads = list(pads.values())
+        self.selector = selectors.DefaultSelector()
+        self.wakeup = _Wakeup()
+        self.selector.register(self.wakeup.r, selectors.EVENT_READ, None)
+        self.idle_waits = 0
+
+    def _watch_pads(self) -> None:
+        for pad in self.pads:
+            pad._on_transfer.append(self.wakeup.set)
+
+    def _unwatch_pads(self) -> None:
+        for pad in self.pads:
+            pad._on_transfer.remove(self.wakeup.set)
+
+    def run(self, is_running: Callable[[], bool]) -> None:
+        self.wakeup.owner = threading.get_ident()
+        self._watch_pads()
+        for task in self.threaded:
+            task.start()
+        try:
+            while is_running():
+                # Reset before the tasks are stepped: a change signaled from now on wakes up the next wait,
+                # and one signaled before is seen by this iteration.
+                self.wakeup.signaled = False
+                self.wakeup.drain()
+                progress = False
+                for task in reversed(list(self.stepped)):
+                    try:
+                        if self._step(task):
+                            progress = True
+                    except Exception as e:
+                        self._crashed(task, e)
+                        progress = True
+                if not progress:
+                    self.idle_waits += 1
+                    self.selector.select(_IDLE_WAIT)
+        finally:
+            for task in self.threaded:
+                task.stop()
+            for task in self.stepped:
+                task.stop()
+            for task in self.threaded:
+                task.join()
+            self._unwatch_pads()
+            self._cleanup(self.stepped)
+            self.selector.close()
+            self.wakeup.close()
+
+    def _crashed(self, task: Task, e: Exception) -> None:
+        # Same as the thread of the task dying of `e`: its `run` cleans up, and `Application.run` hooks
+        # `threading.excepthook` to record the crash and dump the flight recorder.
+        self.stepped.remove(task)
+        try:
+            self._cleanup([task])
+        except Exception as cleanup_error:
+            e = cleanup_error
+        threading.excepthook(threading.ExceptHookArgs((type(e), e, e.__traceback__, task)))
+
+    def _cleanup(self, tasks: List[Task]) -> None:
+        error: Optional[Exception] = None
+        for task in tasks:
+            cleanup = getattr(task, "cleanup", None)
+            if cleanup is None:
+                continue
+            try:
+                cleanup()
+            except Exception as e:
+                if error is None:
+                    error = e
+        if error is not None:
+            raise error
+
+    def _step(self, task: Task) -> bool:
+        state = self.states[id(task)]
+        if state.pending is not _NOTHING and not self._deliver(task, state):
+            return False
+
+        name = f"{type(task).__name__}.proc"
+        if isinstance(task, Join):
+            i = self._receive_all(task, state)
+            if i is _NOTHING:
+                return False
+            self._emit(task, state, i)
+        elif isinstance(task, Tee):
+            i = self._receive(task)
+            if i is _NOTHING:
+                return False
+            task._processed(1)
+            self._emit(task, state, i)
+        elif isinstance(task, Pipe):
+            i = self._receive(task)
+            if i is _NOTHING:
+                return False
+            t_0 = _now()
+            try:
+                o = task.proc(i)
+            finally:
+                task._processed(1)
+            _span(name, "task", t_0, i)
+            self._emit(task, state, o)
+        elif isinstance(task, Consumer):
+            i = self._receive(task)
+            if i is _NOTHING:
+                return False
+            t_0 = _now()
+            try:
+                task.proc(i)
+            finally:
+                task._processed(1)
+            _span(name, "task", t_0, i)
+        elif isinstance(task, Producer):
+            t_0 = _now()
+            o = task.proc()
+            _span(name, "task", t_0, o)
+            self._emit(task, state, o)
+        return True
+
+    def _receive(self, task: _ConsumerMixin[Any]) -> Any:
+        # `_inlet_once` without blocking, skipping expired inputs.
+        while True:
+            expired_frames = task.expired_frames
+            i = task._inlet_once(0)
+            if i is not _NOTHING or task.expired_frames == expired_frames:
+                return i
+
+    def _receive_all(self, task: Join, state: _TaskState) -> Any:
+        # Same as `Join._inlet`: one item from each input in turn.
+        while len(state.partial) < len(task.in_queues):
+            try:
+                state.partial.append(task.in_queues[len(state.partial)].get(block=False))
+            except Empty:
+                return _NOTHING
+            task.last_progress = time.monotonic()
+        results = tuple(state.partial)
+        state.partial = []
+        return results
+
+    def _emit(self, task: Task, state: _TaskState, o: Any) -> None:
+        assert isinstance(task, _ProducerMixin)
+        state.pending = o
+        state.pending_since = time.monotonic()
+        state.delivered = [False] * len(task.out_queues)
+        self._deliver(task, state)
+
+    def _deliver(self, task: Task, state: _TaskState) -> bool:
+        assert isinstance(task, _ProducerMixin)
+        length = len(task.out_queues)
+        if length == 0:
+            state.pending = _NOTHING
+            return True
+        start = _now()
+        if isinstance(task, Tee):
+            expired = time.monotonic() - state.pending_since > _TEE_PUT_TIMEOUT
+            for n, out_queue in enumerate(task.out_queues):
+                if state.delivered[n]:
+                    continue
+                try:
+                    out_queue.put(state.pending, block=False)
+                    state.delivered[n] = True
+                    task.sent[n] += 1
+                except Full:
+                    if expired:
+                        state.delivered[n] = True
+                        task.timed_out[n] += 1
+            if not all(state.delivered):
+                return False
+            task.last_progress = time.monotonic()
+        else:
+            if not task._dispatch_nowait(state.pending):
+                return False
+        _span("outlet", "pad", start, state.pending)
+        state.pending = _NOTHING
+        return True
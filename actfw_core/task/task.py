@@ -1,8 +1,17 @@
+import os
+import sys
+import time
 from abc import ABC, abstractmethod
 from threading import Thread
+from typing import Iterable, Optional, Set
+
+from .. import flight_recorder
 
 
 class _TaskI(ABC):
+    # time.monotonic() when the task last received or sent an item
+    last_progress: float = 0.0
+
     @abstractmethod
     def _is_running(self) -> bool:
         pass
@@ -10,6 +19,8 @@ class _TaskI(ABC):
 
 class Task(Thread, _TaskI):
     running: bool
+    affinity: Optional[Set[int]]
+    nice: Optional[int]
 
     """Actcast Application Task"""
 
@@ -18,12 +29,65 @@ class Task(Thread, _TaskI):
         Thread.__init__(self)
 
         self.running = True
+        self.affinity = None
+        self.nice = None
 
     def _is_running(self) -> bool:
         return self.running
 
+    def set_scheduling(self, affinity: Optional[Iterable[int]] = None, nice: Optional[int] = None) -> None:
+        """
+        Set CPU affinity and nice value of the task's thread.
+
+        They are applied by the task's thread itself before it calls `run`.
+        Failures (e.g. lowering the nice value without permission) are reported to stderr and ignored.
+
+        Args:
+            affinity (iterable of int, optional): CPUs the thread may run on (default: inherited)
+            nice (int, optional): nice value of the thread (default: inherited)
+        """
+        self.affinity = set(affinity) if affinity is not None else None
+        self.nice = nice
+
+    def start(self) -> None:
+        """Start the thread, which names itself after the task class and applies the scheduling settings"""
+        self.last_progress = time.monotonic()
+        Thread.start(self)
+        flight_recorder.record("task", f"{self.name} ({type(self).__name__}) started")
+
+    def _bootstrap_inner(self) -> None:
+        # The entry point of the task's thread, which calls `run`. The thread is set up first, so that the task never
+        # runs with the inherited settings. Tasks stepped by the cooperative scheduler are not started and keep its thread.
+        self._set_native_name()
+        self._apply_scheduling()
+        super()._bootstrap_inner()  # type: ignore[misc]
+
+    def _set_native_name(self) -> None:
+        # Name the native thread after the task class, so that tools like `top -H` can tell tasks apart.
+        # Linux limits the name to 15 bytes.
+        try:
+            with open("/proc/thread-self/comm", "w") as f:
+                f.write(type(self).__name__[:15])
+        except OSError:
+            pass
+
+    def _apply_scheduling(self) -> None:
+        # 0 means the calling thread
+        if self.affinity is not None:
+            try:
+                os.sched_setaffinity(0, self.affinity)
+            except (AttributeError, OSError) as e:
+                print(f"Failed to set CPU affinity of {self.name}: {e}", file=sys.stderr, flush=True)
+        if self.nice is not None:
+            try:
+                os.setpriority(os.PRIO_PROCESS, 0, self.nice)
+            except (AttributeError, OSError) as e:
+                print(f"Failed to set nice value of {self.name}: {e}", file=sys.stderr, flush=True)
+
     def stop(self) -> None:
         """Stop the activity"""
+        if self.running:
+            flight_recorder.record("task", f"{self.name} ({type(self).__name__}) stopping")
         self.running = False
 
     def run(self) -> None:
@@ -1,31 +1,118 @@
+import time
+from enum import Enum, auto
 from queue import Full
-from typing import Generic, TypeVar
+from typing import Generic, List, Optional, Tuple, TypeVar
 
+from ..trace import _now, _span
+from ..util.pad import _PadBase, _PadBlocking, _PadBounded, _PadDiscardingOld
 from .consumer import _ConsumerMixin
 from .producer import _ProducerMixin
 from .task import Task
 
 T = TypeVar("T")
 
+# Total time to wait for the `BLOCK` branches to accept an output.
+_BLOCK_TIMEOUT = 1.0
+
+
+class TeePolicy(Enum):
+    """Delivery policy of a Tee branch."""
+
+    # Wait until the branch accepts the output, up to 1 sec shared by all blocking branches.
+    BLOCK = auto()
+    # Keep only the latest output for the branch.
+    LATEST = auto()
+    # Keep up to `queue_size` outputs for the branch, discarding the oldest.
+    QUEUE = auto()
+
 
 class Tee(Generic[T], Task, _ProducerMixin[T], _ConsumerMixin[T]):
-    """Tee Task."""
+    policies: List[TeePolicy]
+    # number of outputs put into the pad of each branch, including the ones the pad discarded later
+    sent: List[int]
+    timed_out: List[int]
+
+    """Tee Task.
+
+    Every output is shared by reference among the branches; it is not copied.
+    Branches with `LATEST` or `QUEUE` policy never wait, so a slow branch of these policies does not delay the others.
+    """
 
     def __init__(self) -> None:
         """"""
         Task.__init__(self)
         _ProducerMixin.__init__(self)
         _ConsumerMixin.__init__(self)
+        self.policies = []
+        self.sent = []
+        self.timed_out = []
+
+    def connect(
+        self,
+        follow: _ConsumerMixin[T],
+        max_frame_age: Optional[float] = None,
+        policy: TeePolicy = TeePolicy.BLOCK,
+        queue_size: int = 1,
+    ) -> None:
+        """
+        Connect following task.
+
+        Args:
+            follow : following task
+            max_frame_age (float, optional): discard frames older than this age [sec] at the inlet of the following task
+            policy (:class:`~actfw_core.task.TeePolicy`): delivery policy of this branch
+            queue_size (int): number of outputs kept for this branch with `QUEUE` policy
+        """
+        pad: _PadBase[T]
+        if policy == TeePolicy.BLOCK:
+            pad = _PadBlocking()
+        elif policy == TeePolicy.LATEST:
+            pad = _PadDiscardingOld()
+        elif policy == TeePolicy.QUEUE:
+            if queue_size < 1:
+                raise ValueError("queue_size must be positive.")
+            pad = _PadBounded(queue_size)
+        else:
+            raise ValueError(f"unknown policy: {policy}")
+        self._connect(follow, pad, max_frame_age)
+        self.policies.append(policy)
+        self.sent.append(0)
+        self.timed_out.append(0)
+
+    def branch_stats(self) -> List[Tuple[TeePolicy, int, int]]:
+        """
+        Get per-branch delivery counts.
+
+        Returns:
+            list of (:class:`~actfw_core.task.TeePolicy`, int, int): (policy, number of delivered outputs, number of dropped outputs)
+        """
+        return [
+            (policy, sent - out_queue._pad.discarded, timed_out + out_queue._pad.discarded)
+            for (policy, sent, timed_out, out_queue) in zip(self.policies, self.sent, self.timed_out, self.out_queues)
+        ]
 
     def _outlet(self, o: T) -> bool:
-        while self._is_running():
-            for out_queue in self.out_queues:
-                try:
-                    out_queue.put(o, timeout=1)
-                except Full:
-                    pass
-            return True
-        return False
+        if not self._is_running():
+            return False
+        start = _now()
+        self.last_progress = time.monotonic()
+        # Non-blocking branches first, so that they never wait for the blocking ones.
+        blocking = []
+        for n, out_queue in enumerate(self.out_queues):
+            if self.policies[n] == TeePolicy.BLOCK:
+                blocking.append(n)
+            else:
+                out_queue.put(o)
+                self.sent[n] += 1
+        deadline = time.monotonic() + _BLOCK_TIMEOUT
+        for n in blocking:
+            try:
+                self.out_queues[n].put(o, timeout=max(0.0, deadline - time.monotonic()))
+                self.sent[n] += 1
+            except Full:
+                self.timed_out[n] += 1
+        _span("outlet", "pad", start, o)
+        return True
 
     def run(self) -> None:
         """Run and start the activity"""
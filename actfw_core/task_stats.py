@@ -0,0 +1,183 @@
+import csv
+import json
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, fields
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from .task import Task
+
+
+@dataclass
+class TaskSample:
+    """CPU and memory usage of a task's thread over a sampling interval."""
+
+    time: float
+    task: str
+    tid: int
+    cpu_percent: float
+    voluntary_ctxt_switches: int
+    nonvoluntary_ctxt_switches: int
+    rss: int
+
+
+def _read_cpu_ticks(tid: int) -> int:
+    with open(f"/proc/self/task/{tid}/stat") as f:
+        stat = f.read()
+    # `comm` may contain spaces; the fields after it are separated by spaces.
+    fields = stat[stat.rindex(")") + 2 :].split()
+    # utime and stime are the 14th and 15th fields of the whole line.
+    return int(fields[11]) + int(fields[12])
+
+
+def _read_ctxt_switches(tid: int) -> Tuple[int, int]:
+    voluntary = nonvoluntary = 0
+    with open(f"/proc/self/task/{tid}/status") as f:
+        for line in f:
+            if line.startswith("voluntary_ctxt_switches:"):
+                voluntary = int(line.split()[1])
+            elif line.startswith("nonvoluntary_ctxt_switches:"):
+                nonvoluntary = int(line.split()[1])
+    return (voluntary, nonvoluntary)
+
+
+def _read_rss() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+class TaskStatsSampler:
+    """Sample per-thread CPU usage and context switches of tasks, and RSS of the process.
+
+    Samples are read from `/proc/self/task/<tid>` every `interval` seconds in a daemon thread,
+    and the latest `history` samples of each task are kept.
+    """
+
+    interval: float
+    samples: Deque[TaskSample]
+
+    def __init__(self, tasks: Callable[[], List[Task]], interval: float = 1.0, history: int = 3600) -> None:
+        """
+
+        Args:
+            tasks (function): returns the tasks to sample
+            interval (float): sampling interval [sec]
+            history (int): number of samples kept for each task
+
+        """
+        self._tasks = tasks
+        self.interval = interval
+        self._history = history
+        self.samples = deque()
+        self._previous: Dict[int, Tuple[float, int, int, int]] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._clock_ticks = os.sysconf("SC_CLK_TCK")
+
+    def start(self) -> None:
+        """Start sampling in a daemon thread"""
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._loop, name="TaskStatsSampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+    def sample(self) -> List[TaskSample]:
+        """
+        Take a sample of every running task now.
+
+        The first call for a task only records the baseline and returns no sample for it.
+
+        Returns:
+            list of :class:`TaskSample`: new samples
+        """
+        now = time.time()
+        try:
+            rss = _read_rss()
+        except OSError:
+            return []
+        new = []
+        previous_by_tid = self._previous
+        self._previous = {}
+        for task in self._tasks():
+            tid = task.native_id
+            if tid is None or not task.is_alive():
+                continue
+            try:
+                ticks = _read_cpu_ticks(tid)
+                voluntary, nonvoluntary = _read_ctxt_switches(tid)
+            except OSError:
+                # the thread has exited
+                continue
+            previous = previous_by_tid.get(tid)
+            self._previous[tid] = (now, ticks, voluntary, nonvoluntary)
+            if previous is None:
+                continue
+            (t_0, ticks_0, voluntary_0, nonvoluntary_0) = previous
+            elapsed = now - t_0
+            cpu_percent = 100.0 * (ticks - ticks_0) / self._clock_ticks / elapsed if elapsed > 0 else 0.0
+            new.append(
+                TaskSample(
+                    time=now,
+                    task=type(task).__name__,
+                    tid=tid,
+                    cpu_percent=cpu_percent,
+                    voluntary_ctxt_switches=voluntary - voluntary_0,
+                    nonvoluntary_ctxt_switches=nonvoluntary - nonvoluntary_0,
+                    rss=rss,
+                )
+            )
+        with self._lock:
+            self.samples.extend(new)
+            max_samples = self._history * max(1, len(self._previous))
+            while len(self.samples) > max_samples:
+                self.samples.popleft()
+        return new
+
+    def get_samples(self, task: Optional[str] = None) -> List[TaskSample]:
+        """
+        Get the kept samples in time order.
+
+        Args:
+            task (str, optional): class name of the tasks to get samples of (default: all tasks)
+
+        Returns:
+            list of :class:`TaskSample`: samples
+        """
+        with self._lock:
+            return [sample for sample in self.samples if task is None or sample.task == task]
+
+    def dump(self, path: str, format: Optional[str] = None) -> None:
+        """
+        Write the kept samples to a file.
+
+        Args:
+            path (str): output file path
+            format (str, optional): 'csv' or 'json' (default: inferred from the extension of `path`, 'csv' otherwise)
+        """
+        if format is None:
+            format = "json" if path.endswith(".json") else "csv"
+        samples = self.get_samples()
+        if format == "json":
+            with open(path, "w") as f:
+                json.dump([asdict(sample) for sample in samples], f)
+        elif format == "csv":
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow([field.name for field in fields(TaskSample)])
+                for sample in samples:
+                    writer.writerow(list(asdict(sample).values()))
+        else:
+            raise ValueError("format must be 'csv' or 'json'.")
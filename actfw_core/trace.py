@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# (name, category, start [ns], duration [ns], native thread id, sequence number of the frame)
+_Span = Tuple[str, str, int, int, int, Optional[int]]
+
+
+class Tracer:
+    """Record spans of frame processing in a fixed-size ring buffer.
+
+    The spans can be written as Chrome trace event JSON, which can be opened with Perfetto (https://ui.perfetto.dev)
+    or `chrome://tracing`.
+    """
+
+    capacity: int
+    spans: Deque[_Span]
+    thread_names: Dict[int, str]
+
+    def __init__(self, capacity: int = 65536) -> None:
+        """
+
+        Args:
+            capacity (int): maximum number of spans kept; the oldest ones are discarded first
+
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be positive.")
+        self.capacity = capacity
+        self.spans = deque(maxlen=capacity)
+        self.thread_names = {}
+
+    def record(self, name: str, category: str, start: int, end: int, sequence: Optional[int] = None) -> None:
+        """
+        Record a span of the calling thread.
+
+        Args:
+            name (str): span name
+            category (str): span category
+            start (int): start time [ns] (`time.monotonic_ns()`)
+            end (int): end time [ns] (`time.monotonic_ns()`)
+            sequence (int, optional): sequence number of the frame being processed
+        """
+        tid = threading.get_native_id()
+        if tid not in self.thread_names:
+            thread = threading.current_thread()
+            self.thread_names[tid] = type(thread).__name__ if type(thread) is not threading.Thread else thread.name
+        # deque.append is atomic, so no lock is needed.
+        self.spans.append((name, category, start, end - start, tid, sequence))
+
+    def clear(self) -> None:
+        """Discard all recorded spans"""
+        self.spans.clear()
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """
+        Get the recorded spans as Chrome trace events.
+
+        Returns:
+            dict: JSON object format of Chrome trace events
+        """
+        pid = os.getpid()
+        events: List[Dict[str, Any]] = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for (tid, name) in list(self.thread_names.items())
+        ]
+        for name, category, start, duration, tid, sequence in list(self.spans):
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": start / 1000,
+                "dur": duration / 1000,
+                "pid": pid,
+                "tid": tid,
+            }
+            if sequence is not None:
+                event["args"] = {"sequence": sequence}
+            events.append(event)
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: str) -> None:
+        """
+        Write the recorded spans to a file as Chrome trace event JSON.
+
+        Args:
+            path (str): output file path
+        """
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
+
+
+_tracer: Optional[Tracer] = None
+
+
+def enable_tracing(capacity: int = 65536) -> Tracer:
+    """
+    Start recording spans of tasks, pads and captures.
+
+    Args:
+        capacity (int): maximum number of spans kept
+
+    Returns:
+        :class:`Tracer`: tracer recording the spans
+    """
+    global _tracer
+    _tracer = Tracer(capacity)
+    return _tracer
+
+
+def disable_tracing() -> None:
+    """Stop recording spans"""
+    global _tracer
+    _tracer = None
+
+
+def get_tracer() -> Optional[Tracer]:
+    """
+    Get the active tracer.
+
+    Returns:
+        :class:`Tracer`: tracer, or None if tracing is disabled
+    """
+    return _tracer
+
+
+def _now() -> int:
+    return time.monotonic_ns()
+
+
+def _span(name: str, category: str, start: int, item: Any = None) -> None:
+    # Record a span from `start` to now. This is a no-op when tracing is disabled.
+    tracer = _tracer
+    if tracer is None:
+        return
+    tracer.record(name, category, start, time.monotonic_ns(), getattr(item, "sequence", None))
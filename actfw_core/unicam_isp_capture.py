@@ -1,17 +1,29 @@
 import json
 import mmap
+import os
 import select
-from ctypes import POINTER, c_int16, c_void_p, cast, pointer, sizeof
-from dataclasses import dataclass
+import threading
+from array import array
+from bisect import bisect_right
+from ctypes import addressof, c_void_p, cast, memmove, pointer, sizeof, string_at
+from dataclasses import asdict, dataclass
 from enum import Enum, auto
-from math import floor
+from itertools import accumulate
+from math import inf
+from operator import mul
 from os import path
-from typing import Any, Dict, List, Optional, Tuple, Union
+from queue import Empty
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
+from actfw_core import flight_recorder
 from actfw_core.autofocus import AutoFocuserBase
-from actfw_core.capture import Frame
+from actfw_core.capture import CaptureStats, Frame
+from actfw_core.isp_recording import RecordedBuffer, RecordKind, StatsRecord, StatsRecorder
+from actfw_core.isp_stats import ClippedRegionSums, IspStatsView
+from actfw_core.lens_shading import BilinearWeight, bilinear_weights, pack_gains, resample_table
 from actfw_core.linux.dma_heap import DMAHeap  # type: ignore
 from actfw_core.task import Producer
+from actfw_core.trace import _now, _span
 from actfw_core.v4l2.types import (
     AWB_REGIONS,
     CONTRAST_NUM_POINTS,
@@ -39,12 +51,23 @@ from .util.pad import _PadBase, _PadDiscardingOld
 _EMPTY_LIST: List[str] = []
 
 AGC_INTERVAL: int = 3
+CAPTURE_TIMEOUT = 1
+# Interval [sec] at which the control thread checks whether the capture is stopped.
+_CONTROL_POLL_INTERVAL = 0.1
+# Number of sensor sequence numbers kept for frames in the ISP, looked up by timestamp.
+_MAX_PENDING_SEQUENCES = 32
+PIPELINE_BITS = 13  # https://github.com/kbingham/libcamera/blob/f995ff25a3326db90513d1fa936815653f7cade0/src/ipa/raspberrypi/controller/rpi/agc.cpp#L31 # noqa: E501, B950
 # TODO: support other than imx219
 # pick from https://github.com/kbingham/libcamera/blob/22ffeae04de2e7ce6b2476a35233c790beafb67f/src/ipa/raspberrypi/data/imx219.json#L132-L142 # noqa: E501, B950
 
 MAX_LS_GRID_SIZE = 0x8000
 LS_TABLE_W = 16
 LS_TABLE_H = 12
+LS_GRID_CACHE_SIZE = 32
+# change [1/1000] of the red and blue gains below which they are not written
+AWB_GAIN_HYSTERESIS = 2
+# change [16-bit level] of the histogram quantiles below which the gamma curve is not updated
+CONTRAST_HYSTERESIS = 256
 
 
 # correspond to [libcamera's CameraMode](https://github.com/raspberrypi/libcamera/blob/3fad116f89e0d3497567043cbf6d8c49f1c102db/src/ipa/raspberrypi/controller/camera_mode.h#L19) # noqa: E501, B950
@@ -103,6 +126,37 @@ class _DeviceStatus:
     hflip: bool = False
 
 
+def _quantiles_moved(quantiles: Optional[Tuple[float, ...]], applied: Optional[Tuple[float, ...]]) -> bool:
+    if quantiles is None or applied is None:
+        return quantiles is not applied
+    return any(abs(q - a) > CONTRAST_HYSTERESIS for (q, a) in zip(quantiles, applied))
+
+
+def _load_sensor_config(config_file: str, config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    # config precedence: default < sensor specific < user given
+    with open(path.join(path.dirname(__file__), "data", config_file), "r") as f:
+        sensor_config: Dict[str, Any] = json.load(f)
+    sensor_config.update(config or {})
+    return sensor_config
+
+
+@dataclass
+class _LsGrid:
+    # normalized LS_TABLE_W x LS_TABLE_H tables of R, G and B
+    tables: Tuple[List[float], List[float], List[float]]
+    # U4P10 gains of the 4 planes of the grid
+    gains: "array[int]"
+    cell_size: int
+    width: int
+    height: int
+
+
+@dataclass
+class _StatsSnapshot:
+    stats: bcm2835_isp_stats
+    sequence: int
+
+
 class UnicamIspCapture(Producer[Frame[bytes]]):
     def __init__(
         self,
@@ -131,18 +185,37 @@ class UnicamIspCapture(Producer[Frame[bytes]]):
         shutter_time: Union[float, Auto] = Auto.AUTO,
         analogue_gain: Union[float, Auto] = Auto.AUTO,
         auto_focuser: Optional[AutoFocuserBase] = None,
+        stats_record: Optional[str] = None,
     ) -> None:
-        super().__init__()
+        sensor_name = self.__get_sensor_name(unicam_subdev)
+        if sensor_name not in ["imx708", "imx219", "ov5647"]:
+            raise RuntimeError(f"not supported sensor: {sensor_name}")
+        if sensor_name == "imx708":
+            config_file = self.__get_subdevice_name(unicam_subdev) + ".json"
+        else:
+            config_file = sensor_name + ".json"
+        sensor_config = self.__init_controls(
+            sensor_name,
+            config_file,
+            config,
+            auto_focuser,
+            auto_whitebalance=auto_whitebalance,
+            agc=agc,
+            contrast=contrast,
+            alsc=alsc,
+            shutter_time=shutter_time,
+            analogue_gain=analogue_gain,
+            target_Y=target_Y,
+            vflip=vflip,
+            hflip=hflip,
+            color_temperature=default_color_temperature,
+        )
 
         self.dma_buffer_num = 4
         self.unicam_meta_buffer_num = 12
         self.isp_out_buffer_num = 4
         self.isp_out_metadata_buffer_num = 2
         self.shared_dma_fds: List[int] = []
-        self.sensor_name = self.__get_sensor_name(unicam_subdev)
-        self.auto_focuser = auto_focuser
-        if self.sensor_name not in ["imx708", "imx219", "ov5647"]:
-            raise RuntimeError(f"not supported sensor: {self.sensor_name}")
         self.unicam = RawVideo(
             unicam,
             v4l2_buf_type=V4L2_BUF_TYPE.VIDEO_CAPTURE,
@@ -187,21 +260,10 @@ class UnicamIspCapture(Producer[Frame[bytes]]):
             v4l2_buf_type=V4L2_BUF_TYPE.META_CAPTURE,
             init_controls=init_controls,
         )
-        self.do_awb = auto_whitebalance
-        self.do_agc = agc
-        self.do_contrast = contrast
-        self.do_alsc = alsc
-
         (self.expected_width, self.expected_height) = size
         self.expected_pix_format = expected_format
         self.expected_fps = framerate
 
-        self.shutter_time = shutter_time
-        self.analogue_gain = analogue_gain
-
-        if not agc and (shutter_time == Auto.AUTO or analogue_gain == Auto.AUTO):
-            raise RuntimeError("shutter_time and analogue_gain cannot be AUTO when agc is disabled")
-
         if unicam_size is not None and crop_size is not None:
             matched_modes = list(filter(lambda mode: mode.size == unicam_size, V2_UNICAM_MODES))
             if len(matched_modes) == 0:
@@ -219,58 +281,12 @@ class UnicamIspCapture(Producer[Frame[bytes]]):
         else:
             raise RuntimeError("Both unicam_size and crop_size must be None or tuples.")
 
-        # control values
-        if self.sensor_name == "imx708":
-            config_file = self.__get_subdevice_name(unicam_subdev) + ".json"
-        else:
-            config_file = self.sensor_name + ".json"
-        # config precedence: default < sensor specific < user given
-        with open(path.join(path.dirname(__file__), "data", config_file), "r") as f:
-            sensor_config = json.load(f)
-        sensor_config.update(config or {})
-
-        # black level config
-        _bl = sensor_config.get("rpi.black_level", {})
-        self.black_level: int = _bl.get("black_level", 4096)
-
-        # lux config
-        _lx = sensor_config.get("rpi.lux", {})
-        self.reference_shutter_speed: float = _lx.get("reference_shutter_speed", 27685.0)
-        self.reference_gain: float = _lx.get("reference_gain", 1.0)
-        self.reference_aperture: float = _lx.get("reference_aperture", 1.0)
-        self.reference_lux: float = _lx.get("reference_lux", 998.0)
-        self.reference_Y: float = _lx.get("reference_Y", 12744.0)
-        self.aperture: float = 1.0
-        # - update by agc
-        _ag = sensor_config.get("rpi.agc", {})
-        _ag = _ag["channels"][0] if "channels" in _ag else _ag
-        self.shutters = _ag.get("exposure_modes", {}).get("normal", {}).get("shutter")
-        self.gains = _ag.get("exposure_modes", {}).get("normal", {}).get("gain")
-        self.device_status = _DeviceStatus(vflip=vflip, hflip=hflip)
-        self.exposure: float = 100  # `shutter speed(us)` * `analogue gain`
-        self.degital_gain: float = 1.0  # Currently, this value is constant.
-        self.agc_interval_count: int = 0
-        self.target_Y: float = target_Y
-        # - update by contrast
-        _cr = sensor_config.get("rpi.contrast", {})
-        self.ce_enable = _cr.get("ce_enable", True)
-        self.brightness: float = _cr.get("brightness", 0.0)
-        self.contrast: float = _cr.get("contrast", 1.0)
-        self.lo_histogram: float = _cr.get("hi_histogram", 0.01)
-        self.lo_level: float = _cr.get("lo_level", 0.015)
-        self.lo_max: int = _cr.get("lo_max", 500)
-        self.hi_histogram: float = _cr.get("hi_histogram", 0.95)
-        self.hi_level: float = _cr.get("hi_level", 0.95)
-        self.hi_max: int = _cr.get("hi_max", 0.95)
-        gamma_curve = _cr["gamma_curve"]
-        self.gamma_curve: List[Tuple[float, float]] = [
-            (gamma_curve[2 * n], gamma_curve[2 * n + 1]) for n in range(0, len(gamma_curve) // 2)
-        ]
-
-        self.color_temperature = default_color_temperature
-
         # - update by alsc
-        self.ls_table_dma_heap_fd = DMAHeap("/dev/dma_heap/linux,cma").alloc("_ls_grid", MAX_LS_GRID_SIZE)
+        dma_heap = DMAHeap("/dev/dma_heap/linux,cma")
+        try:
+            self.ls_table_dma_heap_fd = dma_heap.alloc("_ls_grid", MAX_LS_GRID_SIZE)
+        finally:
+            dma_heap.close()
         self.ls_table_mm = mmap.mmap(
             self.ls_table_dma_heap_fd,
             MAX_LS_GRID_SIZE,
@@ -282,21 +298,14 @@ class UnicamIspCapture(Producer[Frame[bytes]]):
         self.calibrations_Cb: List[Dict[str, Any]] = _alsc["calibrations_Cb"]
         self.luminace_lut: List[float] = _alsc["luminance_lut"]
         self.luminace_strength: float = _alsc["luminance_strength"]
+        # lens shading grids keyed by (colour temperature, camera mode)
+        self.ls_grid_cache: Dict[Tuple[float, CameraMode], _LsGrid] = {}
 
         # setup
-        self.converter = V4LConverter(self.isp_out_high.device_fd)
+        self.converter = V4LConverter(self.isp_out_high.device_fd, backend=self.isp_out_high.backend)
         self.__setup_pipeline()
         # autofocus
-        if self.auto_focuser is not None:
-            self.auto_focuser.set_unicam_config(
-                sensor_config,
-                unicam_width=self.unicam_width,
-                sensor_size=SENSOR_SIZE_MAP[self.sensor_name],
-                post_crop_size=self.crop_size,
-                camera_mode_scale=self.camera_mode.scale,
-                camera_mode_crop_size=self.camera_mode.crop,
-                callback_fn=self.__set_focus_absolute,
-            )
+        self.__set_up_auto_focuser(sensor_config)
         self.output_fmt = self.converter.try_convert(
             self.isp_out_high.fmt,
             self.expected_width,
@@ -305,6 +314,118 @@ class UnicamIspCapture(Producer[Frame[bytes]]):
         )
 
         self.__request_buffer()
+        # sensor sequence numbers of the frames in the ISP by timestamp (sec, usec)
+        self._sensor_sequences: Dict[Tuple[int, int], int] = {}
+        self.stats_recorder = StatsRecorder(stats_record, self.__recording_setup()) if stats_record is not None else None
+
+    @classmethod
+    def _replaying(
+        cls,
+        setup: Dict[str, Any],
+        isp_in: RawVideo,
+        unicam_subdev: RawVideo,
+        unicam_subdev_meta: RawVideo,
+        auto_focuser: Optional[AutoFocuserBase] = None,
+    ) -> "UnicamIspCapture":
+        # Create a capture without devices, whose 3A and autofocus take recorded buffers by `_replay_record`.
+        # The given devices only take control writes. See `actfw_core.isp_replay`.
+        self = cls.__new__(cls)
+        sensor_config = self.__init_controls(
+            setup["sensor_name"],
+            setup["config_file"],
+            setup["config"],
+            auto_focuser,
+            auto_whitebalance=setup["auto_whitebalance"],
+            agc=setup["agc"],
+            contrast=setup["contrast"],
+            alsc=False,
+            shutter_time=Auto.AUTO if setup["shutter_time"] is None else setup["shutter_time"],
+            analogue_gain=Auto.AUTO if setup["analogue_gain"] is None else setup["analogue_gain"],
+            target_Y=setup["target_Y"],
+            vflip=False,
+            hflip=False,
+            color_temperature=setup["color_temperature"],
+        )
+        self.isp_in = isp_in
+        self.unicam_subdev = unicam_subdev
+        self.unicam_subdev_meta = unicam_subdev_meta
+        self.camera_mode = CameraMode(**{key: tuple(value) for (key, value) in setup["camera_mode"].items()})
+        self.crop_size = tuple(setup["crop_size"])
+        self.unicam_width = setup["unicam_width"]
+        self.device_status = _DeviceStatus(**setup["device_status"])
+        self.exposure = setup["exposure"]
+        self.__set_up_auto_focuser(sensor_config)
+        self.stats_recorder = None
+        return self
+
+    def __init_controls(
+        self,
+        sensor_name: str,
+        config_file: str,
+        config: Optional[Dict[str, Any]],
+        auto_focuser: Optional[AutoFocuserBase],
+        *,
+        auto_whitebalance: bool,
+        agc: bool,
+        contrast: bool,
+        alsc: bool,
+        shutter_time: Union[float, Auto],
+        analogue_gain: Union[float, Auto],
+        target_Y: float,
+        vflip: bool,
+        hflip: bool,
+        color_temperature: float,
+    ) -> Dict[str, Any]:
+        # Set up the state independent of the devices, shared by `__init__` and `_replaying`.
+        # Returns the sensor config.
+        super().__init__()
+        self.stats = CaptureStats()
+        self.sensor_name = sensor_name
+        self.auto_focuser = auto_focuser
+        self.do_awb = auto_whitebalance
+        self.do_agc = agc
+        self.do_contrast = contrast
+        self.do_alsc = alsc
+
+        self.shutter_time = shutter_time
+        self.analogue_gain = analogue_gain
+
+        if not agc and (shutter_time == Auto.AUTO or analogue_gain == Auto.AUTO):
+            raise RuntimeError("shutter_time and analogue_gain cannot be AUTO when agc is disabled")
+
+        # control values
+        self.config_file = config_file
+        self.config = config
+        sensor_config = _load_sensor_config(config_file, config)
+        self.__load_control_config(sensor_config, target_Y, vflip, hflip)
+        self.color_temperature = color_temperature
+
+        # statistics consumed by the control thread
+        self._stats_snapshots: _PadDiscardingOld[_StatsSnapshot] = _PadDiscardingOld()
+        self._control_error: Optional[Exception] = None
+        # set when the capture loop has finished, which ends the control thread
+        self._capture_finished = threading.Event()
+        return sensor_config
+
+    def __recording_setup(self) -> Dict[str, Any]:
+        # what `_replaying` needs to run the 3A algorithms as this capture does
+        return {
+            "sensor_name": self.sensor_name,
+            "config_file": self.config_file,
+            "config": self.config,
+            "camera_mode": asdict(self.camera_mode),
+            "crop_size": self.crop_size,
+            "unicam_width": self.unicam_width,
+            "auto_whitebalance": self.do_awb,
+            "agc": self.do_agc,
+            "contrast": self.do_contrast,
+            "shutter_time": None if self.shutter_time == Auto.AUTO else self.shutter_time,
+            "analogue_gain": None if self.analogue_gain == Auto.AUTO else self.analogue_gain,
+            "target_Y": self.target_Y,
+            "device_status": asdict(self.device_status),
+            "exposure": self.exposure,
+            "color_temperature": self.color_temperature,
+        }
 
     def set_exposure_settings(self, shutter_time: Union[float, Auto], analogue_gain: Union[float, Auto]) -> None:
         """Set shutter_time and analogue_gain.
@@ -338,6 +459,61 @@ class UnicamIspCapture(Producer[Frame[bytes]]):
             subdevice_name = f.read()
         return subdevice_name.rstrip()
 
+    def __load_control_config(self, sensor_config: Dict[str, Any], target_Y: float, vflip: bool, hflip: bool) -> None:
+        # black level config
+        _bl = sensor_config.get("rpi.black_level", {})
+        self.black_level: int = _bl.get("black_level", 4096)
+
+        # lux config
+        _lx = sensor_config.get("rpi.lux", {})
+        self.reference_shutter_speed: float = _lx.get("reference_shutter_speed", 27685.0)
+        self.reference_gain: float = _lx.get("reference_gain", 1.0)
+        self.reference_aperture: float = _lx.get("reference_aperture", 1.0)
+        self.reference_lux: float = _lx.get("reference_lux", 998.0)
+        self.reference_Y: float = _lx.get("reference_Y", 12744.0)
+        self.aperture: float = 1.0
+        # - update by agc
+        _ag = sensor_config.get("rpi.agc", {})
+        _ag = _ag["channels"][0] if "channels" in _ag else _ag
+        self.shutters = _ag.get("exposure_modes", {}).get("normal", {}).get("shutter")
+        self.gains = _ag.get("exposure_modes", {}).get("normal", {}).get("gain")
+        self.device_status = _DeviceStatus(vflip=vflip, hflip=hflip)
+        self.exposure: float = 100  # `shutter speed(us)` * `analogue gain`
+        self.degital_gain: float = 1.0  # Currently, this value is constant.
+        self.agc_interval_count: int = 0
+        self.target_Y: float = target_Y
+        # - update by contrast
+        _cr = sensor_config.get("rpi.contrast", {})
+        self.ce_enable = _cr.get("ce_enable", True)
+        self.brightness: float = _cr.get("brightness", 0.0)
+        self.contrast: float = _cr.get("contrast", 1.0)
+        self.lo_histogram: float = _cr.get("hi_histogram", 0.01)
+        self.lo_level: float = _cr.get("lo_level", 0.015)
+        self.lo_max: int = _cr.get("lo_max", 500)
+        self.hi_histogram: float = _cr.get("hi_histogram", 0.95)
+        self.hi_level: float = _cr.get("hi_level", 0.95)
+        self.hi_max: int = _cr.get("hi_max", 0.95)
+        # histogram quantiles, brightness and contrast of the applied gamma curve
+        self.contrast_settings: Optional[Tuple[Optional[Tuple[float, float, float]], float, float]] = None
+        gamma_curve = _cr["gamma_curve"]
+        self.gamma_curve: List[Tuple[float, float]] = [
+            (gamma_curve[2 * n], gamma_curve[2 * n + 1]) for n in range(0, len(gamma_curve) // 2)
+        ]
+
+    def __set_up_auto_focuser(self, sensor_config: Dict[str, Any]) -> None:
+        # PDAF runs on the capture thread and contrast AF on the control thread; both update the same autofocus state
+        self.auto_focus_lock = threading.Lock()
+        if self.auto_focuser is not None:
+            self.auto_focuser.set_unicam_config(
+                sensor_config,
+                unicam_width=self.unicam_width,
+                sensor_size=SENSOR_SIZE_MAP[self.sensor_name],
+                post_crop_size=self.crop_size,
+                camera_mode_scale=self.camera_mode.scale,
+                camera_mode_crop_size=self.camera_mode.crop,
+                callback_fn=self.__set_focus_absolute,
+            )
+
     def __setup_pipeline(self) -> None:
         # setup unicam
         if self.sensor_name in ["imx219", "imx708"]:
@@ -399,6 +575,7 @@ class UnicamIspCapture(Producer[Frame[bytes]]):
             init_shutter_time = self.shutters[len(self.shutters) // 2]  # (us)
             init_analogue_gain = self.gains[len(self.gains) // 2]
             self.__set_unicam_exposure(init_analogue_gain, init_shutter_time)
+            self.unicam_subdev.flush_ext_controls()
             self.exposure = init_shutter_time * init_analogue_gain
 
         # current alsc implementation does not change lens_shading table dynamically
@@ -477,7 +654,7 @@ class UnicamIspCapture(Producer[Frame[bytes]]):
         gain_ctrl = v4l2_ext_control()
         gain_ctrl.id = V4L2_CID.ANALOGUE_GAIN
         gain_ctrl.value = int(unicam_subdev_analogue_gain)
-        self.unicam_subdev.set_ext_controls([exposure_ctrl, gain_ctrl])
+        self.unicam_subdev.stage_ext_controls([exposure_ctrl, gain_ctrl])
 
     def __set_focus_absolute(self, focus_val: int) -> None:
         assert self.unicam_subdev_meta is not None
@@ -557,6 +734,14 @@ class UnicamIspCapture(Producer[Frame[bytes]]):
     def capture_size(self) -> Tuple[int, int]:
         return (self.output_fmt.fmt.pix.width, self.output_fmt.fmt.pix.height)
 
+    def capture_stats(self) -> CaptureStats:
+        """Get frame counters.
+
+        Returns:
+            CaptureStats: numbers of captured frames and frames dropped by unicam
+        """
+        return self.stats
+
     def __request_buffer(self) -> None:
         self.dma_buffer_num = self.unicam.request_buffers(self.dma_buffer_num, V4L2_MEMORY.MMAP)
         self.dma_fds = self.unicam.export_buffers()
@@ -572,46 +757,64 @@ class UnicamIspCapture(Producer[Frame[bytes]]):
             self.unicam_meta_buffer_num = self.unicam_meta.request_buffers(self.unicam_meta_buffer_num, V4L2_MEMORY.MMAP)
 
     def __unicam2isp(self) -> None:
-        buffer = self.unicam.dequeue_buffer_nonblocking(v4l2_memory=V4L2_MEMORY.DMABUF)
-        if buffer is None:
-            return
-        self.isp_in.queue_buffer(buffer.buf.index)
+        t_0 = _now()
+        for buffer in self.unicam.dequeue_all_buffers_nonblocking(v4l2_memory=V4L2_MEMORY.DMABUF):
+            _span("dequeue", "capture", t_0, buffer.buf)
+            self.stats.count_sequence(buffer.buf.sequence)
+            # The ISP copies the timestamp of its input buffer to the output buffers, but counts its own sequence.
+            self.isp_in.queue_buffer(buffer.buf.index, source=buffer)
+            self._sensor_sequences[(buffer.buf.timestamp.sec, buffer.buf.timestamp.usec)] = buffer.buf.sequence
+            if len(self._sensor_sequences) > _MAX_PENDING_SEQUENCES:
+                del self._sensor_sequences[next(iter(self._sensor_sequences))]
 
     def __isp2unicam(self) -> None:
-        buffer = self.isp_in.dequeue_buffer_nonblocking(v4l2_memory=V4L2_MEMORY.DMABUF)
-        if buffer is None:
-            return
-        self.unicam.queue_buffer(buffer.buf.index)
+        for buffer in self.isp_in.dequeue_all_buffers_nonblocking(v4l2_memory=V4L2_MEMORY.DMABUF):
+            self.unicam.queue_buffer(buffer.buf.index)
 
     def __receive_unicam_meta(self) -> None:
         if self.unicam_meta is not None:
-            meta_buffer = self.unicam_meta.dequeue_buffer_nonblocking(v4l2_memory=V4L2_MEMORY.MMAP)
-            self.unicam_meta_bufidx = meta_buffer.buf.index
-            if self.auto_focuser is not None:
+            for meta_buffer in self.unicam_meta.dequeue_all_buffers_nonblocking(v4l2_memory=V4L2_MEMORY.MMAP):
+                self.unicam_meta_bufidx = meta_buffer.buf.index
+                if self.stats_recorder is not None:
+                    self.stats_recorder.record(
+                        RecordKind.UNICAM_META,
+                        meta_buffer.buf.sequence,
+                        meta_buffer.timestamp(),
+                        string_at(meta_buffer.mapped_buf, meta_buffer.buf.bytesused),
+                    )
+                self.__update_focus_from_pdaf(meta_buffer)
+                self.unicam_meta.queue_buffer(meta_buffer.buf.index)
+
+    def __update_focus_from_pdaf(self, meta_buffer: Any) -> None:
+        if self.auto_focuser is not None:
+            with self.auto_focus_lock:
                 self.auto_focuser.parse_pdaf_and_update_focus(meta_buffer)
-            self.unicam_meta.queue_buffer(meta_buffer.buf.index)
 
     def __produce_image_from_isp(self) -> None:
-        buffer = self.isp_out_high.dequeue_buffer_nonblocking(v4l2_memory=V4L2_MEMORY.MMAP)
-        if buffer is None:
-            return
+        for buffer in self.isp_out_high.dequeue_all_buffers_nonblocking(v4l2_memory=V4L2_MEMORY.MMAP):
+            self.__produce_image(buffer)
 
+    def __produce_image(self, buffer: Any) -> None:
+        t_0 = _now()
         dst = self.converter.convert(buffer, self.isp_out_high.fmt, self.output_fmt)
-        frame = Frame(dst)
+        _span("convert", "capture", t_0, buffer.buf)
+        # the timestamp is the one of the unicam buffer, passed to the ISP by `__unicam2isp`
+        sequence = self._sensor_sequences.pop((buffer.buf.timestamp.sec, buffer.buf.timestamp.usec), buffer.buf.sequence)
+        frame = Frame(dst, buffer.timestamp(), sequence, self.stats.count_frame())
+        flight_recorder.record(
+            "frame", f"sequence={frame.sequence} timestamp={frame.timestamp:.6f} dropped={frame.dropped}"
+        )
         self._outlet(frame)
         self.isp_out_high.queue_buffer(buffer.buf.index)
 
-    def __calc_lux(self, isp_stats: bcm2835_isp_stats) -> None:
+    def __calc_lux(self, isp_stats: IspStatsView) -> None:
         current_aperture = self.aperture
         current_gain = self.device_status.gain
         current_shutter_speed = self.device_status.shutter_speed
 
-        hist_sum = 0
-        hist_num = 0
-        hist = isp_stats.hist[0].g_hist
-        for i in range(NUM_HISTOGRAM_BINS):
-            hist_sum += hist[i] * i
-            hist_num += hist[i]
+        hist = isp_stats.histogram("g")
+        hist_sum = sum(map(mul, hist, range(NUM_HISTOGRAM_BINS)))
+        hist_num = sum(hist)
         current_Y = float(hist_sum) / float(hist_num) + 0.5
         gain_ratio = self.reference_gain / current_gain
         shutter_speed_ratio = self.reference_shutter_speed / current_shutter_speed
@@ -644,8 +847,19 @@ class UnicamIspCapture(Producer[Frame[bytes]]):
     #  - dynamic lens shading table calculation based on estimated colour templature
     #  - "Adaptive ALSC Algorithm"
     def __alsc(self) -> None:
+        # The colour temperature is not estimated dynamically, so caching by its exact value loses nothing.
         ct = self.color_temperature
-
+        key = (ct, self.camera_mode)
+        grid = self.ls_grid_cache.get(key)
+        if grid is None:
+            grid = self.__generate_ls_grid(ct)
+            if len(self.ls_grid_cache) >= LS_GRID_CACHE_SIZE:
+                del self.ls_grid_cache[next(iter(self.ls_grid_cache))]
+            self.ls_grid_cache[key] = grid
+        (self.ls_table_r, self.ls_table_g, self.ls_table_b) = grid.tables
+        self.__apply_ls_tables(grid)
+
+    def __generate_ls_grid(self, ct: float) -> _LsGrid:
         cal_table_r = self.__get_cal_table(ct, self.calibrations_Cr)
         cal_table_b = self.__get_cal_table(ct, self.calibrations_Cb)
 
@@ -653,66 +867,20 @@ class UnicamIspCapture(Producer[Frame[bytes]]):
             m = min(table)
             return [x / m for x in table]
 
-        cal_table_r = self.__resample_cal_table(cal_table_r, self.camera_mode)
-        cal_table_b = self.__resample_cal_table(cal_table_b, self.camera_mode)
-        luminace_table = self.__resample_cal_table(self.luminace_lut, self.camera_mode)
+        (x_weights, y_weights) = self.__cal_table_weights(self.camera_mode)
+        cal_table_r = resample_table(cal_table_r, LS_TABLE_W, x_weights, y_weights)
+        cal_table_b = resample_table(cal_table_b, LS_TABLE_W, x_weights, y_weights)
+        luminace_table = resample_table(self.luminace_lut, LS_TABLE_W, x_weights, y_weights)
 
-        self.ls_table_r = normalize(
+        ls_table_r = normalize(
             [r * ((lut - 1) * self.luminace_strength + 1) for (r, lut) in zip(cal_table_r, luminace_table)]
         )
-        self.ls_table_g = normalize([1.0 * ((lut - 1) * self.luminace_strength + 1) for lut in luminace_table])
-        self.ls_table_b = normalize(
+        ls_table_g = normalize([1.0 * ((lut - 1) * self.luminace_strength + 1) for lut in luminace_table])
+        ls_table_b = normalize(
             [b * ((lut - 1) * self.luminace_strength + 1) for (b, lut) in zip(cal_table_b, luminace_table)]
         )
 
-        self.__apply_ls_tables()
-
-    # correspond to [resampleCalTable](https://github.com/raspberrypi/libcamera/blob/3fad116f89e0d3497567043cbf6d8c49f1c102db/src/ipa/raspberrypi/controller/rpi/alsc.cpp#L463) # noqa: E501, B950
-    def __resample_cal_table(self, src: List[float], camera_mode: CameraMode) -> List[float]:
-        _sensor_size = SENSOR_SIZE_MAP[self.sensor_name]
-        assert len(src) == LS_TABLE_W * LS_TABLE_H
-        new_table: List[float] = []
-
-        x_lo: List[int] = [0] * LS_TABLE_W
-        x_hi: List[int] = [0] * LS_TABLE_W
-        xf: List[float] = [0] * LS_TABLE_W
-        scale_x = _sensor_size[0] / (camera_mode.size[0] * camera_mode.scale[0])
-        offset_x = (camera_mode.crop[0] / _sensor_size[0]) * LS_TABLE_W
-        x = (0.5 / scale_x) + offset_x - 0.5
-        x_inc = 1 / scale_x
-        for i in range(0, LS_TABLE_W):
-            x_lo[i] = floor(x)
-            xf[i] = x - x_lo[i]
-            x_hi[i] = min(x_lo[i] + 1, LS_TABLE_W - 1)
-            x_lo[i] = max(x_lo[i], 0)
-            x += x_inc
-
-        scale_y = _sensor_size[1] / (camera_mode.size[1] * camera_mode.scale[1])
-        offset_y = (camera_mode.crop[1] / _sensor_size[1]) * LS_TABLE_H
-        y = (0.5 / scale_y) + offset_y - 0.5
-        y_inc = 1 / scale_y
-        for _ in range(0, LS_TABLE_H):
-            y_lo = floor(y)
-            yf = y - y_lo
-            y_hi = min(y_lo + 1, LS_TABLE_H - 1)
-            y_lo = max(y_lo, 0)
-            row_above = src[y_lo * LS_TABLE_W : (y_lo + 1) * LS_TABLE_W]
-            row_below = src[y_hi * LS_TABLE_W : (y_hi + 1) * LS_TABLE_W]
-            for i in range(0, LS_TABLE_W):
-                above = row_above[x_lo[i]] * (1 - xf[i]) + row_above[x_hi[i]] * xf[i]
-                below = row_below[x_lo[i]] * (1 - xf[i]) + row_below[x_hi[i]] * xf[i]
-                new_table.append(above * (1 - yf) + below * yf)
-
-            y += y_inc
-
-        assert len(new_table) == LS_TABLE_W * LS_TABLE_H
-        return new_table
-
-    # correspond to [applyLS](https://github.com/raspberrypi/libcamera/blob/1c4c323e5d684b57898c083ed2f1af313bf6a98d/src/ipa/raspberrypi/raspberrypi.cpp#L1343) # noqa: E501, B950
-    def __apply_ls_tables(self) -> None:
-        assert len(self.ls_table_b) == LS_TABLE_W * LS_TABLE_H
-        assert len(self.ls_table_r) == LS_TABLE_W * LS_TABLE_H
-        assert len(self.ls_table_g) == LS_TABLE_W * LS_TABLE_H
+        # correspond to [applyLS](https://github.com/raspberrypi/libcamera/blob/1c4c323e5d684b57898c083ed2f1af313bf6a98d/src/ipa/raspberrypi/raspberrypi.cpp#L1343) # noqa: E501, B950
         cell_size_candidate = [16, 32, 64, 128, 256]
         for i in range(0, len(cell_size_candidate)):
             cell_size = cell_size_candidate[i]
@@ -724,17 +892,38 @@ class UnicamIspCapture(Producer[Frame[bytes]]):
         w += 1
         h += 1
 
-        self.__populate_ls_table(self.ls_table_r, w, h, self.ls_table_mm, 0)
-        self.__populate_ls_table(self.ls_table_g, w, h, self.ls_table_mm, 1 * (2 * w * h))
-        self.ls_table_mm[2 * (2 * w * h) : 3 * (2 * w * h)] = memoryview(self.ls_table_mm)[1 * (2 * w * h) : 2 * (2 * w * h)]
-        self.__populate_ls_table(self.ls_table_b, w, h, self.ls_table_mm, 3 * (2 * w * h))
+        # correspond to [resampleTable](https://github.com/raspberrypi/libcamera/blob/1c4c323e5d684b57898c083ed2f1af313bf6a98d/src/ipa/raspberrypi/raspberrypi.cpp#L1403) # noqa: E501, B950
+        x_weights = bilinear_weights(-0.5, LS_TABLE_W / (w - 1), w, LS_TABLE_W)
+        y_weights = bilinear_weights(-0.5, LS_TABLE_H / (h - 1), h, LS_TABLE_H)
+        gain_r = pack_gains(resample_table(ls_table_r, LS_TABLE_W, x_weights, y_weights))
+        gain_g = pack_gains(resample_table(ls_table_g, LS_TABLE_W, x_weights, y_weights))
+        gain_b = pack_gains(resample_table(ls_table_b, LS_TABLE_W, x_weights, y_weights))
+        # the grid has 4 planes: R, Gr, Gb and B
+        gains = gain_r + gain_g + gain_g + gain_b
+        return _LsGrid((ls_table_r, ls_table_g, ls_table_b), gains, cell_size, w, h)
+
+    # correspond to [resampleCalTable](https://github.com/raspberrypi/libcamera/blob/3fad116f89e0d3497567043cbf6d8c49f1c102db/src/ipa/raspberrypi/controller/rpi/alsc.cpp#L463) # noqa: E501, B950
+    def __cal_table_weights(self, camera_mode: CameraMode) -> Tuple[List[BilinearWeight], List[BilinearWeight]]:
+        _sensor_size = SENSOR_SIZE_MAP[self.sensor_name]
+        scale_x = _sensor_size[0] / (camera_mode.size[0] * camera_mode.scale[0])
+        offset_x = (camera_mode.crop[0] / _sensor_size[0]) * LS_TABLE_W
+        x_weights = bilinear_weights((0.5 / scale_x) + offset_x - 0.5, 1 / scale_x, LS_TABLE_W, LS_TABLE_W)
+        scale_y = _sensor_size[1] / (camera_mode.size[1] * camera_mode.scale[1])
+        offset_y = (camera_mode.crop[1] / _sensor_size[1]) * LS_TABLE_H
+        y_weights = bilinear_weights((0.5 / scale_y) + offset_y - 0.5, 1 / scale_y, LS_TABLE_H, LS_TABLE_H)
+        return (x_weights, y_weights)
+
+    def __apply_ls_tables(self, grid: _LsGrid) -> None:
+        assert len(grid.gains) == 4 * grid.width * grid.height
+        with memoryview(self.ls_table_mm) as mm, mm.cast("h") as ls_table:
+            ls_table[: len(grid.gains)] = grid.gains
 
         ls = bcm2835_isp_lens_shading()
         ls.enabled = 1
-        ls.grid_cell_size = cell_size
-        ls.grid_width = w
-        ls.grid_stride = w
-        ls.grid_height = h
+        ls.grid_cell_size = grid.cell_size
+        ls.grid_width = grid.width
+        ls.grid_stride = grid.width
+        ls.grid_height = grid.height
         ls.dmabuf = self.ls_table_dma_heap_fd
         ls.ref_transform = 0
         ls.corner_sampled = 1
@@ -746,72 +935,25 @@ class UnicamIspCapture(Producer[Frame[bytes]]):
         ls_ctrl.ptr = cast(pointer(ls), c_void_p)
         self.isp_in.set_ext_controls([ls_ctrl])
 
-    # correspond to [resampleTable](https://github.com/raspberrypi/libcamera/blob/1c4c323e5d684b57898c083ed2f1af313bf6a98d/src/ipa/raspberrypi/raspberrypi.cpp#L1403) # noqa: E501, B950
-    def __populate_ls_table(self, src: List[float], dst_w: int, dst_h: int, ls_table: mmap.mmap, offset: int) -> None:
-        assert len(src) == LS_TABLE_W * LS_TABLE_H
-        x_lo: List[int] = [0] * dst_w
-        xf: List[float] = [0.0] * dst_w
-        x_hi: List[int] = [0] * dst_w
-
-        x = -0.5
-        x_inc = LS_TABLE_W / (dst_w - 1)
-        for i in range(0, dst_w):
-            x_lo[i] = floor(x)
-            xf[i] = x - x_lo[i]
-            x_hi[i] = min(x_lo[i] + 1, LS_TABLE_W - 1)
-            x_lo[i] = max(x_lo[i], 0)
-            x += x_inc
-
-        ls_table_idx = offset
-        y = -0.5
-        y_inc = LS_TABLE_H / (dst_h - 1)
-        for _ in range(0, dst_h):
-            y_lo = floor(y)
-            yf = y - y_lo
-            y_hi = min(y_lo + 1, LS_TABLE_H - 1)
-            y_lo = max(y_lo, 0)
-            row_above = src[y_lo * LS_TABLE_W : (y_lo + 1) * LS_TABLE_W]
-            row_below = src[y_hi * LS_TABLE_W : (y_hi + 1) * LS_TABLE_W]
-            for i in range(0, dst_w):
-                above = row_above[x_lo[i]] * (1 - xf[i]) + row_above[x_hi[i]] * xf[i]
-                below = row_below[x_lo[i]] * (1 - xf[i]) + row_below[x_hi[i]] * xf[i]
-                result = floor(1024 * (above * (1 - yf) + below * yf) + 0.5)
-                result = min(result, 16383)
-                result_as_bytes = bytes(c_int16(result))  # type: ignore
-                assert len(result_as_bytes) == 2  # 16 bits
-                ls_table[ls_table_idx : ls_table_idx + 2] = result_as_bytes
-                ls_table_idx += 2
-
-            y += y_inc
-
-        assert ls_table_idx == offset + (2 * dst_w * dst_h)
-
-    def __calculate_y(self, stats: bcm2835_isp_stats, additional_gain: float) -> float:
-        PIPELINE_BITS = 13  # https://github.com/kbingham/libcamera/blob/f995ff25a3326db90513d1fa936815653f7cade0/src/ipa/raspberrypi/controller/rpi/agc.cpp#L31 # noqa: E501, B950
-        r_sum = 0
-        g_sum = 0
-        b_sum = 0
-        pixel_sum = 0
-        for region in stats.agc_stats:
-            counted = region.counted
-            r_sum += min(region.r_sum * additional_gain, ((1 << PIPELINE_BITS) - 1) * counted)
-            b_sum += min(region.b_sum * additional_gain, ((1 << PIPELINE_BITS) - 1) * counted)
-            g_sum += min(region.g_sum * additional_gain, ((1 << PIPELINE_BITS) - 1) * counted)
-            pixel_sum += counted
-
+    def __calculate_y(self, region_sums: ClippedRegionSums, additional_gain: float) -> float:
+        pixel_sum = region_sums.pixel_sum
         if pixel_sum == 0:
             return 0
 
+        (r_sum, g_sum, b_sum) = region_sums.evaluate(additional_gain)
+
         y_sum = r_sum * self.device_status.gain_r * 0.299 + b_sum * self.device_status.gain_b * 0.144 + g_sum * 0.587
 
         return y_sum / pixel_sum / (1 << PIPELINE_BITS)
 
-    def __agc(self, stats: bcm2835_isp_stats) -> None:
+    def __agc(self, stats: IspStatsView) -> None:
         # compute addtional gain to acheive target_Y
         # https://github.com/raspberrypi/libcamera/blob/1c4c323e5d684b57898c083ed2f1af313bf6a98d/src/ipa/raspberrypi/controller/rpi/agc.cpp#L572-L582 # noqa: E501, B950
+        # the region fields are read once for all iterations
+        region_sums = ClippedRegionSums(stats, "agc", PIPELINE_BITS)
         gain = 1.0
         for _ in range(8):
-            initial_Y = self.__calculate_y(stats, gain)
+            initial_Y = self.__calculate_y(region_sums, gain)
             extra_gain = min(10.0, self.target_Y / (initial_Y + 0.001))
             gain *= extra_gain
             if extra_gain < 1.01:
@@ -849,15 +991,8 @@ class UnicamIspCapture(Producer[Frame[bytes]]):
         self.exposure = shutter_time * analogue_gain
         self.__set_unicam_exposure(analogue_gain, shutter_time)
 
-    def __awb(self, stats: bcm2835_isp_stats) -> None:
-        sum_r = 0
-        sum_b = 0
-        sum_g = 0
-        # len(stats.awb_stats) == 192
-        for region in stats.awb_stats:
-            sum_r += region.r_sum
-            sum_b += region.b_sum
-            sum_g += region.g_sum
+    def __awb(self, stats: IspStatsView) -> None:
+        (sum_r, sum_g, sum_b) = stats.total_sums("awb")
         self.device_status.gain_r = sum_g / (sum_r + 1)
         self.device_status.gain_b = sum_g / (sum_b + 1)
         red_balance_ctrl = v4l2_ext_control()
@@ -866,15 +1001,14 @@ class UnicamIspCapture(Producer[Frame[bytes]]):
         blue_balance_ctrl = v4l2_ext_control()
         blue_balance_ctrl.id = V4L2_CID.BLUE_BALANCE
         blue_balance_ctrl.value64 = int(self.device_status.gain_b * 1000)
-        self.isp_in.set_ext_controls([red_balance_ctrl, blue_balance_ctrl])
+        self.isp_in.stage_ext_controls([red_balance_ctrl, blue_balance_ctrl], tolerance=AWB_GAIN_HYSTERESIS)
 
-    # linearly find appropriate range, this might be inefficient
+    # find i such that gamma_curve[i][0] <= x < gamma_curve[i + 1][0] by bisection, or the last span if there is none
     def __find_span(self, gamma_curve: List[Tuple[float, float]], x: float) -> int:
         last_span = len(gamma_curve) - 2
-        for i in range(0, last_span + 1):
-            if gamma_curve[i][0] <= x < gamma_curve[i + 1][0]:
-                return i
-        return last_span
+        # (x_i, y_i) <= (x, inf) iff x_i <= x
+        i = bisect_right(gamma_curve, (x, inf)) - 1
+        return i if 0 <= i <= last_span else last_span
 
     def __eval_gamma_curve(self, gamma_curve: List[Tuple[float, float]], x: float) -> float:
         span = self.__find_span(gamma_curve, x)
@@ -915,11 +1049,8 @@ class UnicamIspCapture(Producer[Frame[bytes]]):
                 result.append((this_x, self.__eval_gamma_curve(other, this_y)))
         return result
 
-    def __histogram_cumulative(self, histogram: List[int]) -> List[int]:
-        cumulative = [0]
-        for i in range(0, len(histogram)):
-            cumulative.append(cumulative[-1] + histogram[i])
-        return cumulative
+    def __histogram_cumulative(self, histogram: Sequence[int]) -> List[int]:
+        return list(accumulate(histogram, initial=0))
 
     def __cumulative_quantile(self, cumulative: List[int], q: float, first: int = -1, last: int = -1) -> float:
         if first == -1:
@@ -942,30 +1073,36 @@ class UnicamIspCapture(Producer[Frame[bytes]]):
         )
         return first + frac
 
-    def __compute_stretch_curve(self, histogram: List[int]) -> List[Tuple[float, float]]:
+    def __histogram_quantiles(self, histogram: Sequence[int]) -> Tuple[float, float, float]:
+        cumulative = self.__histogram_cumulative(histogram)
+        hist_lo = self.__cumulative_quantile(cumulative, self.lo_histogram) * (65536 / NUM_HISTOGRAM_BINS)
+        level_lo = self.lo_level * 65536
+        hist_lo = max(level_lo, min(65535, min(hist_lo, level_lo + self.lo_max)))
+        mid = self.__cumulative_quantile(cumulative, 0.5) * (65536 / NUM_HISTOGRAM_BINS)
+        hist_hi = self.__cumulative_quantile(cumulative, self.hi_histogram) * (65536 / NUM_HISTOGRAM_BINS)
+        level_hi = self.hi_level * 65536
+        hist_hi = min(level_hi, max(0.0, max(hist_hi, level_hi - self.hi_max)))
+        return (hist_lo, mid, hist_hi)
+
+    def __compute_stretch_curve(self, quantiles: Tuple[float, float, float]) -> List[Tuple[float, float]]:
         enhance = [(0.0, 0.0)]
         eps = 1e-6
+        (hist_lo, mid, hist_hi) = quantiles
 
         # If the start of the histogram is rather empty, try to pull it down a
         # bit.
-        cumulative = self.__histogram_cumulative(histogram)
-        hist_lo = self.__cumulative_quantile(cumulative, self.lo_histogram) * (65536 / NUM_HISTOGRAM_BINS)
         level_lo = self.lo_level * 65536
-        hist_lo = max(level_lo, min(65535, min(hist_lo, level_lo + self.lo_max)))
         if enhance[-1][0] + eps < hist_lo:
             enhance.append((hist_lo, level_lo))
 
         # Keep the mid-point (median) in the same place, though, to limit the
         # apparent amount of global brightness shift.
-        mid = self.__cumulative_quantile(cumulative, 0.5) * (65536 / NUM_HISTOGRAM_BINS)
         if enhance[-1][0] + eps < mid:
             enhance.append((mid, mid))
 
         # If the top to the histogram is empty, try to pull the pixel values
         # there up.
-        hist_hi = self.__cumulative_quantile(cumulative, self.hi_histogram) * (65536 / NUM_HISTOGRAM_BINS)
         level_hi = self.hi_level * 65536
-        hist_hi = min(level_hi, max(0.0, max(hist_hi, level_hi - self.hi_max)))
         if enhance[-1][0] + eps < hist_hi:
             enhance.append((hist_hi, level_hi))
         if enhance[-1][0] + eps < 65535:
@@ -987,12 +1124,21 @@ class UnicamIspCapture(Producer[Frame[bytes]]):
         gm.x[CONTRAST_NUM_POINTS - 1] = 65535
         gm.y[CONTRAST_NUM_POINTS - 1] = 65535
 
-    def __contrast_control(self, isp_stats: bcm2835_isp_stats) -> None:
-        histogram = isp_stats.hist[0].g_hist
+    def __contrast_control(self, isp_stats: IspStatsView) -> None:
+        quantiles: Optional[Tuple[float, float, float]] = None
+        if self.ce_enable and (self.lo_max != 0 or self.hi_max != 0):
+            quantiles = self.__histogram_quantiles(isp_stats.histogram("g"))
+        # Skip the update while the histogram quantiles stay within `CONTRAST_HYSTERESIS` of the applied ones.
+        settings = (quantiles, self.brightness, self.contrast)
+        if self.contrast_settings is not None:
+            (applied_quantiles, brightness, contrast) = self.contrast_settings
+            if (brightness, contrast) == (self.brightness, self.contrast) and not _quantiles_moved(quantiles, applied_quantiles):
+                return
+        self.contrast_settings = settings
+
         gamma_curve = self.gamma_curve
-        if self.ce_enable:
-            if self.lo_max != 0 or self.hi_max != 0:
-                gamma_curve = self.__compose_gamma_curve(self.__compute_stretch_curve(histogram), gamma_curve)
+        if quantiles is not None:
+            gamma_curve = self.__compose_gamma_curve(self.__compute_stretch_curve(quantiles), gamma_curve)
         if self.brightness != 0 or self.contrast != 1.0:
             gamma_curve = [
                 (
@@ -1013,33 +1159,100 @@ class UnicamIspCapture(Producer[Frame[bytes]]):
         gamma.id = V4L2_CID.USER_BCM2835_ISP_GAMMA
         gamma.size = sizeof(bcm2835_isp_gamma)
         gamma.ptr = cast(pointer(gm), c_void_p)
-        self.isp_in.set_ext_controls([gamma])
+        self.isp_in.stage_ext_controls([gamma])
 
     def __adjust_setting_from_isp(self) -> None:
-        buffer = self.isp_out_metadata.dequeue_buffer_nonblocking(v4l2_memory=V4L2_MEMORY.MMAP)
-        if buffer is None:
-            return
-
-        stats: bcm2835_isp_stats = cast(buffer.mapped_buf, POINTER(bcm2835_isp_stats)).contents
-        self.__calc_lux(stats)
+        # Copy the statistics and give the buffer back to the ISP at once.
+        # The control thread works on the latest copy; older ones which it could not catch up with are discarded.
+        for buffer in self.isp_out_metadata.dequeue_all_buffers_nonblocking(v4l2_memory=V4L2_MEMORY.MMAP):
+            stats = bcm2835_isp_stats()
+            memmove(addressof(stats), buffer.mapped_buf, sizeof(bcm2835_isp_stats))
+            self.isp_out_metadata.queue_buffer(buffer.buf.index)
+            if self.stats_recorder is not None:
+                self.stats_recorder.record(RecordKind.ISP_STATS, buffer.buf.sequence, buffer.timestamp(), bytes(stats))
+            self._stats_snapshots.put(_StatsSnapshot(stats, buffer.buf.sequence))
+
+    def __control_loop(self) -> None:
+        try:
+            while self._is_running() and not self._capture_finished.is_set():
+                try:
+                    snapshot = self._stats_snapshots.get(timeout=_CONTROL_POLL_INTERVAL)
+                except Empty:
+                    continue
+                self.__control(snapshot)
+        except Exception as e:
+            self._control_error = e
+
+    def __control(self, snapshot: _StatsSnapshot) -> None:
+        t_0 = _now()
+        stats = snapshot.stats
+        stats_view = IspStatsView(stats)
+        self.__calc_lux(stats_view)
         if self.do_agc:
             if self.agc_interval_count < AGC_INTERVAL:
                 self.agc_interval_count += 1
             else:
                 self.agc_interval_count = 0
-                self.__agc(stats)
+                self.__agc(stats_view)
 
         if self.do_awb:
-            self.__awb(stats)
+            self.__awb(stats_view)
 
         if self.do_contrast:
-            self.__contrast_control(stats)
+            self.__contrast_control(stats_view)
         if self.auto_focuser is not None:
-            self.auto_focuser.process_contrast_metadata(stats)
-
-        self.isp_out_metadata.queue_buffer(buffer.buf.index)
+            with self.auto_focus_lock:
+                self.auto_focuser.process_contrast_metadata(stats)
+        # at most one control write per device and frame
+        self.isp_in.flush_ext_controls()
+        self.unicam_subdev.flush_ext_controls()
+        _span("3a", "capture", t_0, snapshot)
+
+    def _replay_record(self, record: StatsRecord) -> None:
+        # run a recorded buffer through the 3A algorithms or the autofocus, see `_replaying`
+        if record.kind == RecordKind.ISP_STATS:
+            stats = bcm2835_isp_stats.from_buffer_copy(record.data)
+            self.__control(_StatsSnapshot(stats, record.sequence))
+        else:
+            self.__update_focus_from_pdaf(RecordedBuffer(record))
 
     def run(self) -> None:
+        control_thread = threading.Thread(target=self.__control_loop, name=f"{type(self).__name__}.3a", daemon=True)
+        control_thread.start()
+        try:
+            self.__capture_loop()
+        finally:
+            # `running` is left to the application, which restarts a crashed capture by its restart policy
+            self._capture_finished.set()
+            control_thread.join()
+            if self.stats_recorder is not None:
+                self.stats_recorder.close()
+            self.__release_devices()
+
+    def __release_devices(self) -> None:
+        # Release the devices even on an error, so that a restarted capture can open them again.
+        streaming = [self.unicam, self.unicam_meta, self.isp_in, self.isp_out_high, self.isp_out_metadata]
+        for device in streaming:
+            if device is None:
+                continue
+            try:
+                device.stop_streaming()
+            except RuntimeError:
+                # not streaming yet
+                pass
+            for buffer in device.buffers or []:
+                if buffer.buf.memory == V4L2_MEMORY.MMAP:
+                    buffer.unmap_buffer()
+        # the exported unicam buffers, imported by unicam itself and the ISP
+        for fd in self.dma_fds:
+            os.close(fd)
+        for device in streaming + [self.unicam_subdev, self.unicam_subdev_meta]:
+            if device is not None:
+                device.close()
+        self.ls_table_mm.close()
+        os.close(self.ls_table_dma_heap_fd)
+
+    def __capture_loop(self) -> None:
         self.unicam.queue_all_buffers()
         if self.unicam_meta is not None:
             self.unicam_meta.queue_all_buffers()
@@ -1053,36 +1266,27 @@ class UnicamIspCapture(Producer[Frame[bytes]]):
         self.isp_out_high.start_streaming()
         self.isp_out_metadata.start_streaming()
 
-        while self._is_running():
-            timeout = 1
-            rlist, wlist, _ = select.select(
-                [
-                    self.unicam.device_fd,
-                    self.isp_out_high.device_fd,
-                    self.isp_out_metadata.device_fd,
-                ]
-                + ([] if self.unicam_meta is None else [self.unicam_meta.device_fd]),
-                [self.isp_in.device_fd],
-                [],
-                timeout,
-            )
-
-            if len(rlist) == 0 and len(wlist) == 0:
-                raise RuntimeError("Capture timeout")
-
-            for r in rlist:
-                if r == self.unicam.device_fd:
-                    self.__unicam2isp()
-                elif self.unicam_meta is not None and r == self.unicam_meta.device_fd:
-                    self.__receive_unicam_meta()
-                elif r == self.isp_out_high.device_fd:
-                    self.__produce_image_from_isp()
-                elif r == self.isp_out_metadata.device_fd:
-                    self.__adjust_setting_from_isp()
-
-            for w in wlist:
-                if w == self.isp_in.device_fd:
-                    self.__isp2unicam()
+        # the devices are registered once; every handler dequeues all the ready buffers of its device
+        handlers = {
+            self.unicam.device_fd: self.__unicam2isp,
+            self.isp_out_high.device_fd: self.__produce_image_from_isp,
+            self.isp_out_metadata.device_fd: self.__adjust_setting_from_isp,
+            self.isp_in.device_fd: self.__isp2unicam,
+        }
+        if self.unicam_meta is not None:
+            handlers[self.unicam_meta.device_fd] = self.__receive_unicam_meta
+        with select.epoll() as ep:
+            for fd in handlers:
+                ep.register(fd, select.EPOLLOUT if fd == self.isp_in.device_fd else select.EPOLLIN)
+            while self._is_running():
+                events = ep.poll(CAPTURE_TIMEOUT)
+                if len(events) == 0:
+                    raise RuntimeError("Capture timeout")
+                if self._control_error is not None:
+                    raise RuntimeError("3A control failed") from self._control_error
+
+                for fd, _ in events:
+                    handlers[fd]()
 
     def _new_pad(self) -> _PadBase[Frame[bytes]]:
         return _PadDiscardingOld()
@@ -1,17 +1,58 @@
+import time
 from abc import ABC, abstractmethod
-from queue import Empty, Queue
-from typing import Generic, Optional, Tuple, TypeVar
+from queue import Empty, Full, Queue
+from typing import Callable, Generic, List, Optional, Tuple, TypeVar
 
 T = TypeVar("T")
 
 
 class _PadBase(ABC, Generic[T]):
     _queue: "Queue[T]"
+    # items dropped by `put` to make room for newer ones
+    discarded: int
+    # called after every put and get through the pad pair, e.g. to wake up a scheduler
+    _on_transfer: List[Callable[[], None]]
+    # inputs taken from the pad and still being processed by the consumer, and the time it spent on them
+    in_flight: int
+    busy_time: float
+    busy_since: float
+    first_started: Optional[float]
+
+    def __init__(self) -> None:
+        self._on_transfer = []
+        self.discarded = 0
+        self.in_flight = 0
+        self.busy_time = 0.0
+        self.busy_since = 0.0
+        self.first_started = None
+
+    def processing_started(self) -> None:
+        if self.in_flight == 0:
+            self.busy_since = time.monotonic()
+            if self.first_started is None:
+                self.first_started = self.busy_since
+        self.in_flight += 1
+
+    def processing_finished(self) -> None:
+        self.in_flight -= 1
+        if self.in_flight == 0:
+            self.busy_time += time.monotonic() - self.busy_since
+
+    def utilization(self) -> float:
+        # fraction of the time since the consumer took its first input in which it processed inputs
+        if self.first_started is None:
+            return 0.0
+        now = time.monotonic()
+        busy_time = self.busy_time + (now - self.busy_since if self.in_flight > 0 else 0.0)
+        return busy_time / (now - self.first_started) if now > self.first_started else 0.0
 
     @abstractmethod
     def empty(self) -> bool:
         pass
 
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
     @abstractmethod
     def put(
         self,
@@ -37,6 +78,7 @@ class _PadBlocking(_PadBase[T]):
     _queue: "Queue[T]"
 
     def __init__(self) -> None:
+        super().__init__()
         self._queue = Queue(1)
 
     def empty(self) -> bool:
@@ -62,6 +104,7 @@ class _PadDiscardingOld(_PadBase[T]):
     _queue: "Queue[T]"
 
     def __init__(self) -> None:
+        super().__init__()
         self._queue = Queue(1)
 
     def empty(self) -> bool:
@@ -77,6 +120,7 @@ class _PadDiscardingOld(_PadBase[T]):
         # Notice that only the owner of `_PadIn` can `put()`, but the owner can call `put()` cuncurrently.
         try:
             self.get(block=False)
+            self.discarded += 1
         except Empty:
             pass
         # Then put.
@@ -90,6 +134,43 @@ class _PadDiscardingOld(_PadBase[T]):
         return self._queue.get(block=block, timeout=timeout)
 
 
+class _PadBounded(_PadBase[T]):
+    _queue: "Queue[T]"
+
+    def __init__(self, maxsize: int) -> None:
+        super().__init__()
+        self._queue = Queue(maxsize)
+
+    def empty(self) -> bool:
+        return self._queue.empty()
+
+    def put(
+        self,
+        item: T,
+        block: bool = True,
+        timeout: Optional[float] = None,
+    ) -> None:
+        # Discard the oldest ones until there is room, like `_PadDiscardingOld`.
+        while True:
+            try:
+                self._queue.put(item, block=False)
+                return
+            except Full:
+                pass
+            try:
+                self.get(block=False)
+                self.discarded += 1
+            except Empty:
+                pass
+
+    def get(
+        self,
+        block: bool = True,
+        timeout: Optional[float] = None,
+    ) -> T:
+        return self._queue.get(block=block, timeout=timeout)
+
+
 class _PadIn(Generic[T]):
     _pad: _PadBase[T]
 
@@ -103,13 +184,24 @@ class _PadIn(Generic[T]):
         timeout: Optional[float] = None,
     ) -> None:
         self._pad.put(item, block=block, timeout=timeout)
+        for on_transfer in self._pad._on_transfer:
+            on_transfer()
+
+    def qsize(self) -> int:
+        return self._pad.qsize()
+
+    def load(self) -> int:
+        # inputs waiting in the pad and being processed by the consumer
+        return self._pad.qsize() + self._pad.in_flight
 
 
 class _PadOut(Generic[T]):
     _pad: _PadBase[T]
+    max_frame_age: Optional[float]
 
-    def __init__(self, pad: _PadBase[T]) -> None:
+    def __init__(self, pad: _PadBase[T], max_frame_age: Optional[float] = None) -> None:
         self._pad = pad
+        self.max_frame_age = max_frame_age
 
     def empty(self) -> bool:
         return self._pad.empty()
@@ -119,4 +211,7 @@ class _PadOut(Generic[T]):
         block: bool = True,
         timeout: Optional[float] = None,
     ) -> T:
-        return self._pad.get(block=block, timeout=timeout)
+        item = self._pad.get(block=block, timeout=timeout)
+        for on_transfer in self._pad._on_transfer:
+            on_transfer()
+        return item
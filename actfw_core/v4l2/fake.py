@@ -0,0 +1,680 @@
+import errno
+import fcntl
+import mmap
+import os
+import random
+import threading
+import time
+from collections import deque
+from ctypes import POINTER, addressof, c_char, c_int, cast, memmove, set_errno
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple, Type
+
+from actfw_core.v4l2.control import V4L2_CTRL_WHICH_CUR_VAL
+from actfw_core.v4l2.types import (
+    buffer,
+    capability,
+    control,
+    exportbuffer,
+    fmtdesc,
+    format,
+    frmivalenum,
+    frmsizeenum,
+    queryctrl,
+    requestbuffers,
+    selection,
+    streamparm,
+    subdev_format,
+    v4l2_ext_controls,
+)
+from actfw_core.v4l2.video import (  # type: ignore
+    _V4L2_CAP_STREAMING,
+    _V4L2_CAP_VIDEO_CAPTURE,
+    _VIDIOC,
+    V4L2_BUF_TYPE,
+    V4L2_FIELD,
+    V4L2_FRMIVAL_TYPE,
+    V4L2_FRMSIZE_TYPE,
+    V4L2_MEMORY,
+    V4L2_PIX_FMT,
+    V4L2Backend,
+    set_backend,
+)
+
+# Contents of the frame of a sequence number, given the size of the image. Shorter contents are padded with zeros.
+FrameSource = Callable[[int, int], bytes]
+
+_BYTES_PER_PIXEL = {
+    V4L2_PIX_FMT.GREY: 1,
+    V4L2_PIX_FMT.YUYV: 2,
+    V4L2_PIX_FMT.RGB565: 2,
+    V4L2_PIX_FMT.RGB24: 3,
+    V4L2_PIX_FMT.BGR24: 3,
+    V4L2_PIX_FMT.RGB32: 4,
+    V4L2_PIX_FMT.BGR32: 4,
+}
+# Compressed frames have the size of their contents; the buffers are allocated for this many bytes per pixel.
+_COMPRESSED_BYTES_PER_PIXEL = 2
+_COMPRESSED_FORMATS = (V4L2_PIX_FMT.MJPEG, V4L2_PIX_FMT.JPEG)
+# fcntl.F_SETPIPE_SZ, available from Python 3.10
+_F_SETPIPE_SZ = 1031
+
+
+@dataclass(frozen=True)
+class FakeFormat:
+    pixel_format: int
+    sizes: Sequence[Tuple[int, int]]
+    framerates: Sequence[int] = (30,)
+
+
+def _set_pix_format(pix: Any, pixel_format: int, width: int, height: int) -> None:
+    pix.width = width
+    pix.height = height
+    pix.pixelformat = pixel_format
+    pix.field = V4L2_FIELD.NONE
+    if pixel_format in _COMPRESSED_FORMATS:
+        pix.bytesperline = 0
+        pix.sizeimage = width * height * _COMPRESSED_BYTES_PER_PIXEL
+    else:
+        bytes_per_pixel = _BYTES_PER_PIXEL.get(pixel_format, 4)
+        pix.bytesperline = width * bytes_per_pixel
+        pix.sizeimage = width * height * bytes_per_pixel
+
+
+def synthetic_frames(sequence: int, size: int) -> bytes:
+    """
+    Frame source of images filled with the sequence number modulo 256.
+    """
+    return bytes([sequence & 0xFF]) * size
+
+
+def recorded_frames(frames: Sequence[bytes]) -> FrameSource:
+    """
+    Frame source which repeats recorded frames.
+
+    Args:
+        frames (list of bytes): contents of the frames, e.g. MJPEG frames captured from a camera
+
+    Returns:
+        function: frame source
+    """
+    return lambda sequence, size: frames[sequence % len(frames)]
+
+
+class _Failure(Exception):
+    def __init__(self, code: int) -> None:
+        super().__init__(errno.errorcode[code])
+        self.code = code
+
+
+class _FakeBuffer:
+    def __init__(self, index: int, memory: int, length: int, offset: int) -> None:
+        self.index = index
+        self.memory = memory
+        self.length = length
+        self.offset = offset
+        # the device writes frames through this mapping
+        self.view: Optional[mmap.mmap] = None
+        self.memfd = -1
+        if memory == V4L2_MEMORY.MMAP:
+            self.memfd = os.memfd_create(f"fake-v4l2-buffer-{index}")
+            os.ftruncate(self.memfd, length)
+            self.view = mmap.mmap(self.memfd, length)
+        # DMABUF: the file descriptor queued with the buffer, whose memory is mapped to `view`
+        self.dmabuf_fd = -1
+        self.queued = False
+        self.bytesused = 0
+        self.sequence = 0
+        self.field = V4L2_FIELD.NONE
+        # [usec] on CLOCK_MONOTONIC
+        self.timestamp = 0
+
+    def import_dmabuf(self, fd: int) -> None:
+        if fd == self.dmabuf_fd:
+            return
+        if self.view is not None:
+            self.view.close()
+        self.view = mmap.mmap(fd, min(self.length, os.fstat(fd).st_size))
+        self.dmabuf_fd = fd
+
+    def close(self) -> None:
+        if self.view is not None:
+            self.view.close()
+        if self.memfd >= 0:
+            os.close(self.memfd)
+
+
+class FakeVideoDevice:
+    """Simulated V4L2 video capture device.
+
+    Frames are produced at the frame rate by a thread while streaming, into memfd-backed buffers.
+    The file descriptor of a capture device is the read end of a pipe, which is readable while a filled buffer is ready,
+    so that the device can be waited for with select or epoll.
+    Capture buffers are `V4L2_MEMORY_MMAP`; they can be exported with `VIDIOC_EXPBUF`.
+
+    Capture buffers may also be `V4L2_MEMORY_DMABUF`, e.g. exported by another device, into which frames are written.
+
+    With `buf_type=V4L2_BUF_TYPE.VIDEO_OUTPUT`, the device is the input of a memory-to-memory device such as the ISP:
+    it takes `V4L2_MEMORY_MMAP` or `V4L2_MEMORY_DMABUF` buffers, consumes every buffer queued while streaming at once
+    and keeps the timestamp, sequence, field and bytesused passed by `VIDIOC_QBUF` in `consumed`.
+    Its file descriptor is writable while a consumed buffer is ready to be dequeued.
+    With `buf_type=V4L2_BUF_TYPE.META_CAPTURE`, the device captures metadata (e.g. ISP statistics) into buffers of the size
+    set by `VIDIOC_S_FMT`.
+
+    The device also serves as a sub-device: it takes any `VIDIOC_SUBDEV_S_FMT` and `VIDIOC_S_SELECTION`
+    (kept in `subdev_format` and `selection`), and `VIDIOC_QUERYCTRL`, `VIDIOC_G_CTRL` and `VIDIOC_S_CTRL`
+    of the controls in `controls`.
+    """
+
+    def __init__(
+        self,
+        formats: Sequence[FakeFormat],
+        frames: FrameSource = synthetic_frames,
+        jitter: float = 0.0,
+        driver: str = "uvcvideo",
+        controls: Optional[Dict[int, int]] = None,
+        seed: int = 0,
+        buf_type: int = V4L2_BUF_TYPE.VIDEO_CAPTURE,
+    ) -> None:
+        """
+
+        Args:
+            formats (list of :class:`FakeFormat`): formats, sizes and frame rates enumerated by the device
+            frames (function): contents of the frames, e.g. :func:`synthetic_frames` or :func:`recorded_frames`
+            jitter (float): maximum deviation [sec] of a frame from its due time
+            driver (str): driver name reported by `VIDIOC_QUERYCAP`
+            controls (dict, optional): initial values of the controls by id, for `VIDIOC_G_EXT_CTRLS` and `VIDIOC_S_EXT_CTRLS`
+            seed (int): seed of the jitter
+            buf_type (int): `V4L2_BUF_TYPE.VIDEO_CAPTURE` or `V4L2_BUF_TYPE.VIDEO_OUTPUT`
+
+        """
+        if len(formats) == 0:
+            raise ValueError("a fake device needs at least one format")
+        self.formats = list(formats)
+        self.frames = frames
+        self.jitter = jitter
+        self.driver = driver
+        self.controls: Dict[int, int] = dict(controls or {})
+        self.rng = random.Random(seed)
+        self.buf_type = buf_type
+        self.fmt = format()
+        self.framerate: float = self.formats[0].framerates[0]
+        _set_pix_format(self.fmt.fmt.pix, self.formats[0].pixel_format, *self.formats[0].sizes[0])
+        self.buffers: List[_FakeBuffer] = []
+        # queued buffers in the order they are filled, and filled buffers in the order they are dequeued
+        self.queue: Deque[_FakeBuffer] = deque()
+        self.done: Deque[_FakeBuffer] = deque()
+        self.lock = threading.Condition()
+        self.streaming = False
+        self.thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+        self.fds: Optional[Tuple[int, int]] = None
+        self.blocking = True
+        self.sequence = 0
+        # frames produced while no buffer was queued
+        self.dropped = 0
+        # buffers consumed by an output device: (index, timestamp [usec], sequence, field, bytesused)
+        self.consumed: List[Tuple[int, int, int, int, int]] = []
+        # mappings by the users of the device: address -> (ctypes object holding the export, mmap)
+        self.mappings: Dict[int, Tuple[Any, mmap.mmap]] = {}
+        # mappings the users had not unmapped when they closed the device
+        self.mappings_left_at_close = 0
+        # (width, height, media bus code) and (left, top, width, height) set by the user
+        self.subdev_format: Optional[Tuple[int, int, int]] = None
+        self.selection: Optional[Tuple[int, int, int, int]] = None
+
+    def open(self, flags: int) -> int:
+        if self.fds is not None:
+            raise OSError(errno.EBUSY, os.strerror(errno.EBUSY))
+        (r, w) = os.pipe()
+        os.set_blocking(r, False)
+        if self.buf_type == V4L2_BUF_TYPE.VIDEO_OUTPUT:
+            # The user waits for the write end, which is writable while the pipe of one page is empty.
+            fcntl.fcntl(w, _F_SETPIPE_SZ, mmap.PAGESIZE)
+            os.write(w, b"\0")
+            self.fds = (w, r)
+        else:
+            # The user waits for the read end, which has a byte for each filled buffer.
+            self.fds = (r, w)
+        self.blocking = not (flags & os.O_NONBLOCK)
+        return self.fds[0]
+
+    def __buffer_done(self, fake: _FakeBuffer) -> None:
+        # with `lock` held
+        self.done.append(fake)
+        assert self.fds is not None
+        if self.buf_type != V4L2_BUF_TYPE.VIDEO_OUTPUT:
+            os.write(self.fds[1], b"\0")
+        elif len(self.done) == 1:
+            os.read(self.fds[1], 1)
+
+    def __buffer_dequeued(self) -> _FakeBuffer:
+        # with `lock` held
+        fake = self.done.popleft()
+        assert self.fds is not None
+        if self.buf_type != V4L2_BUF_TYPE.VIDEO_OUTPUT:
+            os.read(self.fds[0], 1)
+        elif len(self.done) == 0:
+            os.write(self.fds[0], b"\0")
+        return fake
+
+    def close(self) -> None:
+        self.mappings_left_at_close += len(self.mappings)
+        self.__stream_off()
+        self.__free_buffers()
+        if self.fds is not None:
+            for fd in self.fds:
+                os.close(fd)
+            self.fds = None
+
+    def ioctl(self, request: int, arg: Any) -> int:
+        handler = self.__handlers.get(request)
+        if handler is None:
+            raise _Failure(errno.ENOTTY)
+        (struct_type, method) = handler
+        return method(self, cast(arg, POINTER(struct_type)).contents)  # type: ignore
+
+    def mmap(self, length: int, fd: int, offset: int) -> int:
+        for buf in self.buffers:
+            if buf.offset == offset and length <= buf.length:
+                mm = mmap.mmap(buf.memfd, length)
+                holder = c_char.from_buffer(mm)
+                address = addressof(holder)
+                self.mappings[address] = (holder, mm)
+                return address
+        raise _Failure(errno.EINVAL)
+
+    def munmap(self, addr: int) -> None:
+        (holder, mm) = self.mappings.pop(addr)
+        del holder
+        mm.close()
+
+    def __format(self, pixel_format: int) -> FakeFormat:
+        for fmt in self.formats:
+            if fmt.pixel_format == pixel_format:
+                return fmt
+        raise _Failure(errno.EINVAL)
+
+    def try_format(self, pixel_format: int, width: int, height: int) -> Tuple[int, int, int]:
+        # the smallest size not smaller than the requested one, or the largest
+        formats = [fmt for fmt in self.formats if fmt.pixel_format == pixel_format] or self.formats[:1]
+        sizes = sorted(formats[0].sizes, key=lambda size: size[0] * size[1])
+        fitting = [size for size in sizes if width <= size[0] and height <= size[1]]
+        (w, h) = fitting[0] if len(fitting) > 0 else sizes[-1]
+        return (formats[0].pixel_format, w, h)
+
+    def __querycap(self, cap: capability) -> int:
+        for i, c in enumerate(self.driver.encode()[: len(cap.driver) - 1]):
+            cap.driver[i] = c
+        for i, c in enumerate(b"fake video device"):
+            cap.card[i] = c
+        cap.capabilities = _V4L2_CAP_VIDEO_CAPTURE | _V4L2_CAP_STREAMING
+        cap.device_caps = _V4L2_CAP_VIDEO_CAPTURE | _V4L2_CAP_STREAMING
+        return 0
+
+    def __enum_fmt(self, desc: fmtdesc) -> int:
+        if desc.type != self.buf_type or desc.index >= len(self.formats):
+            raise _Failure(errno.EINVAL)
+        desc.pixelformat = self.formats[desc.index].pixel_format
+        desc.flags = 1 if desc.pixelformat in _COMPRESSED_FORMATS else 0
+        return 0
+
+    def __enum_framesizes(self, frmsize: frmsizeenum) -> int:
+        sizes = self.__format(frmsize.pixel_format).sizes
+        if frmsize.index >= len(sizes):
+            raise _Failure(errno.EINVAL)
+        frmsize.type = V4L2_FRMSIZE_TYPE.DISCRETE
+        (frmsize.discrete.width, frmsize.discrete.height) = sizes[frmsize.index]
+        return 0
+
+    def __enum_frameintervals(self, frmival: frmivalenum) -> int:
+        fmt = self.__format(frmival.pixel_format)
+        if (frmival.width, frmival.height) not in [tuple(size) for size in fmt.sizes] or frmival.index >= len(fmt.framerates):
+            raise _Failure(errno.EINVAL)
+        frmival.type = V4L2_FRMIVAL_TYPE.DISCRETE
+        frmival.discrete.numerator = 1
+        frmival.discrete.denominator = fmt.framerates[frmival.index]
+        return 0
+
+    def __s_fmt(self, fmt: format) -> int:
+        if fmt.type != self.buf_type:
+            raise _Failure(errno.EINVAL)
+        if self.streaming or len(self.buffers) > 0:
+            raise _Failure(errno.EBUSY)
+        if self.buf_type == V4L2_BUF_TYPE.META_CAPTURE:
+            self.fmt.fmt.meta = fmt.fmt.meta
+            return 0
+        pix = fmt.fmt.pix
+        _set_pix_format(self.fmt.fmt.pix, *self.try_format(pix.pixelformat, pix.width, pix.height))
+        fmt.fmt.pix = self.fmt.fmt.pix
+        return 0
+
+    def __s_parm(self, parm: streamparm) -> int:
+        interval = parm.parm.capture.timeperframe
+        if interval.numerator == 0 or interval.denominator == 0:
+            raise _Failure(errno.EINVAL)
+        self.framerate = interval.denominator / interval.numerator
+        return 0
+
+    def __reqbufs(self, req: requestbuffers) -> int:
+        if req.type != self.buf_type or req.memory not in (V4L2_MEMORY.MMAP, V4L2_MEMORY.DMABUF):
+            raise _Failure(errno.EINVAL)
+        if self.streaming:
+            raise _Failure(errno.EBUSY)
+        self.__free_buffers()
+        if self.buf_type == V4L2_BUF_TYPE.META_CAPTURE:
+            length = self.fmt.fmt.meta.buffersize
+        else:
+            length = self.fmt.fmt.pix.sizeimage
+        stride = (length + mmap.PAGESIZE - 1) // mmap.PAGESIZE * mmap.PAGESIZE
+        self.buffers = [_FakeBuffer(i, req.memory, length, i * stride) for i in range(req.count)]
+        return 0
+
+    def __free_buffers(self) -> None:
+        for address in list(self.mappings):
+            self.munmap(address)
+        for buf in self.buffers:
+            buf.close()
+        self.buffers = []
+        self.queue.clear()
+        self.done.clear()
+
+    def __buffer(self, buf: buffer) -> _FakeBuffer:
+        index: int = buf.index
+        if index >= len(self.buffers) or buf.memory != self.buffers[index].memory:
+            raise _Failure(errno.EINVAL)
+        return self.buffers[index]
+
+    def __fill_in(self, buf: buffer, fake: _FakeBuffer) -> None:
+        buf.index = fake.index
+        buf.type = self.buf_type
+        buf.memory = fake.memory
+        buf.length = fake.length
+        if fake.memory == V4L2_MEMORY.MMAP:
+            buf.m.offset = fake.offset
+        buf.bytesused = fake.bytesused
+        buf.field = fake.field
+        buf.sequence = fake.sequence
+        (buf.timestamp.sec, buf.timestamp.usec) = divmod(fake.timestamp, 1000000)
+
+    def __querybuf(self, buf: buffer) -> int:
+        self.__fill_in(buf, self.__buffer(buf))
+        return 0
+
+    def __qbuf(self, buf: buffer) -> int:
+        fake = self.__buffer(buf)
+        with self.lock:
+            if fake.queued:
+                raise _Failure(errno.EINVAL)
+            fake.queued = True
+            if fake.memory == V4L2_MEMORY.DMABUF and self.buf_type != V4L2_BUF_TYPE.VIDEO_OUTPUT:
+                fake.import_dmabuf(buf.m.fd)
+            if self.buf_type == V4L2_BUF_TYPE.VIDEO_OUTPUT:
+                # like V4L2_BUF_FLAG_TIMESTAMP_COPY, the device takes these from the user
+                fake.timestamp = buf.timestamp.sec * 1000000 + buf.timestamp.usec
+                fake.sequence = buf.sequence
+                fake.field = buf.field
+                fake.bytesused = buf.bytesused
+            self.queue.append(fake)
+            if self.streaming and self.buf_type == V4L2_BUF_TYPE.VIDEO_OUTPUT:
+                self.__consume_queued()
+        return 0
+
+    def __consume_queued(self) -> None:
+        while len(self.queue) > 0:
+            fake = self.queue.popleft()
+            fake.queued = False
+            self.consumed.append((fake.index, fake.timestamp, fake.sequence, fake.field, fake.bytesused))
+            self.__buffer_done(fake)
+        self.lock.notify_all()
+
+    def __dqbuf(self, buf: buffer) -> int:
+        with self.lock:
+            while len(self.done) == 0:
+                if not self.blocking or not self.streaming:
+                    raise _Failure(errno.EAGAIN)
+                self.lock.wait()
+            fake = self.__buffer_dequeued()
+        self.__fill_in(buf, fake)
+        return 0
+
+    def __expbuf(self, expbuf: exportbuffer) -> int:
+        if expbuf.index >= len(self.buffers):
+            raise _Failure(errno.EINVAL)
+        expbuf.fd = os.dup(self.buffers[expbuf.index].memfd)
+        return 0
+
+    def __streamon(self, buf_type: c_int) -> int:
+        if self.streaming:
+            return 0
+        self.streaming = True
+        if self.buf_type == V4L2_BUF_TYPE.VIDEO_OUTPUT:
+            with self.lock:
+                self.__consume_queued()
+            return 0
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.__produce, name=f"{type(self).__name__}.frames", daemon=True)
+        self.thread.start()
+        return 0
+
+    def __streamoff(self, buf_type: c_int) -> int:
+        self.__stream_off()
+        return 0
+
+    def __stream_off(self) -> None:
+        if not self.streaming:
+            return
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        with self.lock:
+            self.streaming = False
+            # like the driver, all buffers are returned to the user
+            for buf in self.buffers:
+                buf.queued = False
+            self.queue.clear()
+            while len(self.done) > 0:
+                self.__buffer_dequeued()
+            self.lock.notify_all()
+
+    def __produce(self) -> None:
+        start = time.monotonic()
+        n = 0
+        while True:
+            n += 1
+            due = start + n / self.framerate + self.rng.uniform(-self.jitter, self.jitter)
+            if self.stop_event.wait(max(0.0, due - time.monotonic())):
+                return
+            timestamp = int(time.monotonic() * 1000000)
+            with self.lock:
+                sequence = self.sequence
+                self.sequence += 1
+                if len(self.queue) == 0:
+                    self.dropped += 1
+                    continue
+                fake = self.queue.popleft()
+            view = fake.view
+            assert view is not None
+            data = self.frames(sequence, len(view))[: len(view)]
+            view[: len(data)] = data
+            compressed = self.fmt.fmt.pix.pixelformat in _COMPRESSED_FORMATS
+            if not compressed and len(data) < len(view):
+                view[len(data) :] = bytes(len(view) - len(data))
+            fake.bytesused = len(data) if compressed else len(view)
+            fake.sequence = sequence
+            fake.timestamp = timestamp
+            with self.lock:
+                if not fake.queued:
+                    # returned to the user by VIDIOC_STREAMOFF meanwhile
+                    continue
+                fake.queued = False
+                self.__buffer_done(fake)
+                self.lock.notify_all()
+
+    def __g_ext_ctrls(self, ctrls: v4l2_ext_controls) -> int:
+        for i in range(ctrls.count):
+            if ctrls.controls[i].id not in self.controls:
+                raise _Failure(errno.EINVAL)
+            ctrls.controls[i].value64 = self.controls[ctrls.controls[i].id]
+        return 0
+
+    def __s_ext_ctrls(self, ctrls: v4l2_ext_controls) -> int:
+        if ctrls.which != V4L2_CTRL_WHICH_CUR_VAL:
+            raise _Failure(errno.EINVAL)
+        for i in range(ctrls.count):
+            self.controls[ctrls.controls[i].id] = ctrls.controls[i].value64
+        return 0
+
+    def __subdev_s_fmt(self, fmt: subdev_format) -> int:
+        self.subdev_format = (fmt.format.width, fmt.format.height, fmt.format.code)
+        return 0
+
+    def __s_selection(self, sel: selection) -> int:
+        self.selection = (sel.r.left, sel.r.top, sel.r.width, sel.r.height)
+        return 0
+
+    def __queryctrl(self, qctrl: queryctrl) -> int:
+        if qctrl.id not in self.controls:
+            raise _Failure(errno.EINVAL)
+        return 0
+
+    def __g_ctrl(self, ctrl: control) -> int:
+        if ctrl.id not in self.controls:
+            raise _Failure(errno.EINVAL)
+        ctrl.value = self.controls[ctrl.id]
+        return 0
+
+    def __s_ctrl(self, ctrl: control) -> int:
+        if ctrl.id not in self.controls:
+            raise _Failure(errno.EINVAL)
+        self.controls[ctrl.id] = ctrl.value
+        return 0
+
+    __handlers: Dict[int, Tuple[Type[Any], Callable[..., int]]] = {
+        _VIDIOC.QUERYCAP: (capability, __querycap),
+        _VIDIOC.ENUM_FMT: (fmtdesc, __enum_fmt),
+        _VIDIOC.ENUM_FRAMESIZES: (frmsizeenum, __enum_framesizes),
+        _VIDIOC.ENUM_FRAMEINTERVALS: (frmivalenum, __enum_frameintervals),
+        _VIDIOC.S_FMT: (format, __s_fmt),
+        _VIDIOC.S_PARM: (streamparm, __s_parm),
+        _VIDIOC.REQBUFS: (requestbuffers, __reqbufs),
+        _VIDIOC.QUERYBUF: (buffer, __querybuf),
+        _VIDIOC.QBUF: (buffer, __qbuf),
+        _VIDIOC.DQBUF: (buffer, __dqbuf),
+        _VIDIOC.EXPBUF: (exportbuffer, __expbuf),
+        _VIDIOC.STREAMON: (c_int, __streamon),
+        _VIDIOC.STREAMOFF: (c_int, __streamoff),
+        _VIDIOC.G_EXT_CTRLS: (v4l2_ext_controls, __g_ext_ctrls),
+        _VIDIOC.S_EXT_CTRLS: (v4l2_ext_controls, __s_ext_ctrls),
+        _VIDIOC.SUBDEV_S_FMT: (subdev_format, __subdev_s_fmt),
+        _VIDIOC.S_SELECTION: (selection, __s_selection),
+        _VIDIOC.QUERYCTRL: (queryctrl, __queryctrl),
+        _VIDIOC.G_CTRL: (control, __g_ctrl),
+        _VIDIOC.S_CTRL: (control, __s_ctrl),
+    }
+
+
+class FakeV4L2Backend(V4L2Backend):  # type: ignore
+    """Backend of simulated devices, for running captures without cameras.
+
+    Example:
+
+        >>> from actfw_core.capture import V4LCameraCapture
+        >>> from actfw_core.v4l2.fake import FakeFormat, FakeV4L2Backend, FakeVideoDevice
+        >>> from actfw_core.v4l2.video import V4L2_PIX_FMT
+        >>> device = FakeVideoDevice([FakeFormat(V4L2_PIX_FMT.RGB24, [(640, 480)], [30])])
+        >>> with FakeV4L2Backend({"/dev/video0": device}):
+        ...     capture = V4LCameraCapture("/dev/video0", (640, 480))
+
+    The format conversion of the backend only passes frames through:
+    a format the device does not produce cannot be converted to.
+    """
+
+    def __init__(self, devices: Optional[Dict[str, FakeVideoDevice]] = None) -> None:
+        """
+
+        Args:
+            devices (dict, optional): simulated devices by path
+
+        """
+        self.devices: Dict[str, FakeVideoDevice] = dict(devices or {})
+        self.opened: Dict[int, FakeVideoDevice] = {}
+        self.previous: Optional[V4L2Backend] = None
+
+    def __enter__(self) -> "FakeV4L2Backend":
+        self.previous = set_backend(self)
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        set_backend(self.previous)
+
+    def add_device(self, path: str, device: FakeVideoDevice) -> None:
+        self.devices[path] = device
+
+    def open(self, path: str, flags: int) -> int:
+        device = self.devices.get(path)
+        if device is None:
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+        fd = device.open(flags)
+        self.opened[fd] = device
+        return fd
+
+    def close(self, fd: int) -> None:
+        self.opened.pop(fd).close()
+
+    def __call(self, f: Callable[[], int]) -> int:
+        try:
+            return f()
+        except _Failure as e:
+            set_errno(e.code)
+            return -1
+
+    def ioctl(self, fd: int, request: int, arg: Any) -> int:
+        device = self.opened.get(fd)
+        if device is None:
+            set_errno(errno.EBADF)
+            return -1
+        return self.__call(lambda: device.ioctl(request, arg))
+
+    def mmap(self, length: int, prot: int, flags: int, fd: int, offset: int) -> int:
+        device = self.opened.get(fd)
+        if device is None:
+            set_errno(errno.EBADF)
+            return -1
+        return self.__call(lambda: device.mmap(length, fd, offset))
+
+    def munmap(self, addr: Any, length: int) -> int:
+        address = addressof(cast(addr, POINTER(c_char)).contents)
+        for device in self.opened.values():
+            if address in device.mappings:
+                device.munmap(address)
+                return 0
+        set_errno(errno.EINVAL)
+        return -1
+
+    def converter_create(self, fd: int) -> FakeVideoDevice:
+        return self.opened[fd]
+
+    def converter_try_format(self, converter: FakeVideoDevice, dest_fmt: Any, src_fmt: Any) -> int:
+        # The device format to convert from is the destination format as the device would set it.
+        dest = cast(dest_fmt, POINTER(format)).contents.fmt.pix
+        src = cast(src_fmt, POINTER(format)).contents.fmt.pix
+        chosen = converter.try_format(dest.pixelformat, dest.width, dest.height)
+        _set_pix_format(src, *chosen)
+        _set_pix_format(dest, *chosen)
+        return 0
+
+    def converter_convert(
+        self,
+        converter: FakeVideoDevice,
+        src_fmt: Any,
+        dest_fmt: Any,
+        src: Any,
+        src_size: int,
+        dest: Any,
+        dest_size: int,
+    ) -> int:
+        size = min(src_size, dest_size)
+        memmove(dest, src, size)
+        return size
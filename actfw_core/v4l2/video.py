@@ -4,18 +4,20 @@
 import copy
 import enum
 import errno
-import io
 import itertools
 import mmap
 import os
 import select
+import threading
 import time
 import warnings
 from ctypes import *
 from ctypes.util import find_library
 from typing import List
 
+from actfw_core import flight_recorder
 from actfw_core.linux.ioctl import _IOR, _IOW, _IOWR
+from actfw_core.trace import _now, _span
 from actfw_core.v4l2.control import *
 from actfw_core.v4l2.types import *
 
@@ -113,6 +115,100 @@ _v4l2 = _libv4l2()
 _v4lconvert = _libv4lconvert()
 
 
+class V4L2Backend(object):
+    """
+    System calls and format conversions of V4L2 devices.
+
+    :class:`Video`, :class:`RawVideo` and :class:`VideoBuffer` go through the backend current when the device is opened,
+    so that devices can be replaced, e.g. with :class:`~actfw_core.v4l2.fake.FakeV4L2Backend`.
+    A failing call sets errno with `ctypes.set_errno` and returns -1, like the C functions.
+    """
+
+    def open(self, path, flags):
+        raise NotImplementedError()
+
+    def close(self, fd):
+        raise NotImplementedError()
+
+    def ioctl(self, fd, request, arg):
+        raise NotImplementedError()
+
+    def mmap(self, length, prot, flags, fd, offset):
+        raise NotImplementedError()
+
+    def munmap(self, addr, length):
+        raise NotImplementedError()
+
+    def converter_create(self, fd):
+        raise NotImplementedError()
+
+    def converter_try_format(self, converter, dest_fmt, src_fmt):
+        raise NotImplementedError()
+
+    def converter_convert(self, converter, src_fmt, dest_fmt, src, src_size, dest, dest_size):
+        raise NotImplementedError()
+
+
+class LibV4L2Backend(V4L2Backend):
+    """
+    Device files accessed through libv4l2 and libv4lconvert.
+    """
+
+    def open(self, path, flags):
+        return os.open(path, flags)
+
+    def close(self, fd):
+        os.close(fd)
+
+    def ioctl(self, fd, request, arg):
+        return _v4l2.ioctl(fd, request, arg)
+
+    def mmap(self, length, prot, flags, fd, offset):
+        return _v4l2.mmap(None, length, prot, flags, fd, offset)
+
+    def munmap(self, addr, length):
+        return _v4l2.munmap(addr, length)
+
+    def converter_create(self, fd):
+        return _v4lconvert.create(fd)
+
+    def converter_try_format(self, converter, dest_fmt, src_fmt):
+        return _v4lconvert.try_format(converter, dest_fmt, src_fmt)
+
+    def converter_convert(self, converter, src_fmt, dest_fmt, src, src_size, dest, dest_size):
+        return _v4lconvert.convert(converter, src_fmt, dest_fmt, src, src_size, dest, dest_size)
+
+
+_default_backend = LibV4L2Backend()
+_backend = _default_backend
+
+
+def get_backend():
+    """
+    Get the backend of devices opened from now on.
+
+    Returns:
+        :class:`V4L2Backend`: backend
+    """
+    return _backend
+
+
+def set_backend(backend=None):
+    """
+    Set the backend of devices opened from now on. Devices already opened keep theirs.
+
+    Args:
+        backend (:class:`V4L2Backend`, optional): backend; :class:`LibV4L2Backend` if None
+
+    Returns:
+        :class:`V4L2Backend`: previous backend
+    """
+    global _backend
+    previous = _backend
+    _backend = backend if backend is not None else _default_backend
+    return previous
+
+
 class _VIDIOC(enum.IntEnum):
     QUERYCAP = _IOR("V", 0, capability)
     ENUM_FMT = _IOWR("V", 2, fmtdesc)
@@ -402,6 +498,13 @@ class V4L2_SEL_FLAG(enum.IntEnum):
     KEEP_CONFIG = 1 << 2
 
 
+def _control_value(ctrl):
+    # the value of a scalar control, or the payload of a compound control
+    if ctrl.size > 0:
+        return string_at(ctrl.ptr, ctrl.size)
+    return ctrl.value64
+
+
 class RawVideo(object):
     def __init__(
         self,
@@ -412,17 +515,34 @@ class RawVideo(object):
     ):
         self.device = device
         self.v4l2_buf_type = v4l2_buf_type
+        self.backend = _backend
         flags = os.O_RDWR
         if not blocking:
             flags |= os.O_NONBLOCK
-        self.device_fd = os.open(self.device, flags)
+        self.device_fd = self.backend.open(self.device, flags)
         self.buffers: Optional[List[VideoBuffer]] = None  # set when enqueu
+        # controls staged by `stage_ext_controls`: id -> (control, payload keeping `ptr` valid)
+        self._staged_controls = {}
+        # last written value of each control id, see `_control_value`
+        self._applied_controls = {}
+        # number of `stage_ext_controls` calls staging any control since the last flush
+        self._staged_batches = 0
+        # staging, flushing and writing of controls may happen on different threads
+        self._controls_lock = threading.RLock()
+        self.control_ioctls = 0
+        # staged batches written by the flush of an earlier batch, i.e. `VIDIOC_S_EXT_CTRLS` saved by merging
+        self.control_batches_merged = 0
+        # staged controls not written because the device already has their values
+        self.controls_skipped = 0
+        # reused by every VIDIOC_DQBUF on this device
+        self._dequeued = buffer()
+        self._dequeued_ref = byref(self._dequeued)
 
         if len(init_controls) != 0:
             self.init_controls(init_controls)
 
     def close(self):
-        os.close(self.device_fd)
+        self.backend.close(self.device_fd)
 
     def __enter__(self):
         return self
@@ -432,7 +552,7 @@ class RawVideo(object):
 
     def _ioctl(self, request, arg):
         while True:
-            result = _v4l2.ioctl(self.device_fd, request, arg)
+            result = self.backend.ioctl(self.device_fd, request, arg)
             e = get_errno()
             if not (((-1 == result) and ((e == errno.EINTR)))):
                 break
@@ -583,13 +703,74 @@ class RawVideo(object):
         ctrls.which = V4L2_CTRL_WHICH_CUR_VAL
         ctrls.controls = ctr_arr
         ctrls.count = len(ctr_arr)
-        result = self._ioctl(_VIDIOC.S_EXT_CTRLS, byref(ctrls))
+        flight_recorder.record("control", "{} {}".format(self.device, ", ".join(hex(ctrl.id) for ctrl in ctr_arr)))
+        with self._controls_lock:
+            result = self._ioctl(_VIDIOC.S_EXT_CTRLS, byref(ctrls))
+            self.control_ioctls += 1
 
-        if -1 == result:
-            raise RuntimeError("ioctl(S_EXT_CTRLS){}".format(errno.errorcode[get_errno()]))
+            if -1 == result:
+                raise RuntimeError("ioctl(S_EXT_CTRLS){}".format(errno.errorcode[get_errno()]))
 
+            for ctrl in ctr_arr:
+                self._applied_controls[ctrl.id] = _control_value(ctrl)
         return ctr_arr
 
+    def stage_ext_controls(self, ctr_list: List[v4l2_ext_control], tolerance=0):
+        """
+        Stage controls to be written together by the next `flush_ext_controls`.
+
+        A control staged again before the flush replaces the previous one.
+        The payload of a compound control (`size` > 0) is copied, so the caller need not keep it alive.
+        Staging and flushing are thread-safe.
+
+        Args:
+            ctr_list (list of :class:`~actfw_core.v4l2.types.v4l2_ext_control`): controls
+            tolerance (int): a scalar control is not written while its value differs from the last written one by at most this
+        """
+        copies = []
+        for ctrl in ctr_list:
+            staged = v4l2_ext_control()
+            pointer(staged)[0] = ctrl
+            payload = None
+            if ctrl.size > 0:
+                payload = create_string_buffer(string_at(ctrl.ptr, ctrl.size), ctrl.size)
+                staged.ptr = cast(payload, c_void_p)
+            copies.append((staged, payload, _control_value(staged)))
+
+        with self._controls_lock:
+            staged_any = False
+            for staged, payload, value in copies:
+                applied = self._applied_controls.get(staged.id)
+                if applied is not None and (
+                    value == applied
+                    or (isinstance(value, int) and isinstance(applied, int) and abs(value - applied) <= tolerance)
+                ):
+                    self._staged_controls.pop(staged.id, None)
+                    self.controls_skipped += 1
+                    continue
+                self._staged_controls[staged.id] = (staged, payload)
+                staged_any = True
+            if staged_any:
+                self._staged_batches += 1
+
+    def flush_ext_controls(self):
+        """
+        Write the staged controls with at most one `VIDIOC_S_EXT_CTRLS`.
+
+        Returns:
+            bool: whether any control was written
+        """
+        with self._controls_lock:
+            batches = self._staged_batches
+            self._staged_batches = 0
+            if len(self._staged_controls) == 0:
+                return False
+            staged = list(self._staged_controls.values())
+            self._staged_controls.clear()
+            self.control_batches_merged += max(0, batches - 1)
+            self.set_ext_controls([ctrl for (ctrl, _payload) in staged])
+        return True
+
     def set_framerate(self, conf):
         parm = streamparm()
         parm.type = self.v4l2_buf_type
@@ -770,9 +951,23 @@ class RawVideo(object):
             if -1 == result:
                 raise RuntimeError("ioctl(VIDIOC_QBUF): {}".format(errno.errorcode[get_errno()]))
 
-    def queue_buffer(self, index):
+    def queue_buffer(self, index, source=None):
+        """
+        Queue a buffer.
+
+        Args:
+            index (int): index of the buffer
+            source (:class:`VideoBuffer`, optional): dequeued buffer whose timestamp, sequence, field and bytesused
+                are passed with the buffer, e.g. a captured frame queued to the output queue of a memory-to-memory device,
+                which copies them to its capture buffers (`V4L2_BUF_FLAG_TIMESTAMP_COPY`)
+        """
         video_buf = self.buffers[index]
-        result = self._ioctl(_VIDIOC.QBUF, byref(video_buf.buf))
+        if source is not None:
+            video_buf.buf.timestamp = source.buf.timestamp
+            video_buf.buf.sequence = source.buf.sequence
+            video_buf.buf.field = source.buf.field
+            video_buf.buf.bytesused = source.buf.bytesused
+        result = self._ioctl(_VIDIOC.QBUF, video_buf.buf_ref)
         if -1 == result:
             raise RuntimeError("ioctl(VIDIOC_QBUF): {}".format(errno.errorcode[get_errno()]))
 
@@ -791,16 +986,32 @@ class RawVideo(object):
         return True
 
     def dequeue_buffer_nonblocking(self, v4l2_memory: V4L2_MEMORY = V4L2_MEMORY.MMAP):
-        buf = buffer()
+        buf = self._dequeued
         buf.type = self.v4l2_buf_type
         buf.memory = v4l2_memory
-        result = self._ioctl(_VIDIOC.DQBUF, byref(buf))
+        result = self._ioctl(_VIDIOC.DQBUF, self._dequeued_ref)
         if result != 0 and get_errno() == errno.EAGAIN:
             return None
         elif -1 == result:
             raise RuntimeError("ioctl(VIDIOC_DQBUF): {}".format(errno.errorcode[get_errno()]))
 
-        return self.buffers[buf.index]
+        video_buf = self.buffers[buf.index]
+        video_buf.update_dequeued(buf)
+        return video_buf
+
+    def dequeue_all_buffers_nonblocking(self, v4l2_memory: V4L2_MEMORY = V4L2_MEMORY.MMAP):
+        """
+        Dequeue buffers until none is ready.
+
+        Returns:
+            list of :class:`VideoBuffer`: dequeued buffers in dequeued order
+        """
+        video_bufs = []
+        while True:
+            video_buf = self.dequeue_buffer_nonblocking(v4l2_memory)
+            if video_buf is None:
+                return video_bufs
+            video_bufs.append(video_buf)
 
     # blocking
     def dequeue_buffer(self, timeout=1, v4l2_memory: V4L2_MEMORY = V4L2_MEMORY.MMAP):
@@ -815,7 +1026,9 @@ class RawVideo(object):
         if -1 == result:
             raise RuntimeError("ioctl(VIDIOC_DQBUF): {}".format(errno.errorcode[get_errno()]))
 
-        return self.buffers[buf.index]
+        video_buf = self.buffers[buf.index]
+        video_buf.update_dequeued(buf)
+        return video_buf
 
     def requeue_buffer(self, video_buf):
         result = self._ioctl(_VIDIOC.QBUF, byref(video_buf.buf))
@@ -839,13 +1052,14 @@ class VideoConfig(object):
 class Video(object):
     def __init__(self, device="/dev/video0", blocking=False):
         self.device = device
+        self.backend = _backend
         flags = os.O_RDWR
         if not blocking:
             flags |= os.O_NONBLOCK
 
         for i in range(3):
             try:
-                self.device_fd = os.open(self.device, flags)
+                self.device_fd = self.backend.open(self.device, flags)
                 break
             except OSError as e:
                 # retry 3 times when device is busy
@@ -857,11 +1071,11 @@ class Video(object):
             )
             time.sleep(1)
 
-        self.converter = _v4lconvert.create(self.device_fd)
+        self.converter = self.backend.converter_create(self.device_fd)
         self.buffers: Optional[List[VideoBuffer]] = None  # set when enqueu
 
     def close(self):
-        os.close(self.device_fd)
+        self.backend.close(self.device_fd)
 
     def __enter__(self):
         return self
@@ -871,7 +1085,7 @@ class Video(object):
 
     def _ioctl(self, request, arg):
         while True:
-            result = _v4l2.ioctl(self.device_fd, request, arg)
+            result = self.backend.ioctl(self.device_fd, request, arg)
             e = get_errno()
             if not (((-1 == result) and ((e == errno.EINTR) or (e == errno.EAGAIN)))):
                 break
@@ -911,7 +1125,7 @@ class Video(object):
             fmt.index = i
             fmt.type = V4L2_BUF_TYPE.VIDEO_CAPTURE
 
-            result = _v4l2.ioctl(self.device_fd, _VIDIOC.ENUM_FMT, byref(fmt))
+            result = self.backend.ioctl(self.device_fd, _VIDIOC.ENUM_FMT, byref(fmt))
             if result != 0 and get_errno() == errno.EINVAL:
                 break
             if result != 0:
@@ -927,7 +1141,7 @@ class Video(object):
                 frmsize.index = j
                 frmsize.pixel_format = fmt.pixelformat
 
-                result = _v4l2.ioctl(self.device_fd, _VIDIOC.ENUM_FRAMESIZES, byref(frmsize))
+                result = self.backend.ioctl(self.device_fd, _VIDIOC.ENUM_FRAMESIZES, byref(frmsize))
                 if result != 0 and get_errno() == errno.EINVAL:
                     break
                 if result != 0:
@@ -975,7 +1189,7 @@ class Video(object):
                     frmival.width = candidate.width
                     frmival.height = candidate.height
 
-                    result = _v4l2.ioctl(self.device_fd, _VIDIOC.ENUM_FRAMEINTERVALS, byref(frmival))
+                    result = self.backend.ioctl(self.device_fd, _VIDIOC.ENUM_FRAMEINTERVALS, byref(frmival))
                     if result != 0 and get_errno() == errno.EINVAL:
                         break
                     if result != 0:
@@ -1055,7 +1269,7 @@ class Video(object):
         expected_fmt.fmt.pix.pixelformat = expected_format
         expected_fmt.fmt.pix.field = V4L2_FIELD.INTERLACED
 
-        result = _v4lconvert.try_format(self.converter, byref(expected_fmt), byref(fmt))
+        result = self.backend.converter_try_format(self.converter, byref(expected_fmt), byref(fmt))
         if -1 == result:
             raise RuntimeError("incompatible format")
 
@@ -1096,6 +1310,36 @@ class Video(object):
             self.expected_fmt.fmt.pix.pixelformat,
         )
 
+    def set_passthrough_format(self, conf):
+        """
+        Set the native format of the device without any conversion by libv4lconvert.
+
+        This is intended for compressed formats (e.g. MJPEG), whose payload is delivered as is.
+
+        Args:
+            conf (:class:`~actfw_core.v4l2.video.VideoConfig`): config returned by `lookup_config`
+
+        Returns:
+            (int, int, int): configured (width, height, pixel format)
+        """
+        fmt = format()
+        fmt.type = V4L2_BUF_TYPE.VIDEO_CAPTURE
+        fmt.fmt.pix.width = conf.width
+        fmt.fmt.pix.height = conf.height
+        fmt.fmt.pix.pixelformat = conf.pixel_format
+        fmt.fmt.pix.field = V4L2_FIELD.ANY
+        result = self._ioctl(_VIDIOC.S_FMT, byref(fmt))
+        if -1 == result:
+            raise RuntimeError("ioctl(VIDIOC_S_FMT)")
+
+        self.fmt = fmt
+        self.expected_fmt = fmt
+        return (
+            fmt.fmt.pix.width,
+            fmt.fmt.pix.height,
+            fmt.fmt.pix.pixelformat,
+        )
+
     def set_framerate(self, conf):
         parm = streamparm()
         parm.type = V4L2_BUF_TYPE.VIDEO_CAPTURE
@@ -1306,7 +1550,9 @@ class Video(object):
         if -1 == result:
             raise RuntimeError("ioctl(VIDIOC_DQBUF): {}".format(errno.errorcode[get_errno()]))
 
-        return self.buffers[buf.index]
+        video_buf = self.buffers[buf.index]
+        video_buf.update_dequeued(buf)
+        return video_buf
 
     def requeue_buffer(self, video_buf):
         result = self._ioctl(_VIDIOC.QBUF, byref(video_buf.buf))
@@ -1317,6 +1563,9 @@ class Video(object):
 class VideoStream(object):
     def __init__(self, video):
         self.video: Video = video
+        # timestamp [sec] (CLOCK_MONOTONIC) and sequence number of the last captured frame
+        self.timestamp = None
+        self.sequence = None
 
     def __enter__(self):
         return self
@@ -1327,10 +1576,13 @@ class VideoStream(object):
         self.video.stop_streaming()
 
     def capture(self, timeout=1, in_expected_format=True):
+        t_0 = _now()
         buf = self.video.dequeue_buffer(timeout=timeout)
-        dst = bytes(self.video.expected_fmt.fmt.pix.sizeimage)
+        _span("dequeue", "capture", t_0, buf.buf)
+        t_0 = _now()
         if in_expected_format:
-            _v4lconvert.convert(
+            dst = bytes(self.video.expected_fmt.fmt.pix.sizeimage)
+            self.video.backend.converter_convert(
                 self.video.converter,
                 byref(self.video.fmt),
                 byref(self.video.expected_fmt),
@@ -1340,9 +1592,13 @@ class VideoStream(object):
                 self.video.expected_fmt.fmt.pix.sizeimage,
             )
         else:
-            stream = io.BytesIO(dst)
-            stream.write(buf.mapped_buf.contents)
+            # Deliver the payload as is (e.g. a compressed MJPEG frame), trimmed to the bytes actually used.
+            dst = string_at(buf.mapped_buf, buf.buf.bytesused)
+
+        _span("convert", "capture", t_0, buf.buf)
 
+        self.timestamp = buf.timestamp()
+        self.sequence = buf.buf.sequence
         self.video.requeue_buffer(buf)
 
         return dst
@@ -1368,8 +1624,7 @@ class VideoBuffer(object):
             raise RuntimeError("ioctl(VIDIOC_QUERYBUF): {}".format(errno.errorcode[get_errno()]))
 
         if v4l2_memory == V4L2_MEMORY.MMAP:
-            result = _v4l2.mmap(
-                None,
+            result = video.backend.mmap(
                 buf.length,
                 mmap.PROT_READ | mmap.PROT_WRITE,
                 mmap.MAP_SHARED,
@@ -1387,26 +1642,48 @@ class VideoBuffer(object):
             self.buf = buf
             self.buf.m.fd = dma_fd
             self.dma_fd = dma_fd
+        # reused by every VIDIOC_QBUF of this buffer
+        self.buf_ref = byref(buf)
+
+    def update_dequeued(self, buf):
+        """
+        Copy the fields filled by VIDIOC_DQBUF into this buffer.
+        """
+        self.buf.bytesused = buf.bytesused
+        self.buf.flags = buf.flags
+        self.buf.field = buf.field
+        self.buf.timestamp = buf.timestamp
+        self.buf.sequence = buf.sequence
+
+    def timestamp(self):
+        """
+        Get the capture timestamp of the last dequeued frame.
+
+        Returns:
+            float: timestamp [sec] on CLOCK_MONOTONIC (comparable with `time.monotonic()`)
+        """
+        return self.buf.timestamp.sec + self.buf.timestamp.usec * 1e-6
 
     def unmap_buffer(self):
         if self.mapped_buf is None:
             return
-        result = _v4l2.munmap(self.mapped_buf, self.buf.length)
+        result = self.video.backend.munmap(self.mapped_buf, self.buf.length)
         if result == -1:
             raise RuntimeError("munmap failed: {}".format(errno.errorcode[get_errno()]))
         self.mapped_buf = None
 
 
 class V4LConverter(object):
-    def __init__(self, device_fd) -> None:
-        self.converter = _v4lconvert.create(device_fd)
+    def __init__(self, device_fd, backend=None) -> None:
+        self.backend = backend if backend is not None else _backend
+        self.converter = self.backend.converter_create(device_fd)
 
     def convert(self, buffer: VideoBuffer, src_fmt, dst_fmt) -> bytes:
         if buffer.buf.memory == V4L2_MEMORY.DMABUF:
             raise RuntimeError("V4LConverter.convert: expected memory type MMAP")
 
         dst = bytes(dst_fmt.fmt.pix.sizeimage)
-        _v4lconvert.convert(
+        self.backend.converter_convert(
             self.converter,
             byref(src_fmt),
             byref(dst_fmt),
@@ -1426,7 +1703,7 @@ class V4LConverter(object):
         dst_fmt.fmt.pix.pixelformat = expected_format
         dst_fmt.fmt.pix.field = V4L2_FIELD.INTERLACED
 
-        result = _v4lconvert.try_format(self.converter, byref(src_fmt), byref(dst_fmt))
+        result = self.backend.converter_try_format(self.converter, byref(src_fmt), byref(dst_fmt))
         if -1 == result:
             raise RuntimeError("incompatible format")
 
@@ -0,0 +1,86 @@
+import sys
+
+# Add packages
+if True:
+    sys.path.append(".")
+    sys.path.append("..")
+
+import threading
+import time
+from typing import List
+
+import actfw_core
+from actfw_core.task import BatchPipe, Consumer, Pipe, Producer, Task
+
+COUNT = 2000
+# Fixed cost of an inference call, e.g. a kernel launch or a transfer to an accelerator.
+CALL_OVERHEAD = 0.001
+ITEM_COST = 0.0001
+
+
+class Source(Producer[int]):
+    def __init__(self) -> None:
+        super().__init__()
+        self.n = 0
+
+    def proc(self) -> int:
+        self.n += 1
+        return self.n
+
+
+class Infer(Pipe[int, int]):
+    def proc(self, x: int) -> int:
+        time.sleep(CALL_OVERHEAD + ITEM_COST)
+        return x
+
+
+class BatchInfer(BatchPipe[int, int]):
+    def proc_batch(self, xs: List[int]) -> List[int]:
+        time.sleep(CALL_OVERHEAD + ITEM_COST * len(xs))
+        return xs
+
+
+class Sink(Consumer[int]):
+    def __init__(self, done: threading.Event) -> None:
+        super().__init__()
+        self.n = 0
+        self.done = done
+
+    def proc(self, x: int) -> None:
+        self.n += 1
+        if self.n == COUNT:
+            self.done.set()
+
+
+def measure(name: str, infer: Task) -> None:
+    app = actfw_core.Application(stop_by_signals=())
+    done = threading.Event()
+
+    chain: List[Task] = [Source(), infer, Sink(done)]
+    for task in chain:
+        app.register_task(task)
+    for prev, follow in zip(chain, chain[1:]):
+        prev.connect(follow)  # type: ignore
+
+    th = threading.Thread(target=lambda: app.run())
+    t_0 = time.time()
+    th.start()
+    done.wait()
+    t_1 = time.time()
+    app.stop()
+    th.join()
+
+    t = t_1 - t_0
+    fps = COUNT / t
+    print(f"{name}: t = {t}, fps = {fps}")
+
+
+def benchmark() -> None:
+    for _ in range(3):
+        measure("Pipe", Infer())
+        for size in [4, 16]:
+            measure(f"BatchPipe(max_batch_size={size})", BatchInfer(size, 0.01))
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,83 @@
+import sys
+
+# Add packages
+if True:
+    sys.path.append(".")
+    sys.path.append("..")
+
+import threading
+import time
+from typing import List
+
+import actfw_core
+from actfw_core.task import Consumer, DispatchMode, Pipe, Producer, Task
+
+DURATION = 3.0
+# One slow and one fast worker, e.g. on a big and a little core.
+WORKER_COSTS = [0.02, 0.002]
+
+
+class Source(Producer[int]):
+    def __init__(self) -> None:
+        super().__init__()
+        self.n = 0
+
+    def proc(self) -> int:
+        self.n += 1
+        return self.n
+
+
+class Worker(Pipe[int, int]):
+    def __init__(self, cost: float) -> None:
+        super().__init__()
+        self.cost = cost
+
+    def proc(self, x: int) -> int:
+        time.sleep(self.cost)
+        return x
+
+
+class Sink(Consumer[int]):
+    def __init__(self) -> None:
+        super().__init__()
+        self.n = 0
+
+    def proc(self, x: int) -> None:
+        self.n += 1
+
+
+def measure(mode: DispatchMode) -> None:
+    app = actfw_core.Application(stop_by_signals=())
+
+    source = Source()
+    source.set_dispatch_mode(mode)
+    app.register_task(source)
+    sinks: List[Sink] = []
+    for cost in WORKER_COSTS:
+        worker = Worker(cost)
+        sink = Sink()
+        tasks: List[Task] = [worker, sink]
+        for task in tasks:
+            app.register_task(task)
+        source.connect(worker)
+        worker.connect(sink)
+        sinks.append(sink)
+
+    th = threading.Thread(target=lambda: app.run())
+    th.start()
+    time.sleep(DURATION)
+    app.stop()
+    th.join()
+
+    fps = sum(sink.n for sink in sinks) / DURATION
+    utilizations = ", ".join(f"{utilization:.2f}" for (_, _, utilization) in source.dispatch_stats())
+    print(f"{mode.name}: fps = {fps}, utilizations = [{utilizations}]")
+
+
+def benchmark() -> None:
+    for mode in DispatchMode:
+        measure(mode)
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,92 @@
+import sys
+
+# Add packages
+if True:
+    sys.path.append(".")
+    sys.path.append("..")
+
+import os
+import select
+import time
+from ctypes import byref
+from typing import Callable, List, Tuple
+
+from actfw_core.v4l2.types import buffer
+
+COUNT = 100000
+# unicam, unicam metadata, ISP output, ISP statistics; the ISP input is polled for writing.
+READ_DEVICES = 4
+
+
+def make_devices() -> Tuple[List[int], int]:
+    # Pipes stand in for the video devices: every read end is readable, like a device with a ready buffer.
+    readers = []
+    for _ in range(READ_DEVICES):
+        r, w = os.pipe()
+        os.write(w, b"x")
+        readers.append(r)
+    _, writer = os.pipe()
+    return (readers, writer)
+
+
+def ioctl(arg: object) -> int:
+    # VIDIOC_DQBUF itself costs the same in both loops
+    return 0
+
+
+def dequeue_allocating() -> None:
+    # `dequeue_buffer_nonblocking` before the `v4l2_buffer` struct was preallocated
+    buf = buffer()
+    buf.type = 1
+    buf.memory = 1
+    ioctl(byref(buf))
+
+
+def select_loop(readers: List[int], writer: int) -> Callable[[], None]:
+    def step() -> None:
+        rlist, wlist, _ = select.select(readers[:3] + readers[3:], [writer], [], 1)
+        for _ in rlist:
+            dequeue_allocating()
+        for _ in wlist:
+            dequeue_allocating()
+
+    return step
+
+
+def epoll_loop(readers: List[int], writer: int) -> Callable[[], None]:
+    ep = select.epoll()
+    for fd in readers:
+        ep.register(fd, select.EPOLLIN)
+    ep.register(writer, select.EPOLLOUT)
+    buf = buffer()
+    ref = byref(buf)
+
+    def dequeue_preallocated() -> None:
+        buf.type = 1
+        buf.memory = 1
+        ioctl(ref)
+
+    def step() -> None:
+        for _ in ep.poll(1):
+            dequeue_preallocated()
+
+    return step
+
+
+def measure(name: str, step: Callable[[], None]) -> None:
+    t_0 = time.perf_counter()
+    for _ in range(COUNT):
+        step()
+    t = time.perf_counter() - t_0
+    print(f"{name}: {t / COUNT * 1e6:.2f} us/iteration")
+
+
+def benchmark() -> None:
+    (readers, writer) = make_devices()
+    for _ in range(3):
+        measure("select + allocated v4l2_buffer", select_loop(readers, writer))
+        measure("epoll + preallocated v4l2_buffer", epoll_loop(readers, writer))
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,80 @@
+import sys
+
+# Add packages
+if True:
+    sys.path.append(".")
+    sys.path.append("..")
+
+import threading
+import time
+from typing import List
+
+import actfw_core
+from actfw_core.capture import Frame, V4LCameraCapture
+from actfw_core.task import Consumer
+from actfw_core.v4l2.fake import FakeFormat, FakeV4L2Backend, FakeVideoDevice, recorded_frames
+from actfw_core.v4l2.video import V4L2_PIX_FMT  # type: ignore
+
+COUNT = 600
+FRAMERATE = 120
+JITTER = 0.002
+# Recorded MJPEG frames are passed through as is; the contents need not be decodable here.
+MJPEG_FRAMES = [b"\xff\xd8" + bytes([i]) * (20000 + 1000 * i) + b"\xff\xd9" for i in range(8)]
+
+
+class Sink(Consumer[Frame[bytes]]):
+    def __init__(self, done: threading.Event) -> None:
+        super().__init__()
+        self.latencies: List[float] = []
+        self.done = done
+
+    def proc(self, frame: Frame[bytes]) -> None:
+        assert frame.timestamp is not None
+        self.latencies.append(time.monotonic() - frame.timestamp)
+        if len(self.latencies) == COUNT:
+            self.done.set()
+
+
+def measure(name: str, device: FakeVideoDevice, size: List[int], expected_format: int) -> None:
+    with FakeV4L2Backend({"/dev/video0": device}):
+        capture = V4LCameraCapture("/dev/video0", (size[0], size[1]), FRAMERATE, expected_format=expected_format)
+    app = actfw_core.Application(stop_by_signals=())
+    done = threading.Event()
+    sink = Sink(done)
+    app.register_task(capture)
+    app.register_task(sink)
+    capture.connect(sink)
+
+    th = threading.Thread(target=lambda: app.run())
+    t_0 = time.time()
+    th.start()
+    done.wait()
+    t_1 = time.time()
+    app.stop()
+    th.join()
+
+    t = t_1 - t_0
+    fps = COUNT / t
+    latencies = sorted(sink.latencies[:COUNT])
+    mean = sum(latencies) / len(latencies)
+    p99 = latencies[len(latencies) * 99 // 100]
+    stats = capture.capture_stats()
+    print(
+        f"{name}: t = {t}, fps = {fps}, latency mean {mean * 1e3:.2f} ms, p99 {p99 * 1e3:.2f} ms, "
+        f"dropped by the device {device.dropped}, captured {stats.captured}"
+    )
+
+
+def benchmark() -> None:
+    for _ in range(3):
+        for size in [(640, 480), (1280, 720)]:
+            device = FakeVideoDevice([FakeFormat(V4L2_PIX_FMT.RGB24, [size], [FRAMERATE])], jitter=JITTER)
+            measure(f"RGB24 {size[0]}x{size[1]}", device, list(size), V4L2_PIX_FMT.RGB24)
+        device = FakeVideoDevice(
+            [FakeFormat(V4L2_PIX_FMT.MJPEG, [(1280, 720)], [FRAMERATE])], frames=recorded_frames(MJPEG_FRAMES), jitter=JITTER
+        )
+        measure("MJPEG 1280x720 passthrough", device, [1280, 720], V4L2_PIX_FMT.MJPEG)
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,102 @@
+import sys
+
+# Add packages
+if True:
+    sys.path.append(".")
+    sys.path.append("..")
+
+import json
+import os
+import random
+import tempfile
+from dataclasses import asdict
+from typing import List
+
+from actfw_core.isp_recording import RecordKind, StatsRecorder, StatsRecording, load_stats_recording
+from actfw_core.isp_replay import ReplayFrame, diff_control_writes, dump_control_writes, replay_stats
+from actfw_core.unicam_isp_capture import V2_UNICAM_MODES
+from actfw_core.v4l2.types import NUM_HISTOGRAM_BINS, bcm2835_isp_stats
+
+# Usage: python bench/isp_replay.py [RECORDING [BASELINE]]
+#   RECORDING: written by `UnicamIspCapture(stats_record=...)`; a synthetic imx219 recording if omitted or "-"
+#   BASELINE: control writes to compare with; written if the file does not exist. Exits with 1 on differences.
+COUNT = 300
+
+
+def synthetic_recording(n: int) -> StatsRecording:
+    rng = random.Random(0)
+    camera_mode = V2_UNICAM_MODES[2]
+    setup = {
+        "sensor_name": "imx219",
+        "config_file": "imx219.json",
+        "config": None,
+        "camera_mode": asdict(camera_mode),
+        "crop_size": [0, 0, *camera_mode.size],
+        "unicam_width": camera_mode.size[0],
+        "auto_whitebalance": True,
+        "agc": True,
+        "contrast": True,
+        "shutter_time": None,
+        "analogue_gain": None,
+        "target_Y": 0.16,
+        "device_status": {"hblank": 3448, "vblank": 1000, "pixel_late": 182400000},
+        "exposure": 10000.0,
+        "color_temperature": 4500,
+    }
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "stats.rec")
+        with StatsRecorder(path, setup) as recorder:
+            for sequence in range(n):
+                # a scene slowly getting brighter and darker
+                level = 500 + 50 * (sequence % 60)
+                stats = bcm2835_isp_stats()
+                for i in range(NUM_HISTOGRAM_BINS):
+                    stats.hist[0].g_hist[i] = rng.randrange(1000) + (5000 if i * 64 < level else 0)
+                for regions in [stats.awb_stats, stats.agc_stats]:
+                    for region in regions:
+                        region.counted = 1000
+                        region.r_sum = 1000 * rng.randrange(level, 2 * level)
+                        region.g_sum = 1000 * rng.randrange(level, 2 * level)
+                        region.b_sum = 1000 * rng.randrange(level, 2 * level)
+                recorder.record(RecordKind.ISP_STATS, sequence, sequence / 30, bytes(stats))
+        return load_stats_recording(path)
+
+
+def report(frames: List[ReplayFrame]) -> None:
+    for kind in RecordKind:
+        times = sorted(frame.seconds for frame in frames if frame.kind == kind)
+        if len(times) == 0:
+            continue
+        mean = sum(times) / len(times)
+        p99 = times[min(len(times) - 1, len(times) * 99 // 100)]
+        print(
+            f"{kind.name}: {len(times)} records, mean {mean * 1e6:.1f} us, p99 {p99 * 1e6:.1f} us, max {times[-1] * 1e6:.1f} us"
+        )
+    writes = sum(len(frame.controls) for frame in frames)
+    print(f"control writes: {writes} ({writes / len(frames):.2f}/record)")
+
+
+def benchmark() -> None:
+    recording = load_stats_recording(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1] != "-" else synthetic_recording(COUNT)
+    for _ in range(3):
+        frames = replay_stats(recording)
+        report(frames)
+
+    if len(sys.argv) > 2:
+        baseline_path = sys.argv[2]
+        if not os.path.exists(baseline_path):
+            with open(baseline_path, "w") as f:
+                json.dump(dump_control_writes(frames), f)
+            print(f"baseline written to {baseline_path}")
+            return
+        with open(baseline_path) as f:
+            diffs = diff_control_writes(frames, json.load(f))
+        for diff in diffs:
+            print(diff)
+        if len(diffs) > 0:
+            sys.exit(1)
+        print("control writes match the baseline")
+
+
+if __name__ == "__main__":
+    benchmark()
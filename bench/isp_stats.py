@@ -0,0 +1,101 @@
+import sys
+
+# Add packages
+if True:
+    sys.path.append(".")
+    sys.path.append("..")
+
+import random
+import time
+from ctypes import memmove, sizeof
+from typing import Callable, List
+
+from actfw_core.isp_stats import ClippedRegionSums, IspStatsView
+from actfw_core.v4l2.types import NUM_HISTOGRAM_BINS, bcm2835_isp_stats
+
+COUNT = 2000
+PIPELINE_BITS = 13
+# Gains tried by one AGC update, which evaluates the statistics up to 8 times.
+AGC_GAINS = [1.0, 1.8, 1.3, 1.1, 1.05, 1.02, 1.01, 1.005]
+
+
+def load_stats(path: str) -> List[bcm2835_isp_stats]:
+    # A file of raw `bcm2835_isp_stats` buffers, one after another.
+    with open(path, "rb") as f:
+        data = f.read()
+    size = sizeof(bcm2835_isp_stats)
+    buffers = []
+    for offset in range(0, len(data) - size + 1, size):
+        stats = bcm2835_isp_stats()
+        memmove(stats, data[offset : offset + size], size)
+        buffers.append(stats)
+    return buffers
+
+
+def synthetic_stats(n: int) -> List[bcm2835_isp_stats]:
+    rng = random.Random(0)
+    buffers = []
+    for _ in range(n):
+        stats = bcm2835_isp_stats()
+        for i in range(NUM_HISTOGRAM_BINS):
+            stats.hist[0].g_hist[i] = rng.randrange(1 << 16)
+        for regions in [stats.awb_stats, stats.agc_stats]:
+            for region in regions:
+                region.counted = rng.randrange(1 << 12)
+                region.r_sum = rng.randrange(1 << 32)
+                region.g_sum = rng.randrange(1 << 32)
+                region.b_sum = rng.randrange(1 << 32)
+        buffers.append(stats)
+    return buffers
+
+
+def per_field(stats: bcm2835_isp_stats) -> None:
+    # The reductions of `UnicamIspCapture` before the statistics were read through `IspStatsView`.
+    hist = stats.hist[0].g_hist
+    hist_sum = 0
+    hist_num = 0
+    for i in range(NUM_HISTOGRAM_BINS):
+        hist_sum += hist[i] * i
+        hist_num += hist[i]
+    for gain in AGC_GAINS:
+        r_sum = g_sum = b_sum = 0.0
+        for region in stats.agc_stats:
+            counted = region.counted
+            r_sum += min(region.r_sum * gain, ((1 << PIPELINE_BITS) - 1) * counted)
+            b_sum += min(region.b_sum * gain, ((1 << PIPELINE_BITS) - 1) * counted)
+            g_sum += min(region.g_sum * gain, ((1 << PIPELINE_BITS) - 1) * counted)
+    sum_r = sum_g = sum_b = 0
+    for region in stats.awb_stats:
+        sum_r += region.r_sum
+        sum_b += region.b_sum
+        sum_g += region.g_sum
+
+
+def view(stats: bcm2835_isp_stats) -> None:
+    view = IspStatsView(stats)
+    hist = view.histogram("g")
+    sum(map(int.__mul__, hist, range(NUM_HISTOGRAM_BINS)))
+    sum(hist)
+    region_sums = ClippedRegionSums(view, "agc", PIPELINE_BITS)
+    for gain in AGC_GAINS:
+        region_sums.evaluate(gain)
+    view.total_sums("awb")
+
+
+def measure(name: str, reduce: Callable[[bcm2835_isp_stats], None], buffers: List[bcm2835_isp_stats]) -> None:
+    t_0 = time.perf_counter()
+    for n in range(COUNT):
+        reduce(buffers[n % len(buffers)])
+    t = time.perf_counter() - t_0
+    print(f"{name}: {t / COUNT * 1e6:.1f} us/frame")
+
+
+def benchmark() -> None:
+    buffers = load_stats(sys.argv[1]) if len(sys.argv) > 1 else synthetic_stats(16)
+    for _ in range(3):
+        measure("per-field", per_field, buffers)
+        measure("IspStatsView", view, buffers)
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,108 @@
+import sys
+
+# Add packages
+if True:
+    sys.path.append(".")
+    sys.path.append("..")
+
+import random
+import time
+from ctypes import POINTER, c_uint8, cast
+from types import SimpleNamespace
+from typing import Any, Callable, List
+
+from actfw_core.autofocus import PDAF_STATS_COLS, PDAF_STATS_ROWS, AutoFocuserIMX708, PdafData
+
+COUNT = 5000
+UNICAM_WIDTH = 1536
+BYTES_PER_LINE = (UNICAM_WIDTH * 10) >> 3
+
+
+def load_meta_buffers(path: str) -> List[Any]:
+    # A file of unicam metadata buffers of 3 lines each, one after another.
+    with open(path, "rb") as f:
+        data = f.read()
+    size = 3 * BYTES_PER_LINE
+    return [meta_buffer(data[offset : offset + size]) for offset in range(0, len(data) - size + 1, size)]
+
+
+def synthetic_meta_buffers(n: int) -> List[Any]:
+    rng = random.Random(0)
+    buffers = []
+    for _ in range(n):
+        data = bytearray(rng.randrange(256) for _ in range(3 * BYTES_PER_LINE))
+        data[2 * BYTES_PER_LINE] = 0
+        data[2 * BYTES_PER_LINE + 1] = rng.randrange(0x40)
+        buffers.append(meta_buffer(bytes(data)))
+    return buffers
+
+
+def meta_buffer(data: bytes) -> Any:
+    array = (c_uint8 * len(data)).from_buffer_copy(data)
+    return SimpleNamespace(mapped_buf=cast(array, POINTER(c_uint8)), buf=SimpleNamespace(bytesused=len(data)), array=array)
+
+
+def per_region(focuser: AutoFocuserIMX708, meta_buffer: Any) -> None:
+    # `parse_pdaf` and the phase aggregation before the regions were decoded into parallel arrays
+    ptr = meta_buffer.mapped_buf[2 * BYTES_PER_LINE : 3 * BYTES_PER_LINE]
+    grid = [[PdafData(0, 0) for _ in range(PDAF_STATS_COLS)] for _ in range(PDAF_STATS_ROWS)]
+    offset = 10
+    for i in range(PDAF_STATS_ROWS):
+        for j in range(PDAF_STATS_COLS):
+            conf = (ptr[offset] << 3) | (ptr[offset + 1] >> 5)
+            phase = 0
+            if conf != 0:
+                phase = (((ptr[offset + 1] & 0x0F) - (ptr[offset + 1] & 0x10)) << 6) | (ptr[offset + 2] >> 2)
+            grid[i][j] = PdafData(conf, phase)
+            offset += 5
+    cfg = focuser.cfg
+    sumWc = 0
+    sumWcp = 0
+    for i in range(PDAF_STATS_ROWS * PDAF_STATS_COLS):
+        w = focuser.phaseWeights.w[i]
+        if w != 0:
+            data = grid[i // PDAF_STATS_COLS][i % PDAF_STATS_COLS]
+            c = data.conf
+            if c >= cfg.confThresh:
+                if c > cfg.confClip:
+                    c = cfg.confClip
+                c -= cfg.confThresh >> 2
+                sumWc += int(w * c)
+                c -= cfg.confThresh >> 2
+                sumWcp += int(w * c) * int(data.phase)
+
+
+def arrays(focuser: AutoFocuserIMX708, meta_buffer: Any) -> None:
+    focuser._AutoFocuserBase__get_phase(focuser.parse_pdaf(meta_buffer))  # type: ignore
+
+
+def measure(name: str, focuser: AutoFocuserIMX708, parse: Callable[[AutoFocuserIMX708, Any], None], buffers: List[Any]) -> None:
+    t_0 = time.perf_counter()
+    for n in range(COUNT):
+        parse(focuser, buffers[n % len(buffers)])
+    t = time.perf_counter() - t_0
+    print(f"{name}: {t / COUNT * 1e6:.1f} us/frame")
+
+
+def benchmark() -> None:
+    buffers = load_meta_buffers(sys.argv[1]) if len(sys.argv) > 1 else synthetic_meta_buffers(16)
+    focuser = AutoFocuserIMX708()
+    focuser.set_unicam_config(
+        {"rpi.af": {}},
+        unicam_width=UNICAM_WIDTH,
+        sensor_size=(4608, 2592),
+        post_crop_size=(0, 0, 1536, 864),
+        camera_mode_scale=(3.0, 3.0),
+        camera_mode_crop_size=(0, 0),
+        callback_fn=lambda value: None,
+    )
+    # full-frame window, so that every region is weighted
+    focuser.set_focus_windows([[0.0, 0.0, 1536.0, 864.0]])
+    arrays(focuser, buffers[0])
+    for _ in range(3):
+        measure("per-region", focuser, per_region, buffers)
+        measure("parallel arrays", focuser, arrays, buffers)
+
+
+if __name__ == "__main__":
+    benchmark()
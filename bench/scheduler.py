@@ -0,0 +1,75 @@
+import sys
+
+# Add packages
+if True:
+    sys.path.append(".")
+    sys.path.append("..")
+
+import threading
+import time
+from typing import List
+
+import actfw_core
+from actfw_core.task import Consumer, Pipe, Producer, Task
+
+COUNT = 10**4
+STAGES = 3
+
+
+class Source(Producer[int]):
+    def __init__(self) -> None:
+        super().__init__()
+        self.n = 0
+
+    def proc(self) -> int:
+        self.n += 1
+        return self.n
+
+
+class Identity(Pipe[int, int]):
+    def proc(self, x: int) -> int:
+        return x
+
+
+class Sink(Consumer[int]):
+    def __init__(self, app: actfw_core.Application) -> None:
+        super().__init__()
+        self.n = 0
+        self.app = app
+        self.t_1 = 0.0
+
+    def proc(self, x: int) -> None:
+        self.n += 1
+        if self.n == COUNT:
+            self.t_1 = time.time()
+            self.app.stop()
+
+
+def measure(name: str, cooperative: bool) -> None:
+    app = actfw_core.Application(stop_by_signals=())
+
+    sink = Sink(app)
+    chain: List[Task] = [Source()] + [Identity() for _ in range(STAGES)] + [sink]
+    for task in chain:
+        app.register_task(task)
+    for prev, follow in zip(chain, chain[1:]):
+        prev.connect(follow)  # type: ignore
+
+    th = threading.Thread(target=lambda: app.run(cooperative=cooperative))
+    t_0 = time.time()
+    th.start()
+    th.join()
+
+    t = sink.t_1 - t_0
+    fps = COUNT / t
+    print(f"{name}: t = {t}, fps = {fps}")
+
+
+def benchmark() -> None:
+    for _ in range(3):
+        measure("thread per task", cooperative=False)
+        measure("cooperative", cooperative=True)
+
+
+if __name__ == "__main__":
+    benchmark()
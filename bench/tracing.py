@@ -0,0 +1,80 @@
+import sys
+
+# Add packages
+if True:
+    sys.path.append(".")
+    sys.path.append("..")
+
+import threading
+import time
+from typing import List
+
+import actfw_core
+from actfw_core import trace
+from actfw_core.task import Consumer, Pipe, Producer, Task
+
+COUNT = 10**4
+STAGES = 5
+
+
+class Source(Producer[int]):
+    def __init__(self) -> None:
+        super().__init__()
+        self.n = 0
+
+    def proc(self) -> int:
+        self.n += 1
+        return self.n
+
+
+class Identity(Pipe[int, int]):
+    def proc(self, x: int) -> int:
+        return x
+
+
+class Sink(Consumer[int]):
+    def __init__(self, done: threading.Event) -> None:
+        super().__init__()
+        self.n = 0
+        self.done = done
+
+    def proc(self, x: int) -> None:
+        self.n += 1
+        if self.n == COUNT:
+            self.done.set()
+
+
+def measure(name: str, tracing: bool) -> None:
+    app = actfw_core.Application(stop_by_signals=())
+    done = threading.Event()
+    if tracing:
+        trace.enable_tracing()
+
+    chain: List[Task] = [Source()] + [Identity() for _ in range(STAGES)] + [Sink(done)]
+    for task in chain:
+        app.register_task(task)
+    for prev, follow in zip(chain, chain[1:]):
+        prev.connect(follow)  # type: ignore
+
+    th = threading.Thread(target=lambda: app.run())
+    t_0 = time.time()
+    th.start()
+    done.wait()
+    t_1 = time.time()
+    app.stop()
+    th.join()
+    trace.disable_tracing()
+
+    t = t_1 - t_0
+    fps = COUNT / t
+    print(f"{name}: t = {t}, fps = {fps}")
+
+
+def benchmark() -> None:
+    for _ in range(3):
+        measure("tracing disabled", tracing=False)
+        measure("tracing enabled", tracing=True)
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -8,7 +8,10 @@ import pytest
         ("actfw_core", "CommandServer"),
         ("actfw_core", "LocalVideoServer"),
         ("actfw_core.capture", "V4LCameraCapture"),
-        ("actfw_core.task", "Consumer, Isolated, Join, Pipe, Producer, Task, Tee"),
+        (
+            "actfw_core.task",
+            "AsyncConsumer, AsyncPipe, BatchPipe, Consumer, DispatchMode, FusedPipe, Isolated, Join, Pipe, Producer, Task, Tee, TeePolicy",
+        ),
     ],
 )
 def test_import_actfw_core(from_: str, import_: str) -> None:
@@ -1,9 +1,29 @@
+import asyncio
+import os
 import threading
 import time
-from typing import List, Tuple
+from pathlib import Path
+from typing import Any, List, Optional, Set, Tuple
 
 import actfw_core
-from actfw_core.task import Consumer, Join, Pipe, Producer, Tee
+import pytest
+from actfw_core.capture import Frame
+from actfw_core.task import (
+    AsyncConsumer,
+    AsyncPipe,
+    BatchPipe,
+    Consumer,
+    DispatchMode,
+    FusedPipe,
+    Join,
+    Pipe,
+    Producer,
+    Task,
+    Tee,
+    TeePolicy,
+)
+from actfw_core.task.async_task import _AsyncConsumerMixin
+from actfw_core.task.scheduler import _CooperativeScheduler
 
 
 class Counter(Producer[int]):
@@ -118,3 +138,730 @@ def test_pipeline_slow_but_no_loss() -> None:
 
     assert len(logger.logs) > 0
     assert all(i == x for i, x in enumerate(logger.logs))
+
+
+class AgingCounter(Producer[Frame[int]]):
+    def __init__(self) -> None:
+        super().__init__()
+        self.n = 0
+
+    def proc(self) -> Frame[int]:
+        time.sleep(0.01)
+        n = self.n
+        self.n += 1
+        # odd frames look captured 1 sec ago
+        return Frame(n, timestamp=time.monotonic() - (n % 2))
+
+
+class FrameLogger(Consumer[Frame[int]]):
+    xs: List[int]
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.xs = []
+
+    def proc(self, frame: Frame[int]) -> None:
+        self.xs.append(frame.getvalue())
+
+
+def run_app(app: actfw_core.Application, secs: float, cooperative: bool = False) -> None:
+    th = threading.Thread(target=lambda: app.run(cooperative=cooperative))
+    th.start()
+    time.sleep(secs)
+    app.stop()
+    th.join()
+
+
+def test_pipeline_drops_expired_frames() -> None:
+    app = actfw_core.Application()
+
+    counter = AgingCounter()
+    app.register_task(counter)
+    logger = FrameLogger()
+    logger.set_max_frame_age(0.5)
+    app.register_task(logger)
+
+    counter.connect(logger)
+
+    run_app(app, 0.5)
+
+    assert len(logger.xs) > 0
+    assert all(x % 2 == 0 for x in logger.xs)
+    assert logger.expired_frames > 0
+
+
+def test_pipeline_drops_expired_frames_per_connection() -> None:
+    app = actfw_core.Application()
+
+    counter = AgingCounter()
+    app.register_task(counter)
+    logger = FrameLogger()
+    logger.set_max_frame_age(0.5)
+    app.register_task(logger)
+
+    counter.connect(logger, max_frame_age=2.0)
+
+    run_app(app, 0.5)
+
+    assert len(logger.xs) > 0
+    assert any(x % 2 == 1 for x in logger.xs)
+    assert logger.expired_frames == 0
+
+
+class CleanupRecorder(Pipe[int, int]):
+    def __init__(self, log: List[str], name: str) -> None:
+        super().__init__()
+        self.log = log
+        self.name = name
+
+    def proc(self, x: int) -> int:
+        return x * 10
+
+    def cleanup(self) -> None:
+        self.log.append(self.name)
+
+
+def test_pipeline_fused() -> None:
+    app = actfw_core.Application()
+
+    cleanups: List[str] = []
+    counter = Counter()
+    app.register_task(counter)
+    fused = FusedPipe([Incrementer(), CleanupRecorder(cleanups, "a"), Incrementer(), CleanupRecorder(cleanups, "b")])
+    app.register_task(fused)
+    logger = Logger()
+    app.register_task(logger)
+
+    counter.connect(fused)
+    fused.connect(logger)
+
+    run_app(app, 0.5)
+
+    assert len(logger.logs) > 0
+    assert all(((i + 1) * 10 + 1) * 10 == x for i, x in enumerate(logger.logs))
+    assert cleanups == ["a", "b"]
+    stats = fused.stage_stats()
+    assert [name for (name, _, _) in stats] == ["Incrementer", "CleanupRecorder", "Incrementer", "CleanupRecorder"]
+    assert all(count >= len(logger.logs) for (_, count, _) in stats)
+
+
+class ThreadedCounter(Producer[int]):
+    def __init__(self) -> None:
+        super().__init__()
+
+    def run(self) -> None:
+        n = 0
+        while self._is_running():
+            time.sleep(0.01)
+            if self._outlet(n):
+                n += 1
+
+
+def test_pipeline_cooperative() -> None:
+    app = actfw_core.Application()
+
+    cleanups: List[str] = []
+    counter = Counter()
+    app.register_task(counter)
+    tee = Tee[int]()
+    app.register_task(tee)
+    inc0 = Incrementer()
+    app.register_task(inc0)
+    inc1 = Incrementer()
+    app.register_task(inc1)
+    join = Join()
+    app.register_task(join)
+    adder = Adder()
+    app.register_task(adder)
+    recorder = CleanupRecorder(cleanups, "recorder")
+    app.register_task(recorder)
+    logger = Logger()
+    app.register_task(logger)
+
+    # register out of order to check dependency ordering
+    app.tasks.reverse()
+
+    counter.connect(tee)
+    tee.connect(inc0)
+    tee.connect(inc1)
+    inc0.connect(join)
+    inc1.connect(join)
+    join.connect(adder)
+    adder.connect(recorder)
+    recorder.connect(logger)
+
+    run_app(app, 0.5, cooperative=True)
+
+    assert len(logger.logs) > 0
+    assert all((i + 1) * 20 == x for i, x in enumerate(logger.logs))
+    assert cleanups == ["recorder"]
+    assert not any(task.is_alive() for task in app.tasks)
+
+
+def test_pipeline_cooperative_with_threaded_task() -> None:
+    app = actfw_core.Application()
+
+    counter = ThreadedCounter()
+    app.register_task(counter)
+    inc = Incrementer()
+    app.register_task(inc)
+    logger = Logger()
+    app.register_task(logger)
+
+    counter.connect(inc)
+    inc.connect(logger)
+
+    run_app(app, 0.5, cooperative=True)
+
+    assert len(logger.logs) > 0
+    assert all(i + 1 == x for i, x in enumerate(logger.logs))
+    assert not counter.is_alive()
+
+
+def test_cooperative_scheduler_sleeps_until_a_pad_changes() -> None:
+    counter = ThreadedCounter()
+    inc = Incrementer()
+    logger = Logger()
+    counter.connect(inc)
+    inc.connect(logger)
+    scheduler = _CooperativeScheduler([counter, inc, logger])
+
+    running = [True]
+    th = threading.Thread(target=lambda: scheduler.run(lambda: running[0]))
+    th.start()
+    time.sleep(0.5)
+    running[0] = False
+    th.join()
+
+    # one output every 10 ms wakes up the scheduler, instead of polling every millisecond
+    assert len(logger.logs) > 20
+    assert scheduler.idle_waits < 4 * len(logger.logs)
+    assert all(i + 1 == x for i, x in enumerate(logger.logs))
+
+
+class FailingIncrementer(Incrementer):
+    def proc(self, x: int) -> int:
+        if x == 5:
+            raise RuntimeError("broken input")
+        return x + 1
+
+
+# the crash is also reported by the default excepthook
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_pipeline_cooperative_reports_a_crashed_task(tmp_path: Path) -> None:
+    app = actfw_core.Application()
+    app.configure_flight_recorder(str(tmp_path / "flight_recorder.txt"))
+
+    cleanups: List[str] = []
+    counter = Counter()
+    app.register_task(counter)
+    tee = Tee[int]()
+    app.register_task(tee)
+    failing = FailingIncrementer()
+    app.register_task(failing)
+    recorder = CleanupRecorder(cleanups, "recorder")
+    app.register_task(recorder)
+    logger = Logger()
+    app.register_task(logger)
+
+    counter.connect(tee)
+    tee.connect(failing, policy=TeePolicy.LATEST)
+    tee.connect(recorder, policy=TeePolicy.LATEST)
+    recorder.connect(logger)
+
+    started = time.monotonic()
+    run_app(app, 0.5, cooperative=True)
+
+    # the other branch kept running
+    assert logger.logs[:10] == [x * 10 for x in range(10)]
+    assert len(logger.logs) > 10
+    assert f"{failing.name} crashed: RuntimeError: broken input" in (tmp_path / "flight_recorder.txt").read_text()
+    assert cleanups == ["recorder"]
+    # stepped tasks are accounted like threaded ones
+    assert all(task.last_progress > started for task in [counter, tee, recorder, logger])
+    pads = [out_queue._pad for out_queue in tee.out_queues]
+    assert all(pad.in_flight == 0 and pad.utilization() > 0 for pad in pads)
+
+
+class SlowAsyncIncrementer(AsyncPipe[int, int]):
+    def __init__(self, concurrency: int) -> None:
+        super().__init__(concurrency)
+        self.active = 0
+        self.max_active = 0
+
+    async def proc(self, x: int) -> int:
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        # later inputs finish earlier
+        await asyncio.sleep(0.1 - 0.02 * (x % 4))
+        self.active -= 1
+        return x + 1
+
+
+class AsyncLogger(AsyncConsumer[int]):
+    xs: List[int]
+
+    def __init__(self, concurrency: int) -> None:
+        super().__init__(concurrency)
+        self.xs = []
+
+    async def proc(self, x: int) -> None:
+        await asyncio.sleep(0.05)
+        self.xs.append(x)
+
+
+def test_pipeline_async() -> None:
+    app = actfw_core.Application()
+
+    counter = Counter()
+    app.register_task(counter)
+    inc = SlowAsyncIncrementer(4)
+    app.register_task(inc)
+    logger = Logger()
+    app.register_task(logger)
+
+    counter.connect(inc)
+    inc.connect(logger)
+
+    run_app(app, 1.0)
+
+    # 0.1 sec per item is too slow to keep up with the counter without concurrency
+    assert len(logger.logs) > 15
+    assert all(i + 1 == x for i, x in enumerate(logger.logs))
+    assert inc.max_active > 1
+    assert inc.max_active <= 4
+
+
+def test_pipeline_async_consumer() -> None:
+    app = actfw_core.Application()
+
+    counter = Counter()
+    app.register_task(counter)
+    logger = AsyncLogger(8)
+    app.register_task(logger)
+
+    counter.connect(logger)
+
+    run_app(app, 1.0)
+
+    assert len(logger.xs) > 40
+    assert sorted(logger.xs) == list(range(len(logger.xs)))
+
+
+class SlowCounter(Producer[int]):
+    def __init__(self) -> None:
+        super().__init__()
+        self.n = 0
+
+    def proc(self) -> int:
+        time.sleep(0.05)
+        n = self.n
+        self.n += 1
+        return n
+
+
+class InletCountingAsyncIncrementer(SlowAsyncIncrementer):
+    def __init__(self, concurrency: int) -> None:
+        super().__init__(concurrency)
+        self.inlet_calls = 0
+
+    def _inlet_once(self, timeout: float) -> Any:
+        self.inlet_calls += 1
+        return super()._inlet_once(timeout)
+
+
+def test_pipeline_async_waits_for_inputs_without_polling() -> None:
+    app = actfw_core.Application()
+
+    counter = SlowCounter()
+    app.register_task(counter)
+    inc = InletCountingAsyncIncrementer(4)
+    app.register_task(inc)
+    logger = Logger()
+    app.register_task(logger)
+
+    counter.connect(inc)
+    inc.connect(logger)
+
+    run_app(app, 1.0)
+
+    assert len(logger.logs) > 10
+    assert all(i + 1 == x for i, x in enumerate(logger.logs))
+    # woken up by each input and each finished request, instead of looking at the inlet every few milliseconds
+    assert inc.inlet_calls < 4 * counter.n
+
+
+class IncompleteAsyncConsumer(Task, _AsyncConsumerMixin[int]):
+    def __init__(self) -> None:
+        Task.__init__(self)
+        _AsyncConsumerMixin.__init__(self, 1, None)
+
+    def _wait_for_slot(self) -> None:
+        pass
+
+
+def test_async_consumer_mixin_requires_collect() -> None:
+    with pytest.raises(TypeError, match="_collect"):
+        IncompleteAsyncConsumer()  # type: ignore
+
+
+class BatchIncrementer(BatchPipe[int, int]):
+    batch_sizes: List[int]
+
+    def __init__(self, max_batch_size: int, max_wait: float) -> None:
+        super().__init__(max_batch_size, max_wait)
+        self.batch_sizes = []
+
+    def proc_batch(self, xs: List[int]) -> List[int]:
+        self.batch_sizes.append(len(xs))
+        return [x + 1 for x in xs]
+
+
+def test_pipeline_batch() -> None:
+    app = actfw_core.Application()
+
+    counter = Counter()
+    app.register_task(counter)
+    inc = BatchIncrementer(4, 0.1)
+    app.register_task(inc)
+    logger = Logger()
+    app.register_task(logger)
+
+    counter.connect(inc)
+    inc.connect(logger)
+
+    run_app(app, 1.0)
+
+    assert len(logger.logs) > 0
+    assert all(i + 1 == x for i, x in enumerate(logger.logs))
+    assert max(inc.batch_sizes) == 4
+    assert inc.item_count == sum(inc.batch_sizes)
+
+
+def test_pipeline_batch_max_wait() -> None:
+    app = actfw_core.Application()
+
+    counter = Counter()
+    app.register_task(counter)
+    # a batch of 100 would take 1 sec to be filled
+    inc = BatchIncrementer(100, 0.05)
+    app.register_task(inc)
+    logger = Logger()
+    app.register_task(logger)
+
+    counter.connect(inc)
+    inc.connect(logger)
+
+    run_app(app, 0.5)
+
+    assert len(logger.logs) > 0
+    assert all(i + 1 == x for i, x in enumerate(logger.logs))
+    assert max(inc.batch_sizes) < 100
+
+
+class SkippingFrameCounter(Producer[Frame[int]]):
+    def __init__(self, skip: int) -> None:
+        super().__init__()
+        self.n = 0
+        self.skip = skip
+
+    def proc(self) -> Frame[int]:
+        time.sleep(0.01)
+        self.n += 1
+        if self.skip > 0 and self.n % self.skip == 0:
+            # lost by the driver
+            time.sleep(0.01)
+            self.n += 1
+        return Frame(self.n, sequence=self.n)
+
+
+class TupleLogger(Consumer[Tuple[Any, ...]]):
+    xs: List[Tuple[Any, ...]]
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.xs = []
+
+    def proc(self, xs: Tuple[Any, ...]) -> None:
+        self.xs.append(xs)
+
+
+def test_pipeline_aligned_join() -> None:
+    app = actfw_core.Application()
+
+    all_frames = SkippingFrameCounter(0)
+    app.register_task(all_frames)
+    some_frames = SkippingFrameCounter(3)
+    app.register_task(some_frames)
+    join = Join(align="sequence")
+    app.register_task(join)
+    logger = TupleLogger()
+    app.register_task(logger)
+
+    all_frames.connect(join)
+    some_frames.connect(join)
+    join.connect(logger)
+
+    run_app(app, 1.0)
+
+    assert len(logger.xs) > 0
+    assert all(a.sequence == b.sequence for (a, b) in logger.xs)
+    assert all(a.sequence % 3 != 0 for (a, _) in logger.xs)
+    assert join.dropped_items > 0
+
+
+def test_pipeline_aligned_join_partial() -> None:
+    app = actfw_core.Application()
+
+    all_frames = SkippingFrameCounter(0)
+    app.register_task(all_frames)
+    some_frames = SkippingFrameCounter(3)
+    app.register_task(some_frames)
+    join = Join(align="sequence", timeout=0.2, partial=True)
+    app.register_task(join)
+    logger = TupleLogger()
+    app.register_task(logger)
+
+    all_frames.connect(join)
+    some_frames.connect(join)
+    join.connect(logger)
+
+    run_app(app, 1.0)
+
+    assert len(logger.xs) > 0
+    assert all(b is None or a.sequence == b.sequence for (a, b) in logger.xs)
+    assert any(b is None for (_, b) in logger.xs)
+    assert join.partial_tuples == sum(1 for (_, b) in logger.xs if b is None)
+
+
+class LaggingFrameCounter(Producer[Frame[int]]):
+    def __init__(self, lag: int) -> None:
+        super().__init__()
+        self.n = 0
+        self.lag = lag
+
+    def proc(self) -> Frame[int]:
+        # captured now, and `lag` frames behind the other input of the join
+        time.sleep(0.02)
+        self.n += 1
+        return Frame(self.n, timestamp=time.monotonic(), sequence=self.n - self.lag)
+
+
+class EmittedTupleLogger(TupleLogger):
+    times: List[float]
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.times = []
+
+    def proc(self, xs: Tuple[Any, ...]) -> None:
+        super().proc(xs)
+        self.times.append(time.monotonic())
+
+
+@pytest.mark.parametrize("max_frame_age", [None, 0.05])
+def test_pipeline_aligned_join_discards_expired_items(max_frame_age: Optional[float]) -> None:
+    app = actfw_core.Application()
+
+    on_time = LaggingFrameCounter(0)
+    app.register_task(on_time)
+    # the matching items of `on_time` wait 0.1 sec in the join
+    lagging = LaggingFrameCounter(5)
+    app.register_task(lagging)
+    join = Join(align="sequence")
+    app.register_task(join)
+    logger = EmittedTupleLogger()
+    app.register_task(logger)
+
+    on_time.connect(join, max_frame_age=max_frame_age)
+    lagging.connect(join)
+    join.connect(logger)
+
+    run_app(app, 1.0)
+
+    assert all(a.sequence == b.sequence for (a, b) in logger.xs)
+    if max_frame_age is None:
+        assert len(logger.xs) > 10
+        assert join.expired_frames == 0
+    else:
+        assert all(t - a.timestamp <= max_frame_age + 0.02 for ((a, _), t) in zip(logger.xs, logger.times))
+        assert join.expired_frames > 10
+
+
+def test_pipeline_tee_policies() -> None:
+    app = actfw_core.Application()
+
+    counter = Counter()
+    app.register_task(counter)
+    tee = Tee[int]()
+    app.register_task(tee)
+    fast = Logger()
+    app.register_task(fast)
+    # far slower than the counter
+    slow_latest = ThrouputBottleneck(0.2)
+    app.register_task(slow_latest)
+    latest_logger = Logger()
+    app.register_task(latest_logger)
+    slow_queue = ThrouputBottleneck(0.2)
+    app.register_task(slow_queue)
+    queue_logger = Logger()
+    app.register_task(queue_logger)
+
+    counter.connect(tee)
+    tee.connect(fast)
+    tee.connect(slow_latest, policy=TeePolicy.LATEST)
+    tee.connect(slow_queue, policy=TeePolicy.QUEUE, queue_size=4)
+    slow_latest.connect(latest_logger)
+    slow_queue.connect(queue_logger)
+
+    run_app(app, 1.0)
+
+    # the slow branches do not hold back the fast one
+    assert len(fast.logs) > 50
+    assert all(i == x for i, x in enumerate(fast.logs))
+    assert latest_logger.logs == sorted(latest_logger.logs)
+    assert queue_logger.logs == sorted(queue_logger.logs)
+    stats = tee.branch_stats()
+    assert [policy for (policy, _, _) in stats] == [TeePolicy.BLOCK, TeePolicy.LATEST, TeePolicy.QUEUE]
+    assert stats[0][2] == 0
+    assert stats[1][2] > 0
+    assert stats[2][2] > 0
+    # every output is either delivered or dropped on each branch, once
+    outputs = stats[0][1]
+    assert all(delivered + dropped == outputs for (_, delivered, dropped) in stats)
+    assert stats[1][1] >= len(latest_logger.logs)
+    assert stats[2][1] >= len(queue_logger.logs)
+
+
+class FastCounter(Producer[int]):
+    def __init__(self) -> None:
+        super().__init__()
+        self.n = 0
+
+    def proc(self) -> int:
+        n = self.n
+        self.n += 1
+        return n
+
+
+def run_heterogeneous_workers(mode: DispatchMode) -> Tuple[FastCounter, Logger, Logger]:
+    app = actfw_core.Application()
+
+    counter = FastCounter()
+    counter.set_dispatch_mode(mode)
+    app.register_task(counter)
+    slow = ThrouputBottleneck(0.1)
+    app.register_task(slow)
+    fast = ThrouputBottleneck(0.005)
+    app.register_task(fast)
+    slow_logger = Logger()
+    app.register_task(slow_logger)
+    fast_logger = Logger()
+    app.register_task(fast_logger)
+
+    counter.connect(slow)
+    counter.connect(fast)
+    slow.connect(slow_logger)
+    fast.connect(fast_logger)
+
+    run_app(app, 1.0)
+    return (counter, slow_logger, fast_logger)
+
+
+def test_pipeline_dispatch_round_robin() -> None:
+    counter, slow_logger, fast_logger = run_heterogeneous_workers(DispatchMode.ROUND_ROBIN)
+
+    assert abs(len(slow_logger.logs) - len(fast_logger.logs)) <= 2
+    assert abs(counter.dispatched[0] - counter.dispatched[1]) <= 1
+
+
+def test_pipeline_dispatch_first_available() -> None:
+    counter, slow_logger, fast_logger = run_heterogeneous_workers(DispatchMode.FIRST_AVAILABLE)
+
+    assert len(fast_logger.logs) > 5 * len(slow_logger.logs)
+    # every item goes to exactly one worker
+    assert len(set(slow_logger.logs + fast_logger.logs)) == len(slow_logger.logs + fast_logger.logs)
+    ((slow_count, slow_in_flight, slow_utilization), (fast_count, fast_in_flight, fast_utilization)) = counter.dispatch_stats()
+    assert fast_count > 5 * slow_count
+    # both workers are kept busy until the stop, and nothing is left in process after it
+    assert slow_utilization > 0.3 and fast_utilization > 0.3
+    assert slow_in_flight == 0 and fast_in_flight == 0
+
+
+def test_pipeline_dispatch_least_loaded() -> None:
+    _, slow_logger, fast_logger = run_heterogeneous_workers(DispatchMode.LEAST_LOADED)
+
+    assert len(fast_logger.logs) > 5 * len(slow_logger.logs)
+
+
+def test_pipeline_dispatch_least_loaded_avoids_busy_worker() -> None:
+    counter = FastCounter()
+    counter.set_dispatch_mode(DispatchMode.LEAST_LOADED)
+    busy = Logger()
+    idle = Logger()
+    counter.connect(busy)
+    counter.connect(idle)
+
+    counter._outlet(counter.proc())
+    assert counter.dispatched == [1, 0]
+    # the busy worker takes the output, so its pad is empty while it processes it
+    inlet = busy._inlet()
+    assert next(inlet) == 0
+    assert counter.out_queues[0].qsize() == 0
+    assert [in_flight for (_, in_flight, _) in counter.dispatch_stats()] == [1, 0]
+    # even when it is the busy worker's turn
+    counter.out_queue_id = 0
+    assert counter._dispatch_order() == [1, 0]
+    counter._outlet(counter.proc())
+    assert counter.dispatched == [1, 1]
+
+    inlet.close()
+    ((_, in_flight, utilization), _) = counter.dispatch_stats()
+    assert in_flight == 0
+    assert 0.0 < utilization <= 1.0
+    counter.out_queue_id = 0
+    assert counter._dispatch_order() == [0, 1]
+
+
+class SchedulingRecorder(Producer[Tuple[Set[int], int]]):
+    def __init__(self) -> None:
+        super().__init__()
+
+    def proc(self) -> Tuple[Set[int], int]:
+        time.sleep(0.01)
+        # 0 means the calling thread
+        return (os.sched_getaffinity(0), os.getpriority(os.PRIO_PROCESS, 0))
+
+
+class ThreadedSchedulingRecorder(Producer[Tuple[Set[int], int]]):
+    # overrides `run`, like captures do
+    def run(self) -> None:
+        while self._is_running():
+            time.sleep(0.01)
+            self._outlet((os.sched_getaffinity(0), os.getpriority(os.PRIO_PROCESS, 0)))
+
+
+def test_pipeline_task_scheduling() -> None:
+    app = actfw_core.Application()
+
+    cpu = min(os.sched_getaffinity(0))
+    nice = os.getpriority(os.PRIO_PROCESS, 0) + 1
+    recorder = SchedulingRecorder()
+    app.register_task(recorder, affinity=[cpu], nice=nice)
+    logger = TupleLogger()
+    app.register_task(logger)
+    threaded_recorder = ThreadedSchedulingRecorder()
+    app.register_task(threaded_recorder, affinity=[cpu], nice=nice)
+    threaded_logger = TupleLogger()
+    app.register_task(threaded_logger)
+
+    recorder.connect(logger)
+    threaded_recorder.connect(threaded_logger)
+
+    run_app(app, 0.5)
+
+    assert len(logger.xs) > 0 and len(threaded_logger.xs) > 0
+    # applied before the first output
+    assert all(x == ({cpu}, nice) for x in logger.xs + threaded_logger.xs)
+    # the main thread is not affected
+    assert os.getpriority(os.PRIO_PROCESS, 0) == nice - 1
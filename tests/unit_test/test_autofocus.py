@@ -0,0 +1,137 @@
+import random
+from ctypes import POINTER, c_uint8, cast
+from types import SimpleNamespace
+from typing import Any, List, Tuple
+
+import pytest
+from actfw_core.autofocus import (
+    CONTRAST_STATS_COLS,
+    CONTRAST_STATS_ROWS,
+    PDAF_STATS_COLS,
+    PDAF_STATS_ROWS,
+    AutoFocuserIMX708,
+    CfgParams,
+    PdafData,
+    PdafRegions,
+)
+from actfw_core.v4l2.types import bcm2835_isp_stats
+
+UNICAM_WIDTH = 1536
+BYTES_PER_LINE = (UNICAM_WIDTH * 10) >> 3
+
+
+def pdaf_meta_buffer(seed: int) -> Any:
+    rng = random.Random(seed)
+    data = (c_uint8 * (3 * BYTES_PER_LINE))()
+    line = 2 * BYTES_PER_LINE
+    for i in range(line, len(data)):
+        data[i] = rng.randrange(256)
+    data[line] = 0
+    data[line + 1] = rng.randrange(0x40)
+    for k in range(0, PDAF_STATS_ROWS * PDAF_STATS_COLS, 7):
+        # regions without confidence
+        data[line + 10 + 5 * k] = 0
+        data[line + 11 + 5 * k] &= 0x1F
+    return SimpleNamespace(mapped_buf=cast(data, POINTER(c_uint8)), buf=SimpleNamespace(bytesused=len(data)), data=data)
+
+
+def reference_parse_pdaf(meta_buffer: Any) -> List[Tuple[int, int]]:
+    # per-region decoding with a `PdafData` per cell
+    ptr = meta_buffer.mapped_buf[2 * BYTES_PER_LINE : 3 * BYTES_PER_LINE]
+    step = 5
+    offset = 2 * step
+    cells = []
+    for _ in range(PDAF_STATS_ROWS * PDAF_STATS_COLS):
+        conf = (ptr[offset] << 3) | (ptr[offset + 1] >> 5)
+        phase = 0
+        if conf != 0:
+            phase = (((ptr[offset + 1] & 0x0F) - (ptr[offset + 1] & 0x10)) << 6) | (ptr[offset + 2] >> 2)
+        cells.append((conf, phase))
+        offset += step
+    return cells
+
+
+def reference_get_phase(
+    cfg: CfgParams, weights: List[float], weight_sum: float, regions: PdafRegions
+) -> Tuple[float, float, bool]:
+    sumWc = 0
+    sumWcp = 0
+    for i in range(regions.numRegions):
+        w = weights[i]
+        if w != 0:
+            c = regions.conf[i]
+            if c >= cfg.confThresh:
+                if c > cfg.confClip:
+                    c = cfg.confClip
+                c -= cfg.confThresh >> 2
+                sumWc += int(w * c)
+                c -= cfg.confThresh >> 2
+                sumWcp += int(w * c) * int(regions.phase[i])
+    if 0 < weight_sum and weight_sum <= sumWc:
+        return sumWcp / sumWc, sumWc / weight_sum, True
+    return 0, 0, False
+
+
+def make_focuser() -> AutoFocuserIMX708:
+    focuser = AutoFocuserIMX708()
+    focuser.set_unicam_config(
+        {"rpi.af": {}},
+        unicam_width=UNICAM_WIDTH,
+        sensor_size=(4608, 2592),
+        post_crop_size=(0, 0, 1536, 864),
+        camera_mode_scale=(3.0, 3.0),
+        camera_mode_crop_size=(0, 0),
+        callback_fn=lambda value: None,
+    )
+    return focuser
+
+
+def test_parse_pdaf_matches_per_region_decoding() -> None:
+    focuser = make_focuser()
+    for seed in range(5):
+        meta_buffer = pdaf_meta_buffer(seed)
+        regions = focuser.parse_pdaf(meta_buffer)
+        assert list(zip(regions.conf, regions.phase)) == reference_parse_pdaf(meta_buffer)
+
+
+def test_pdaf_grid_is_deprecated_and_writes_through() -> None:
+    regions = PdafRegions(2, 3, conf=list(range(6)), phase=list(range(10, 16)))
+    with pytest.warns(DeprecationWarning):
+        grid = regions.pdaf_grid
+    assert [(d.conf, d.phase) for row in grid for d in row] == list(zip(range(6), range(10, 16)))
+    grid[1][2].conf = 100
+    grid[0][1].phase = -5
+    assert regions.conf[5] == 100
+    assert regions.phase[1] == -5
+    with pytest.warns(DeprecationWarning):
+        regions.pdaf_grid = [[PdafData(1, 2)] * 3, [PdafData(3, 4)] * 3]
+    assert regions.conf == [1, 1, 1, 3, 3, 3]
+    assert regions.phase == [2, 2, 2, 4, 4, 4]
+
+
+def test_get_phase_matches_per_region_aggregation() -> None:
+    for windows in [[], [[100.0, 100.0, 900.0, 600.0]], [[0.0, 0.0, 300.0, 200.0], [1000.0, 500.0, 1500.0, 800.0]]]:
+        focuser = make_focuser()
+        focuser.set_focus_windows(windows)
+        get_phase = focuser._AutoFocuserBase__get_phase  # type: ignore
+        for seed in range(5):
+            regions = focuser.parse_pdaf(pdaf_meta_buffer(seed))
+            actual = get_phase(regions)
+            weights = focuser.phaseWeights
+            assert actual == reference_get_phase(focuser.cfg, weights.w, weights.sum, regions)
+
+
+def test_get_contrast_matches_per_region_sum() -> None:
+    stats = bcm2835_isp_stats()
+    rng = random.Random(0)
+    for focus in stats.focus_stats:
+        focus.contrast_val[1][1] = rng.randrange(1 << 40)
+    for windows in [[], [[100.0, 100.0, 900.0, 600.0]]]:
+        focuser = make_focuser()
+        focuser.set_focus_windows(windows)
+        focuser.process_contrast_metadata(stats)
+        weights = focuser.contrastWeights
+        expected = 0
+        for i in range(CONTRAST_STATS_ROWS * CONTRAST_STATS_COLS):
+            expected += weights.w[i] * (stats.focus_stats[i].contrast_val[1][1] / 1000)
+        assert focuser.prev_contrast == expected / weights.sum
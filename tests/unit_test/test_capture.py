@@ -0,0 +1,73 @@
+import io
+
+from actfw_core.capture import CaptureStats, CompressedFrame, Frame, _with_huffman_tables
+from actfw_core.v4l2.video import V4L2_PIX_FMT  # type: ignore
+from PIL import Image
+
+
+def jpeg_of(size: tuple) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", size, (255, 0, 0)).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def without_huffman_tables(jpeg: bytes) -> bytes:
+    # drop the DHT segments before the scan, like MJPEG frames of UVC cameras
+    stripped = jpeg[:2]
+    i = 2
+    while jpeg[i + 1] != 0xDA:
+        length = int.from_bytes(jpeg[i + 2 : i + 4], "big")
+        if jpeg[i + 1] != 0xC4:
+            stripped += jpeg[i : i + 2 + length]
+        i += 2 + length
+    return stripped + jpeg[i:]
+
+
+def test_compressed_frame_keeps_payload() -> None:
+    data = jpeg_of((64, 48))
+    frame = CompressedFrame(data, V4L2_PIX_FMT.MJPEG, (64, 48))
+    assert frame.getvalue() is data
+
+
+def test_compressed_frame_decode() -> None:
+    frame = CompressedFrame(jpeg_of((64, 48)), V4L2_PIX_FMT.MJPEG, (64, 48))
+    image = frame.decode()
+    assert image.mode == "RGB"
+    assert image.size == (64, 48)
+
+
+def test_compressed_frame_decode_without_huffman_tables() -> None:
+    buf = io.BytesIO()
+    Image.effect_mandelbrot((64, 48), (-2.0, -1.0, 1.0, 1.0), 100).convert("RGB").save(buf, format="JPEG")
+    data = buf.getvalue()
+    stripped = without_huffman_tables(data)
+    assert b"\xff\xc4" not in stripped
+    assert b"\xff\xc4" in _with_huffman_tables(stripped)
+    assert _with_huffman_tables(data) is data
+
+    image = CompressedFrame(stripped, V4L2_PIX_FMT.MJPEG, (64, 48)).decode()
+    assert image.tobytes() == CompressedFrame(data, V4L2_PIX_FMT.MJPEG, (64, 48)).decode().tobytes()
+
+
+def test_compressed_frame_decode_reduced_region() -> None:
+    frame = CompressedFrame(jpeg_of((64, 48)), V4L2_PIX_FMT.MJPEG, (64, 48))
+    assert frame.decode(reduce=2).size == (32, 24)
+    assert frame.decode(reduce=4, box=(0, 0, 8, 6)).size == (8, 6)
+
+
+def test_frame_capture_info() -> None:
+    frame = Frame(b"", timestamp=1.5, sequence=10, dropped=2)
+    assert (frame.timestamp, frame.sequence, frame.dropped) == (1.5, 10, 2)
+    frame = Frame(b"")
+    assert (frame.timestamp, frame.sequence, frame.dropped) == (None, None, 0)
+
+
+def test_capture_stats_counts_sequence_gaps() -> None:
+    stats = CaptureStats()
+    dropped = []
+    for sequence in [3, 4, 7, 8, 10]:
+        stats.count_sequence(sequence)
+        dropped.append(stats.count_frame())
+    assert dropped == [0, 0, 2, 0, 1]
+    assert stats.captured == 5
+    assert stats.dropped == 3
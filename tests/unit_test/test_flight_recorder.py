@@ -0,0 +1,156 @@
+import io
+import threading
+import time
+from pathlib import Path
+from typing import List
+
+import actfw_core
+import pytest
+from actfw_core.flight_recorder import FlightRecorder
+from actfw_core.task import Consumer, Producer
+from actfw_core.util.pad import _PadBase, _PadDiscardingOld
+
+
+class FailingCounter(Producer[int]):
+    def __init__(self, fail_at: int) -> None:
+        super().__init__()
+        self.n = 0
+        self.fail_at = fail_at
+
+    def proc(self) -> int:
+        time.sleep(0.01)
+        self.n += 1
+        if self.n == self.fail_at:
+            raise RuntimeError("Capture timeout")
+        return self.n
+
+
+class StallingCounter(Producer[int]):
+    def __init__(self, stall_at: int) -> None:
+        super().__init__()
+        self.n = 0
+        self.stall_at = stall_at
+
+    def proc(self) -> int:
+        time.sleep(0.01)
+        self.n += 1
+        while self.n >= self.stall_at and self._is_running():
+            time.sleep(0.01)
+        return self.n
+
+
+class Sink(Consumer[int]):
+    xs: List[int]
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.xs = []
+
+    def proc(self, x: int) -> None:
+        self.xs.append(x)
+
+
+def run_app(app: actfw_core.Application, secs: float) -> None:
+    th = threading.Thread(target=lambda: app.run())
+    th.start()
+    time.sleep(secs)
+    app.stop()
+    th.join()
+
+
+def test_flight_recorder_dump() -> None:
+    recorder = FlightRecorder(capacity=2)
+    for n in range(3):
+        recorder.record("frame", f"sequence={n}")
+    sink = Sink()
+    out = io.StringIO()
+    recorder.dump("test", [sink], out)
+    dump = out.getvalue()
+    assert "=== flight recorder: test ===" in dump
+    assert "sequence=0" not in dump
+    assert "frame: sequence=1" in dump
+    assert "frame: sequence=2" in dump
+    assert "(Sink, alive=False): -" in dump
+
+
+# the crash is also reported by the default excepthook
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_flight_recorder_dumped_on_crash(tmp_path: Path) -> None:
+    app = actfw_core.Application()
+    path = tmp_path / "flight_recorder.log"
+    app.configure_flight_recorder(str(path))
+
+    counter = FailingCounter(5)
+    app.register_task(counter)
+    sink = Sink()
+    app.register_task(sink)
+    counter.connect(sink)
+
+    run_app(app, 0.5)
+
+    dump = path.read_text()
+    assert f"=== flight recorder: {counter.name} crashed ===" in dump
+    assert "RuntimeError: Capture timeout" in dump
+    assert f"{counter.name} (FailingCounter) started" in dump
+    assert "(Sink, alive=True): in=[0]" in dump
+
+
+def test_flight_recorder_dumped_on_stall(tmp_path: Path) -> None:
+    app = actfw_core.Application()
+    path = tmp_path / "flight_recorder.log"
+    app.configure_flight_recorder(str(path), stall_threshold=0.5)
+
+    counter = StallingCounter(5)
+    app.register_task(counter)
+    sink = Sink()
+    app.register_task(sink)
+    counter.connect(sink)
+
+    run_app(app, 2.5)
+
+    dump = path.read_text()
+    # dumped once per stall
+    assert dump.count("=== flight recorder: no progress for 0.5 sec") == 1
+    assert f"=== flight recorder: no progress for 0.5 sec: {counter.name} ===" in dump
+    assert sink.xs == [1, 2, 3, 4]
+
+
+class DiscardingCounter(Producer[int]):
+    def __init__(self) -> None:
+        super().__init__()
+        self.n = 0
+
+    def proc(self) -> int:
+        time.sleep(0.01)
+        self.n += 1
+        return self.n
+
+    def _new_pad(self) -> _PadBase[int]:
+        return _PadDiscardingOld()
+
+
+class StallingSink(Sink):
+    def proc(self, x: int) -> None:
+        super().proc(x)
+        while x >= 5 and self._is_running():
+            time.sleep(0.01)
+
+
+def test_flight_recorder_dumped_on_stall_of_one_task(tmp_path: Path) -> None:
+    app = actfw_core.Application()
+    path = tmp_path / "flight_recorder.log"
+    app.configure_flight_recorder(str(path), stall_threshold=0.5)
+
+    # the counter keeps progressing into a discarding pad while the sink is wedged
+    counter = DiscardingCounter()
+    app.register_task(counter)
+    sink = StallingSink()
+    app.register_task(sink)
+    counter.connect(sink)
+
+    run_app(app, 2.5)
+
+    dump = path.read_text()
+    assert dump.count("=== flight recorder: no progress for 0.5 sec") == 1
+    assert f"=== flight recorder: no progress for 0.5 sec: {sink.name} ===" in dump
+    assert counter.n > 100
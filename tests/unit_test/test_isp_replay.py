@@ -0,0 +1,174 @@
+import json
+import random
+import threading
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict, List
+
+from actfw_core.autofocus import PDAF_STATS_COLS, PDAF_STATS_ROWS, AutoFocuserIMX708
+from actfw_core.isp_recording import RecordKind, StatsRecord, StatsRecorder, load_stats_recording
+from actfw_core.isp_replay import ControlRecordingVideo, diff_control_writes, dump_control_writes, replay_stats
+from actfw_core.unicam_isp_capture import V2_UNICAM_MODES, V3_UNICAM_MODES, UnicamIspCapture
+from actfw_core.v4l2.types import NUM_HISTOGRAM_BINS, bcm2835_isp_stats
+from actfw_core.v4l2.video import V4L2_CID, VideoBuffer  # type: ignore
+
+
+def capture_setup(sensor_name: str) -> Dict[str, Any]:
+    if sensor_name == "imx708":
+        camera_mode = V3_UNICAM_MODES[2]
+    else:
+        camera_mode = V2_UNICAM_MODES[2]
+    return {
+        "sensor_name": sensor_name,
+        "config_file": sensor_name + ".json",
+        "config": None,
+        "camera_mode": asdict(camera_mode),
+        "crop_size": [0, 0, *camera_mode.size],
+        "unicam_width": camera_mode.size[0],
+        "auto_whitebalance": True,
+        "agc": True,
+        "contrast": True,
+        "shutter_time": None,
+        "analogue_gain": None,
+        "target_Y": 0.16,
+        "device_status": {"hblank": 3448, "vblank": 1000, "pixel_late": 182400000},
+        "exposure": 10000.0,
+        "color_temperature": 4500,
+    }
+
+
+def stats(seed: int, brightness: int) -> bytes:
+    rng = random.Random(seed)
+    stats = bcm2835_isp_stats()
+    for i in range(NUM_HISTOGRAM_BINS):
+        stats.hist[0].g_hist[i] = rng.randrange(100) + (1000 if i < brightness else 0)
+    for regions in [stats.awb_stats, stats.agc_stats]:
+        for region in regions:
+            region.counted = 1000
+            region.r_sum = 1000 * rng.randrange(50 * brightness, 60 * brightness)
+            region.g_sum = 1000 * rng.randrange(50 * brightness, 60 * brightness)
+            region.b_sum = 1000 * rng.randrange(50 * brightness, 60 * brightness)
+    return bytes(stats)
+
+
+def pdaf_lines(seed: int, unicam_width: int) -> bytes:
+    rng = random.Random(seed)
+    bytes_per_line = (unicam_width * 10) >> 3
+    line = bytearray(rng.randrange(256) for _ in range(bytes_per_line))
+    line[0] = 0
+    line[1] = rng.randrange(0x40)
+    for k in range(PDAF_STATS_ROWS * PDAF_STATS_COLS):
+        # confident regions
+        line[10 + 5 * k] = 0xFF
+    return bytes(2 * bytes_per_line) + bytes(line)
+
+
+def record(path: Path, sensor_name: str, frames: int) -> None:
+    with StatsRecorder(str(path), capture_setup(sensor_name)) as recorder:
+        for sequence in range(frames):
+            if sensor_name == "imx708":
+                recorder.record(RecordKind.UNICAM_META, sequence, sequence / 30, pdaf_lines(sequence, 1536))
+            recorder.record(RecordKind.ISP_STATS, sequence, sequence / 30, stats(sequence, 10 + sequence % 50))
+
+
+def test_recording_round_trip(tmp_path: Path) -> None:
+    path = tmp_path / "stats.rec"
+    record(path, "imx219", 3)
+    recording = load_stats_recording(str(path))
+    assert recording.setup == json.loads(json.dumps(capture_setup("imx219")))
+    assert [(r.kind, r.sequence, r.timestamp) for r in recording.records] == [
+        (RecordKind.ISP_STATS, sequence, sequence / 30) for sequence in range(3)
+    ]
+    assert recording.records[1].data == stats(1, 11)
+
+
+def test_replay_writes_controls_reproducibly(tmp_path: Path) -> None:
+    path = tmp_path / "stats.rec"
+    record(path, "imx219", 20)
+    recording = load_stats_recording(str(path))
+    frames = replay_stats(recording)
+    assert len(frames) == 20
+    assert all(frame.seconds > 0 for frame in frames)
+    written = {(device, cid) for frame in frames for (device, cid, _) in frame.controls}
+    assert ("isp_in", V4L2_CID.RED_BALANCE) in written
+    assert ("isp_in", V4L2_CID.USER_BCM2835_ISP_GAMMA) in written
+    assert ("unicam_subdev", V4L2_CID.EXPOSURE) in written
+
+    baseline = dump_control_writes(frames)
+    assert diff_control_writes(replay_stats(recording), baseline) == []
+
+    brighter = dict(recording.setup, target_Y=0.3)
+    diffs = diff_control_writes(replay_stats(type(recording)(brighter, recording.records)), baseline)
+    assert len(diffs) > 0
+
+
+def test_replay_runs_autofocus(tmp_path: Path) -> None:
+    path = tmp_path / "stats.rec"
+    record(path, "imx708", 10)
+    frames = replay_stats(load_stats_recording(str(path)), auto_focuser=AutoFocuserIMX708())
+    assert [frame.kind for frame in frames[:2]] == [RecordKind.UNICAM_META, RecordKind.ISP_STATS]
+    written = {(device, cid) for frame in frames for (device, cid, _) in frame.controls}
+    assert ("unicam_subdev_meta", V4L2_CID.FOCUS_ABSOLUTE) in written
+
+
+class OverlapCheckingAutoFocuser(AutoFocuserIMX708):
+    def __init__(self) -> None:
+        super().__init__()
+        self.guard = threading.Lock()
+        self.inside = 0
+        self.overlaps = 0
+        self.calls = 0
+
+    def check(self, entering: bool) -> None:
+        with self.guard:
+            self.inside += 1 if entering else -1
+            if entering:
+                self.calls += 1
+                if self.inside > 1:
+                    self.overlaps += 1
+
+    def parse_pdaf_and_update_focus(self, meta_buffer: VideoBuffer) -> None:
+        self.check(True)
+        try:
+            time.sleep(0.0005)
+            super().parse_pdaf_and_update_focus(meta_buffer)
+        finally:
+            self.check(False)
+
+    def process_contrast_metadata(self, stats: bcm2835_isp_stats) -> None:
+        self.check(True)
+        try:
+            time.sleep(0.0005)
+            super().process_contrast_metadata(stats)
+        finally:
+            self.check(False)
+
+
+def test_pdaf_and_contrast_autofocus_do_not_overlap(tmp_path: Path) -> None:
+    path = tmp_path / "stats.rec"
+    record(path, "imx708", 50)
+    recording = load_stats_recording(str(path))
+    focuser = OverlapCheckingAutoFocuser()
+    devices = [ControlRecordingVideo(name) for name in ["isp_in", "unicam_subdev", "unicam_subdev_meta"]]
+    capture = UnicamIspCapture._replaying(recording.setup, devices[0], devices[1], devices[2], focuser)
+
+    def replay(records: List[StatsRecord]) -> None:
+        for r in records:
+            capture._replay_record(r)
+
+    # PDAF as on the capture thread and contrast AF as on the control thread, at the same time
+    threads = [
+        threading.Thread(target=replay, args=([r for r in recording.records if r.kind == kind],))
+        for kind in [RecordKind.UNICAM_META, RecordKind.ISP_STATS]
+    ]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    for device in devices:
+        device.close()
+
+    assert focuser.calls == 100
+    assert focuser.overlaps == 0
+    assert any(cid == V4L2_CID.FOCUS_ABSOLUTE for (_, cid, _) in devices[2].written)
@@ -0,0 +1,71 @@
+import random
+
+from actfw_core.isp_stats import ClippedRegionSums, IspStatsView
+from actfw_core.v4l2.types import NUM_HISTOGRAM_BINS, bcm2835_isp_stats
+
+
+def random_stats(seed: int) -> bcm2835_isp_stats:
+    rng = random.Random(seed)
+    stats = bcm2835_isp_stats()
+    for hist in stats.hist:
+        for channel in [hist.r_hist, hist.g_hist, hist.b_hist]:
+            for i in range(NUM_HISTOGRAM_BINS):
+                channel[i] = rng.randrange(1 << 20)
+    for regions in [stats.awb_stats, stats.floating_stats, stats.agc_stats]:
+        for region in regions:
+            region.counted = rng.randrange(1 << 16)
+            region.noncounted = rng.randrange(1 << 16)
+            region.r_sum = rng.randrange(1 << 40)
+            region.g_sum = rng.randrange(1 << 40)
+            region.b_sum = rng.randrange(1 << 40)
+    for focus in stats.focus_stats:
+        for i in range(2):
+            for j in range(2):
+                focus.contrast_val[i][j] = rng.randrange(1 << 48)
+                focus.contrast_val_num[i][j] = rng.randrange(1 << 16)
+    return stats
+
+
+def test_isp_stats_view_fields() -> None:
+    stats = random_stats(0)
+    view = IspStatsView(stats)
+    assert list(view.histogram("r")) == list(stats.hist[0].r_hist)
+    assert list(view.histogram("g")) == list(stats.hist[0].g_hist)
+    assert list(view.histogram("b", 1)) == list(stats.hist[1].b_hist)
+    for name, regions in [("awb", stats.awb_stats), ("floating", stats.floating_stats), ("agc", stats.agc_stats)]:
+        assert list(view.counted(name)) == [region.counted for region in regions]
+        assert list(view.sums(name, "r")) == [region.r_sum for region in regions]
+        assert list(view.sums(name, "g")) == [region.g_sum for region in regions]
+        assert list(view.sums(name, "b")) == [region.b_sum for region in regions]
+    for i in range(2):
+        for j in range(2):
+            assert list(view.focus_contrast(i, j)) == [focus.contrast_val[i][j] for focus in stats.focus_stats]
+    assert view.total_sums("awb") == (
+        sum(region.r_sum for region in stats.awb_stats),
+        sum(region.g_sum for region in stats.awb_stats),
+        sum(region.b_sum for region in stats.awb_stats),
+    )
+
+
+def test_isp_stats_view_shares_memory() -> None:
+    stats = bcm2835_isp_stats()
+    view = IspStatsView(stats)
+    stats.hist[0].g_hist[5] = 42
+    stats.agc_stats[3].g_sum = 1 << 40
+    assert view.histogram("g")[5] == 42
+    assert view.sums("agc", "g")[3] == 1 << 40
+
+
+def test_clipped_region_sums() -> None:
+    pipeline_bits = 13
+    stats = random_stats(1)
+    region_sums = ClippedRegionSums(IspStatsView(stats), "agc", pipeline_bits)
+    assert region_sums.pixel_sum == sum(region.counted for region in stats.agc_stats)
+    for gain in [0.5, 1.0, 3.7, 1000.0]:
+        expected = [0, 0, 0]
+        for region in stats.agc_stats:
+            limit = ((1 << pipeline_bits) - 1) * region.counted
+            expected[0] += min(region.r_sum * gain, limit)
+            expected[1] += min(region.g_sum * gain, limit)
+            expected[2] += min(region.b_sum * gain, limit)
+        assert region_sums.evaluate(gain) == tuple(expected)
@@ -0,0 +1,63 @@
+import random
+from ctypes import c_int16
+from math import floor
+from typing import List
+
+from actfw_core.lens_shading import bilinear_weights, pack_gains, resample_table
+
+LS_TABLE_W = 16
+LS_TABLE_H = 12
+
+
+def reference_populate(src: List[float], dst_w: int, dst_h: int) -> bytes:
+    # per-element version, which wrote each gain into the grid with `bytes(c_int16(...))`
+    x_lo: List[int] = [0] * dst_w
+    xf: List[float] = [0.0] * dst_w
+    x_hi: List[int] = [0] * dst_w
+    x = -0.5
+    x_inc = LS_TABLE_W / (dst_w - 1)
+    for i in range(0, dst_w):
+        x_lo[i] = floor(x)
+        xf[i] = x - x_lo[i]
+        x_hi[i] = min(x_lo[i] + 1, LS_TABLE_W - 1)
+        x_lo[i] = max(x_lo[i], 0)
+        x += x_inc
+
+    out = b""
+    y = -0.5
+    y_inc = LS_TABLE_H / (dst_h - 1)
+    for _ in range(0, dst_h):
+        y_lo = floor(y)
+        yf = y - y_lo
+        y_hi = min(y_lo + 1, LS_TABLE_H - 1)
+        y_lo = max(y_lo, 0)
+        row_above = src[y_lo * LS_TABLE_W : (y_lo + 1) * LS_TABLE_W]
+        row_below = src[y_hi * LS_TABLE_W : (y_hi + 1) * LS_TABLE_W]
+        for i in range(0, dst_w):
+            above = row_above[x_lo[i]] * (1 - xf[i]) + row_above[x_hi[i]] * xf[i]
+            below = row_below[x_lo[i]] * (1 - xf[i]) + row_below[x_hi[i]] * xf[i]
+            result = min(floor(1024 * (above * (1 - yf) + below * yf) + 0.5), 16383)
+            out += bytes(c_int16(result))
+        y += y_inc
+    return out
+
+
+def test_bilinear_weights() -> None:
+    assert bilinear_weights(-0.5, 1.0, 3, 2) == [(0, 0, 0.5), (0, 1, 0.5), (1, 1, 0.5)]
+
+
+def test_pack_gains_matches_per_element_population() -> None:
+    rng = random.Random(0)
+    src = [rng.uniform(1.0, 20.0) for _ in range(LS_TABLE_W * LS_TABLE_H)]
+    for dst_w, dst_h in [(41, 31), (21, 16), (64, 48)]:
+        x_weights = bilinear_weights(-0.5, LS_TABLE_W / (dst_w - 1), dst_w, LS_TABLE_W)
+        y_weights = bilinear_weights(-0.5, LS_TABLE_H / (dst_h - 1), dst_h, LS_TABLE_H)
+        gains = pack_gains(resample_table(src, LS_TABLE_W, x_weights, y_weights))
+        assert gains.tobytes() == reference_populate(src, dst_w, dst_h)
+
+
+def test_pack_gains_into_grid() -> None:
+    grid = bytearray(16)
+    with memoryview(grid) as mm, mm.cast("h") as view:
+        view[1:4] = pack_gains([1.0, 2.5, 100.0])
+    assert list(memoryview(grid).cast("h")) == [0, 1024, 2560, 16383, 0, 0, 0, 0]
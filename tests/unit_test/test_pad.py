@@ -1,11 +1,11 @@
-from typing import List, TypeVar
+from typing import List, TypeVar, Union
 
-from actfw_core.util.pad import _PadDiscardingOld
+from actfw_core.util.pad import _PadBounded, _PadDiscardingOld
 
 T = TypeVar("T")
 
 
-def listify(pad: _PadDiscardingOld[T]) -> List[T]:
+def listify(pad: Union[_PadBounded[T], _PadDiscardingOld[T]]) -> List[T]:
     xs = []
     for _ in range(pad._queue.qsize()):
         xs.append(pad.get())
@@ -23,3 +23,19 @@ def test_pad_has_the_last_one_element() -> None:
     pad.put(11)
     pad.put(12)
     assert listify(pad) == [12]
+
+
+def test_pad_counts_discarded_elements() -> None:
+    pad: _PadDiscardingOld = _PadDiscardingOld()
+    pad.put(0)
+    pad.put(1)
+    pad.put(2)
+    assert pad.discarded == 2
+
+
+def test_bounded_pad_discards_the_oldest_elements() -> None:
+    pad: _PadBounded = _PadBounded(3)
+    for x in range(5):
+        pad.put(x)
+    assert listify(pad) == [2, 3, 4]
+    assert pad.discarded == 2
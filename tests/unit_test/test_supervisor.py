@@ -0,0 +1,92 @@
+import threading
+import time
+from typing import List
+
+import actfw_core
+import pytest
+from actfw_core.supervisor import RestartPolicy
+from actfw_core.task import Consumer, Producer
+
+
+class FlakyCounter(Producer[int]):
+    def __init__(self, start: int, fail_after: int) -> None:
+        super().__init__()
+        self.n = start
+        self.produced = 0
+        self.fail_after = fail_after
+
+    def proc(self) -> int:
+        time.sleep(0.01)
+        if self.produced == self.fail_after:
+            raise RuntimeError("Capture timeout")
+        self.produced += 1
+        self.n += 1
+        return self.n
+
+
+class TimedLogger(Consumer[int]):
+    xs: List[int]
+    times: List[float]
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.xs = []
+        self.times = []
+
+    def proc(self, x: int) -> None:
+        self.xs.append(x)
+        self.times.append(time.monotonic())
+
+
+# crashes are also reported by the default excepthook
+pytestmark = pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+
+
+def test_supervisor_restarts_failed_task() -> None:
+    app = actfw_core.Application()
+    logger = TimedLogger()
+
+    def factory() -> FlakyCounter:
+        # continue from the last delivered value
+        return FlakyCounter(logger.xs[-1] if len(logger.xs) > 0 else 0, 10)
+
+    counter = factory()
+    app.register_task(counter, restart=RestartPolicy(factory, max_restarts=100, backoff=0.05))
+    app.register_task(logger)
+    counter.connect(logger)
+
+    th = threading.Thread(target=lambda: app.run())
+    th.start()
+    time.sleep(1.0)
+    app.stop()
+    th.join()
+
+    assert app.tasks[0] is not counter
+    assert app.supervised[id(app.tasks[0])].restarts >= 2
+    assert logger.xs == list(range(1, len(logger.xs) + 1))
+    # recovered in a fraction of a second
+    gaps = [t_1 - t_0 for (t_0, t_1) in zip(logger.times, logger.times[1:])]
+    assert max(gaps) < 0.3
+
+
+def test_supervisor_stops_application_after_max_restarts() -> None:
+    app = actfw_core.Application()
+    logger = TimedLogger()
+
+    counter = FlakyCounter(0, 3)
+    app.register_task(counter, restart=RestartPolicy(lambda: FlakyCounter(100, 3), max_restarts=1, backoff=0.01))
+    app.register_task(logger)
+    counter.connect(logger)
+
+    th = threading.Thread(target=lambda: app.run())
+    th.start()
+    th.join(timeout=5)
+
+    assert not th.is_alive()
+    assert not app.running
+    assert logger.xs == [1, 2, 3, 101, 102, 103]
+
+
+def test_restart_policy_backoff() -> None:
+    policy = RestartPolicy(lambda: FlakyCounter(0, 0), backoff=0.1, max_backoff=0.5)
+    assert [policy.delay(n) for n in range(4)] == [0.1, 0.2, 0.4, 0.5]
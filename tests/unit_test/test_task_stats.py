@@ -0,0 +1,102 @@
+import csv
+import json
+import threading
+import time
+from pathlib import Path
+from typing import List
+
+import actfw_core
+from actfw_core.task import Consumer, Producer, Task
+from actfw_core.task_stats import TaskStatsSampler
+
+
+class BusyCounter(Producer[int]):
+    def __init__(self) -> None:
+        super().__init__()
+        self.n = 0
+        self.comm = ""
+
+    def proc(self) -> int:
+        if self.comm == "":
+            time.sleep(0.05)
+            with open(f"/proc/self/task/{self.native_id}/comm") as f:
+                self.comm = f.read().strip()
+        t_0 = time.monotonic()
+        while time.monotonic() - t_0 < 0.01:
+            pass
+        self.n += 1
+        return self.n
+
+
+class IdleLogger(Consumer[int]):
+    xs: List[int]
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.xs = []
+
+    def proc(self, x: int) -> None:
+        self.xs.append(x)
+
+
+def test_task_stats(tmp_path: Path) -> None:
+    app = actfw_core.Application()
+    app.enable_task_stats(interval=0.1)
+
+    counter = BusyCounter()
+    app.register_task(counter)
+    logger = IdleLogger()
+    app.register_task(logger)
+    counter.connect(logger)
+
+    th = threading.Thread(target=lambda: app.run())
+    th.start()
+    time.sleep(1.0)
+    app.stop()
+    th.join()
+
+    assert counter.comm == "BusyCounter"
+    busy = app.get_task_stats("BusyCounter")
+    idle = app.get_task_stats("IdleLogger")
+    assert len(busy) > 0
+    assert len(idle) > 0
+    assert max(sample.cpu_percent for sample in busy) > 50
+    assert all(sample.tid == counter.native_id for sample in busy)
+    assert all(sample.rss > 0 for sample in busy + idle)
+    assert sum(sample.voluntary_ctxt_switches for sample in idle) > 0
+
+    app.dump_task_stats(str(tmp_path / "stats.json"))
+    with open(tmp_path / "stats.json") as f:
+        assert len(json.load(f)) == len(busy) + len(idle)
+    app.dump_task_stats(str(tmp_path / "stats.csv"))
+    with open(tmp_path / "stats.csv") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == len(busy) + len(idle)
+    assert {row["task"] for row in rows} == {"BusyCounter", "IdleLogger"}
+
+
+class Sleeper(Task):
+    def run(self) -> None:
+        while self._is_running():
+            time.sleep(0.01)
+
+
+def test_task_stats_forget_exited_threads() -> None:
+    tasks = [Sleeper(), Sleeper()]
+    sampler = TaskStatsSampler(lambda: tasks, history=2)
+    for task in tasks:
+        task.start()
+    try:
+        sampler.sample()
+        assert len(sampler.sample()) == 2
+        tasks[0].stop()
+        tasks[0].join()
+        for _ in range(5):
+            assert len(sampler.sample()) == 1
+    finally:
+        for task in tasks:
+            task.stop()
+            task.join()
+    # only the thread still running is kept, and so are its samples
+    assert list(sampler._previous) == [tasks[1].native_id]
+    assert [sample.tid for sample in sampler.samples] == [tasks[1].native_id] * 2
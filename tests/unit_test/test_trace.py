@@ -0,0 +1,135 @@
+import json
+import threading
+import time
+from pathlib import Path
+from typing import List
+
+import actfw_core
+from actfw_core import trace
+from actfw_core.capture import Frame
+from actfw_core.task import BatchPipe, Consumer, DispatchMode, FusedPipe, Pipe, Producer, Tee
+from actfw_core.trace import Tracer
+
+
+def test_tracer_keeps_the_latest_spans() -> None:
+    tracer = Tracer(capacity=3)
+    for n in range(5):
+        tracer.record(f"span{n}", "test", n * 1000, n * 1000 + 500)
+    assert [span[0] for span in tracer.spans] == ["span2", "span3", "span4"]
+
+
+def test_tracer_chrome_trace() -> None:
+    tracer = Tracer()
+    tracer.record("proc", "task", 2000, 5000, sequence=7)
+    events = tracer.chrome_trace()["traceEvents"]
+    metadata = [event for event in events if event["ph"] == "M"]
+    spans = [event for event in events if event["ph"] == "X"]
+    assert metadata[0]["name"] == "thread_name"
+    assert spans == [
+        {
+            "name": "proc",
+            "cat": "task",
+            "ph": "X",
+            "ts": 2.0,
+            "dur": 3.0,
+            "pid": metadata[0]["pid"],
+            "tid": metadata[0]["tid"],
+            "args": {"sequence": 7},
+        }
+    ]
+
+
+class FrameCounter(Producer[Frame[int]]):
+    def __init__(self) -> None:
+        super().__init__()
+        self.n = 0
+
+    def proc(self) -> Frame[int]:
+        time.sleep(0.01)
+        self.n += 1
+        return Frame(self.n, sequence=self.n)
+
+
+class Identity(Pipe[Frame[int], Frame[int]]):
+    def proc(self, frame: Frame[int]) -> Frame[int]:
+        return frame
+
+
+class Sink(Consumer[Frame[int]]):
+    def proc(self, frame: Frame[int]) -> None:
+        pass
+
+
+def test_application_writes_trace(tmp_path: Path) -> None:
+    app = actfw_core.Application()
+    path = tmp_path / "trace.json"
+    app.enable_tracing(str(path))
+
+    counter = FrameCounter()
+    app.register_task(counter)
+    identity = Identity()
+    app.register_task(identity)
+    sink = Sink()
+    app.register_task(sink)
+    counter.connect(identity)
+    identity.connect(sink)
+
+    th = threading.Thread(target=lambda: app.run())
+    th.start()
+    time.sleep(0.3)
+    app.stop()
+    th.join()
+    trace.disable_tracing()
+
+    with open(path) as f:
+        events = json.load(f)["traceEvents"]
+    names = {event["name"] for event in events if event["ph"] == "X"}
+    assert {"FrameCounter.proc", "Identity.proc", "Sink.proc", "inlet", "outlet"} <= names
+    thread_names = {event["args"]["name"] for event in events if event["ph"] == "M"}
+    assert {"FrameCounter", "Identity", "Sink"} <= thread_names
+    sequences = {event["args"]["sequence"] for event in events if event["name"] == "Identity.proc"}
+    assert len(sequences) > 0
+
+
+class IdentityBatch(BatchPipe[Frame[int], Frame[int]]):
+    def proc_batch(self, frames: List[Frame[int]]) -> List[Frame[int]]:
+        return frames
+
+
+def test_application_traces_every_outlet(tmp_path: Path) -> None:
+    app = actfw_core.Application()
+    path = tmp_path / "trace.json"
+    app.enable_tracing(str(path))
+
+    # counter -(least loaded)-> tee -> batch -> fused -> sink
+    counter = FrameCounter()
+    counter.set_dispatch_mode(DispatchMode.LEAST_LOADED)
+    app.register_task(counter)
+    tee: Tee[Frame[int]] = Tee()
+    app.register_task(tee)
+    batch = IdentityBatch(max_batch_size=2, max_wait=0.01)
+    app.register_task(batch)
+    fused = FusedPipe([Identity(), Identity()])
+    app.register_task(fused)
+    sink = Sink()
+    app.register_task(sink)
+    counter.connect(tee)
+    tee.connect(batch)
+    batch.connect(fused)
+    fused.connect(sink)
+
+    th = threading.Thread(target=lambda: app.run())
+    th.start()
+    time.sleep(0.3)
+    app.stop()
+    th.join()
+    trace.disable_tracing()
+
+    with open(path) as f:
+        events = json.load(f)["traceEvents"]
+    thread_names = {event["tid"]: event["args"]["name"] for event in events if event["ph"] == "M"}
+    spans = [event for event in events if event["ph"] == "X"]
+    outlets = {thread_names[event["tid"]] for event in spans if event["name"] == "outlet"}
+    assert {"FrameCounter", "Tee", "IdentityBatch", "FusedPipe"} <= outlets
+    names = {event["name"] for event in spans}
+    assert {"IdentityBatch.proc_batch", "Identity.proc"} <= names
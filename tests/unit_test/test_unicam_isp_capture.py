@@ -0,0 +1,158 @@
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, List
+
+import actfw_core
+import actfw_core.unicam_isp_capture
+import pytest
+from actfw_core.capture import Frame
+from actfw_core.supervisor import RestartPolicy
+from actfw_core.task import Consumer
+from actfw_core.unicam_isp_capture import UnicamIspCapture
+from actfw_core.v4l2.fake import FakeFormat, FakeV4L2Backend, FakeVideoDevice
+from actfw_core.v4l2.types import NUM_HISTOGRAM_BINS, bcm2835_isp_stats
+from actfw_core.v4l2.video import V4L2_BUF_TYPE, V4L2_CID, V4L2_META_FMT, V4L2_PIX_FMT  # type: ignore
+
+
+class Collector(Consumer[Frame[bytes]]):
+    def __init__(self) -> None:
+        super().__init__()
+        self.frames: List[Frame[bytes]] = []
+
+    def proc(self, frame: Frame[bytes]) -> None:
+        self.frames.append(frame)
+
+
+class FakeDMAHeap:
+    def __init__(self, node: str = "/dev/dma_heap/linux,cma") -> None:
+        pass
+
+    def alloc(self, name: str, size: int) -> int:
+        fd = os.memfd_create(name)
+        os.ftruncate(fd, size)
+        return fd
+
+    def close(self) -> None:
+        pass
+
+
+class IspStatistics:
+    """ISP statistics of the fake devices, which are empty while `broken` and then break the 3A control."""
+
+    def __init__(self) -> None:
+        self.broken = False
+
+    def __call__(self, sequence: int, size: int) -> bytes:
+        if self.broken:
+            return bytes(size)
+        rng = random.Random(sequence)
+        stats = bcm2835_isp_stats()
+        for i in range(NUM_HISTOGRAM_BINS):
+            stats.hist[0].g_hist[i] = rng.randrange(100) + 1000
+        for regions in [stats.awb_stats, stats.agc_stats]:
+            for region in regions:
+                region.counted = 1000
+                region.r_sum = region.g_sum = region.b_sum = 1000 * rng.randrange(500, 600)
+        return bytes(stats)
+
+
+def isp_devices(prefix: str, isp_stats: IspStatistics) -> Dict[str, FakeVideoDevice]:
+    # an imx219 streaming 640x480 through the ISP
+    raw = FakeFormat(V4L2_PIX_FMT.SBGGR10P, [(640, 480)], [100])
+    controls = {V4L2_CID.HBLANK: 3448, V4L2_CID.PIXEL_RATE: 182400000, V4L2_CID.HFLIP: 0, V4L2_CID.VFLIP: 0}
+    return {
+        f"{prefix}/unicam": FakeVideoDevice([raw]),
+        f"{prefix}/unicam-subdev": FakeVideoDevice([raw], controls=controls),
+        f"{prefix}/isp-in": FakeVideoDevice([raw], buf_type=V4L2_BUF_TYPE.VIDEO_OUTPUT),
+        f"{prefix}/isp-out-high": FakeVideoDevice([FakeFormat(V4L2_PIX_FMT.RGB24, [(64, 48)], [100])]),
+        f"{prefix}/isp-out-metadata": FakeVideoDevice(
+            [FakeFormat(V4L2_META_FMT.BCM2835_ISP_STATS, [(1, 1)], [100])],
+            frames=isp_stats,
+            buf_type=V4L2_BUF_TYPE.META_CAPTURE,
+        ),
+    }
+
+
+def fake_capture(prefix: str, devices: Dict[str, FakeVideoDevice]) -> UnicamIspCapture:
+    with FakeV4L2Backend(devices):
+        return UnicamIspCapture(
+            unicam=f"{prefix}/unicam",
+            unicam_subdev=f"{prefix}/unicam-subdev",
+            isp_in=f"{prefix}/isp-in",
+            isp_out_high=f"{prefix}/isp-out-high",
+            isp_out_metadata=f"{prefix}/isp-out-metadata",
+            size=(64, 48),
+            unicam_size=(640, 480),
+            crop_size=(0, 0, 640, 480),
+            framerate=100,
+            alsc=False,
+        )
+
+
+@pytest.fixture(autouse=True)
+def fake_imx219(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(UnicamIspCapture, "_UnicamIspCapture__get_sensor_name", lambda self, subdev: "imx219")
+    monkeypatch.setattr(actfw_core.unicam_isp_capture, "DMAHeap", FakeDMAHeap)
+
+
+def crash_and_restart(factory: Callable[[], UnicamIspCapture], isp_stats: IspStatistics) -> None:
+    # break the 3A control of the first capture and run the restarted one
+    app = actfw_core.Application()
+    capture = factory()
+    collector = Collector()
+    app.register_task(capture, restart=RestartPolicy(factory, backoff=0.01))
+    app.register_task(collector)
+    capture.connect(collector)
+    th = threading.Thread(target=lambda: app.run())
+    th.start()
+    deadline = time.monotonic() + 5
+    while len(collector.frames) < 5 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    frames = len(collector.frames)
+    isp_stats.broken = True
+    while app.tasks[0] is capture and time.monotonic() < deadline:
+        time.sleep(0.01)
+    while len(collector.frames) < frames + 5 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    app.stop()
+    th.join()
+
+    assert frames >= 5
+    assert app.tasks[0] is not capture
+    assert app.supervised[id(app.tasks[0])].restarts == 1
+    # the restarted capture produces frames again
+    assert len(collector.frames) >= frames + 5
+
+
+# crashes are also reported by the default excepthook
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_crashed_capture_is_restarted() -> None:
+    isp_stats = IspStatistics()
+    generations = []
+
+    def factory() -> UnicamIspCapture:
+        isp_stats.broken = False
+        prefix = f"/dev/fake{len(generations)}"
+        generations.append(prefix)
+        return fake_capture(prefix, isp_devices(prefix, isp_stats))
+
+    crash_and_restart(factory, isp_stats)
+    assert len(generations) == 2
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_restarted_capture_reopens_the_devices() -> None:
+    isp_stats = IspStatistics()
+    devices = isp_devices("/dev", isp_stats)
+
+    def factory() -> UnicamIspCapture:
+        isp_stats.broken = False
+        return fake_capture("/dev", devices)
+
+    fds = os.listdir("/proc/self/fd")
+    crash_and_restart(factory, isp_stats)
+    # both captures closed the devices, unmapped the buffers and closed the shared buffers
+    assert all(device.fds is None and device.mappings_left_at_close == 0 for device in devices.values())
+    assert len(os.listdir("/proc/self/fd")) == len(fds)
@@ -0,0 +1,84 @@
+import json
+import random
+from pathlib import Path
+from typing import Any, List, Tuple
+
+import actfw_core
+from actfw_core.isp_stats import IspStatsView
+from actfw_core.unicam_isp_capture import UnicamIspCapture
+from actfw_core.v4l2.types import NUM_HISTOGRAM_BINS, bcm2835_isp_stats
+
+
+class ControlRecorder:
+    def __init__(self) -> None:
+        self.writes: List[Any] = []
+
+    def stage_ext_controls(self, controls: List[Any]) -> None:
+        self.writes.append(controls)
+
+
+def contrast_only_capture() -> Any:
+    # set up only what the contrast control uses, without devices
+    config = json.loads((Path(actfw_core.__file__).parent / "data" / "imx219.json").read_text())["rpi.contrast"]
+    capture: Any = UnicamIspCapture.__new__(UnicamIspCapture)
+    capture.ce_enable = True
+    capture.brightness = 0.0
+    capture.contrast = 1.0
+    capture.lo_histogram = 0.01
+    capture.lo_level = 0.015
+    capture.lo_max = 500
+    capture.hi_histogram = 0.95
+    capture.hi_level = 0.95
+    capture.hi_max = 2000
+    capture.contrast_settings = None
+    gamma_curve = config["gamma_curve"]
+    capture.gamma_curve = [(gamma_curve[2 * n], gamma_curve[2 * n + 1]) for n in range(len(gamma_curve) // 2)]
+    capture.isp_in = ControlRecorder()
+    return capture
+
+
+def stats_with_histogram(histogram: List[int]) -> bcm2835_isp_stats:
+    stats = bcm2835_isp_stats()
+    for i, count in enumerate(histogram):
+        stats.hist[0].g_hist[i] = count
+    return stats
+
+
+def test_find_span() -> None:
+    capture = contrast_only_capture()
+    find_span = capture._UnicamIspCapture__find_span
+
+    def linear(gamma_curve: List[Tuple[float, float]], x: float) -> int:
+        for i in range(len(gamma_curve) - 1):
+            if gamma_curve[i][0] <= x < gamma_curve[i + 1][0]:
+                return i
+        return len(gamma_curve) - 2
+
+    gamma_curve = [(0.0, 0.0), (100.0, 10.0), (100.0, 20.0), (300.0, 30.0), (65535.0, 65535.0)]
+    for x in [-1.0, 0.0, 50.0, 100.0, 200.0, 300.0, 65535.0, 70000.0]:
+        assert find_span(gamma_curve, x) == linear(gamma_curve, x)
+
+
+def test_contrast_control_skips_unchanged_histogram() -> None:
+    capture = contrast_only_capture()
+    contrast_control = capture._UnicamIspCapture__contrast_control
+    rng = random.Random(0)
+    histogram = [rng.randrange(1000, 2000) for _ in range(NUM_HISTOGRAM_BINS)]
+
+    contrast_control(IspStatsView(stats_with_histogram(histogram)))
+    assert len(capture.isp_in.writes) == 1
+
+    # small noise does not move the quantiles beyond the hysteresis
+    noisy = [count + rng.randrange(-5, 5) for count in histogram]
+    contrast_control(IspStatsView(stats_with_histogram(noisy)))
+    assert len(capture.isp_in.writes) == 1
+
+    # a darker scene does
+    darker = histogram[NUM_HISTOGRAM_BINS // 4 :] + [0] * (NUM_HISTOGRAM_BINS // 4)
+    contrast_control(IspStatsView(stats_with_histogram(darker)))
+    assert len(capture.isp_in.writes) == 2
+
+    # so does a change of the brightness
+    capture.brightness = 1000.0
+    contrast_control(IspStatsView(stats_with_histogram(darker)))
+    assert len(capture.isp_in.writes) == 3
@@ -0,0 +1,94 @@
+import threading
+from ctypes import POINTER, c_void_p, cast, pointer, sizeof
+from typing import Any, Dict, List
+
+from actfw_core.v4l2.types import bcm2835_isp_gamma, v4l2_ext_control, v4l2_ext_controls
+from actfw_core.v4l2.video import V4L2_CID, RawVideo
+
+
+class RecordingRawVideo(RawVideo):  # type: ignore
+    def __init__(self) -> None:
+        super().__init__("/dev/null")
+        self.written: List[List[Any]] = []
+
+    def _ioctl(self, request: int, arg: Any) -> int:
+        ctrls = cast(arg, POINTER(v4l2_ext_controls)).contents
+        self.written.append([(ctrls.controls[i].id, ctrls.controls[i].value64) for i in range(ctrls.count)])
+        return 0
+
+
+def scalar(cid: int, value: int) -> v4l2_ext_control:
+    ctrl = v4l2_ext_control()
+    ctrl.id = cid
+    ctrl.value64 = value
+    return ctrl
+
+
+def test_staged_controls_are_flushed_at_once() -> None:
+    video = RecordingRawVideo()
+    video.stage_ext_controls([scalar(V4L2_CID.EXPOSURE, 100), scalar(V4L2_CID.ANALOGUE_GAIN, 10)])
+    video.stage_ext_controls([scalar(V4L2_CID.EXPOSURE, 120)])
+    assert video.flush_ext_controls()
+    assert video.written == [[(V4L2_CID.EXPOSURE, 120), (V4L2_CID.ANALOGUE_GAIN, 10)]]
+    assert not video.flush_ext_controls()
+    assert video.control_ioctls == 1
+    assert video.control_batches_merged == 1
+    assert video.controls_skipped == 0
+
+
+def test_unchanged_controls_are_not_written() -> None:
+    video = RecordingRawVideo()
+    video.stage_ext_controls([scalar(V4L2_CID.RED_BALANCE, 1500)], tolerance=2)
+    video.flush_ext_controls()
+    video.stage_ext_controls([scalar(V4L2_CID.RED_BALANCE, 1502)], tolerance=2)
+    assert not video.flush_ext_controls()
+    video.stage_ext_controls([scalar(V4L2_CID.RED_BALANCE, 1503)], tolerance=2)
+    assert video.flush_ext_controls()
+    assert video.written == [[(V4L2_CID.RED_BALANCE, 1500)], [(V4L2_CID.RED_BALANCE, 1503)]]
+    assert video.controls_skipped == 1
+
+
+def test_compound_control_payload_is_copied() -> None:
+    video = RecordingRawVideo()
+
+    def stage_gamma(y: int) -> None:
+        gm = bcm2835_isp_gamma()
+        gm.y[0] = y
+        ctrl = v4l2_ext_control()
+        ctrl.id = V4L2_CID.USER_BCM2835_ISP_GAMMA
+        ctrl.size = sizeof(bcm2835_isp_gamma)
+        ctrl.ptr = cast(pointer(gm), c_void_p)
+        video.stage_ext_controls([ctrl])
+
+    stage_gamma(1)
+    assert video.flush_ext_controls()
+    stage_gamma(1)
+    assert not video.flush_ext_controls()
+    stage_gamma(2)
+    assert video.flush_ext_controls()
+    assert len(video.written) == 2
+
+
+def test_controls_are_staged_and_flushed_from_threads() -> None:
+    video = RecordingRawVideo()
+    ids = [V4L2_CID.EXPOSURE, V4L2_CID.ANALOGUE_GAIN, V4L2_CID.RED_BALANCE, V4L2_CID.BLUE_BALANCE]
+
+    def stage(cid: int) -> None:
+        for value in range(1, 2001):
+            video.stage_ext_controls([scalar(cid, value)])
+            if value % 7 == 0:
+                video.flush_ext_controls()
+
+    threads = [threading.Thread(target=stage, args=(cid,)) for cid in ids]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    video.flush_ext_controls()
+
+    assert video.control_ioctls == len(video.written)
+    last: Dict[int, int] = {}
+    for written in video.written:
+        assert len({cid for (cid, _) in written}) == len(written)
+        last.update(dict(written))
+    assert last == {cid: 2000 for cid in ids}
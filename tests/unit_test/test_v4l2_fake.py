@@ -0,0 +1,138 @@
+import mmap
+import os
+import select
+import threading
+import time
+from typing import List
+
+import actfw_core
+from actfw_core.capture import Frame, V4LCameraCapture
+from actfw_core.task import Consumer
+from actfw_core.v4l2.fake import FakeFormat, FakeV4L2Backend, FakeVideoDevice, recorded_frames
+from actfw_core.v4l2.video import V4L2_BUF_TYPE, V4L2_MEMORY, V4L2_PIX_FMT, RawVideo, Video, get_backend  # type: ignore
+
+
+class Collector(Consumer[Frame[bytes]]):
+    def __init__(self) -> None:
+        super().__init__()
+        self.frames: List[Frame[bytes]] = []
+
+    def proc(self, frame: Frame[bytes]) -> None:
+        self.frames.append(frame)
+
+
+def test_fake_device_enumerates_formats() -> None:
+    device = FakeVideoDevice(
+        [FakeFormat(V4L2_PIX_FMT.YUYV, [(1280, 720)], [10]), FakeFormat(V4L2_PIX_FMT.RGB24, [(320, 240), (640, 480)], [15, 30])]
+    )
+    with FakeV4L2Backend({"/dev/video0": device}) as backend:
+        with Video("/dev/video0") as video:
+            assert video.backend is backend
+            configs = video.lookup_config(400, 300, 30, V4L2_PIX_FMT.RGB24, V4L2_PIX_FMT.RGB24)
+            assert [(c.width, c.height, c.interval.denominator) for c in configs] == [(640, 480, 30)]
+            assert video.set_format(configs[0], 640, 480, V4L2_PIX_FMT.RGB24) == (640, 480, V4L2_PIX_FMT.RGB24)
+            # the fake backend does not convert formats
+            assert video.lookup_config(640, 480, 10, V4L2_PIX_FMT.YUYV, V4L2_PIX_FMT.RGB24) == []
+    assert get_backend() is not backend
+
+
+def test_fake_device_streams_buffers() -> None:
+    frames = [b"first", b"second"]
+    device = FakeVideoDevice([FakeFormat(V4L2_PIX_FMT.MJPEG, [(64, 48)], [200])], frames=recorded_frames(frames))
+    with FakeV4L2Backend({"/dev/video0": device}):
+        video = RawVideo("/dev/video0")
+    try:
+        video.set_pix_format(64, 48, V4L2_PIX_FMT.MJPEG)
+        assert video.request_buffers(3, V4L2_MEMORY.MMAP) == 3
+        assert video.dequeue_buffer_nonblocking() is None
+        (fd, *_) = video.export_buffers()
+        video.queue_all_buffers()
+        video.start_streaming()
+        received = []
+        with select.epoll() as ep:
+            ep.register(video.device_fd, select.EPOLLIN)
+            while len(received) < 6:
+                assert len(ep.poll(1)) > 0
+                for buffer in video.dequeue_all_buffers_nonblocking():
+                    data = bytes(buffer.mapped_buf[: buffer.buf.bytesused])
+                    received.append((buffer.buf.sequence, buffer.timestamp(), data))
+                    if buffer.buf.index == 0:
+                        # exported buffers share the memory
+                        with mmap.mmap(fd, len(data)) as exported:
+                            assert exported[:] == data
+                    video.queue_buffer(buffer.buf.index)
+        video.stop_streaming()
+        os.close(fd)
+    finally:
+        video.close()
+    assert [data for (_, _, data) in received] == [frames[sequence % 2] for (sequence, _, _) in received]
+    assert [sequence for (sequence, _, _) in received] == sorted(sequence for (sequence, _, _) in received)
+    assert all(timestamp <= time.monotonic() for (_, timestamp, _) in received)
+
+
+def test_v4l_camera_capture_runs_on_fake_device() -> None:
+    device = FakeVideoDevice([FakeFormat(V4L2_PIX_FMT.RGB24, [(64, 48), (320, 240)], [30, 100])], jitter=0.002)
+    with FakeV4L2Backend({"/dev/video0": device}):
+        capture = V4LCameraCapture("/dev/video0", size=(64, 48), framerate=100)
+    assert capture.capture_size() == (64, 48)
+
+    app = actfw_core.Application()
+    collector = Collector()
+    app.register_task(capture)
+    app.register_task(collector)
+    capture.connect(collector)
+    th = threading.Thread(target=lambda: app.run())
+    th.start()
+    deadline = time.monotonic() + 5
+    while len(collector.frames) < 10 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    app.stop()
+    th.join()
+
+    assert len(collector.frames) >= 10
+    for frame in collector.frames:
+        assert frame.sequence is not None
+        assert frame.getvalue() == bytes([frame.sequence & 0xFF]) * (64 * 48 * 3)
+    sequences = [frame.sequence for frame in collector.frames]
+    assert sequences == sorted(sequences)
+    assert capture.capture_stats().captured >= 10
+
+
+def test_captured_frames_pass_their_timestamps_to_an_output_queue() -> None:
+    # unicam and the ISP input of UnicamIspCapture, sharing buffers
+    unicam_device = FakeVideoDevice([FakeFormat(V4L2_PIX_FMT.YUYV, [(64, 48)], [200])])
+    isp_device = FakeVideoDevice([FakeFormat(V4L2_PIX_FMT.YUYV, [(64, 48)], [200])], buf_type=V4L2_BUF_TYPE.VIDEO_OUTPUT)
+    with FakeV4L2Backend({"/dev/video0": unicam_device, "/dev/video13": isp_device}):
+        unicam = RawVideo("/dev/video0")
+        isp_in = RawVideo("/dev/video13", v4l2_buf_type=V4L2_BUF_TYPE.VIDEO_OUTPUT)
+    fds = []
+    try:
+        unicam.set_pix_format(64, 48, V4L2_PIX_FMT.YUYV)
+        isp_in.set_pix_format(64, 48, V4L2_PIX_FMT.YUYV)
+        n = unicam.request_buffers(4, V4L2_MEMORY.MMAP)
+        fds = unicam.export_buffers()
+        assert isp_in.request_buffers(n, V4L2_MEMORY.DMABUF, fds) == n
+        unicam.queue_all_buffers()
+        unicam.start_streaming()
+        isp_in.start_streaming()
+        captured = []
+        with select.epoll() as ep:
+            ep.register(unicam.device_fd, select.EPOLLIN)
+            while len(captured) < 8:
+                assert len(ep.poll(1)) > 0
+                for buffer in unicam.dequeue_all_buffers_nonblocking():
+                    timestamp = buffer.buf.timestamp.sec * 1000000 + buffer.buf.timestamp.usec
+                    captured.append((buffer.buf.index, timestamp, buffer.buf.sequence, buffer.buf.bytesused))
+                    isp_in.queue_buffer(buffer.buf.index, source=buffer)
+                for buffer in isp_in.dequeue_all_buffers_nonblocking(V4L2_MEMORY.DMABUF):
+                    unicam.queue_buffer(buffer.buf.index)
+        isp_in.stop_streaming()
+        unicam.stop_streaming()
+    finally:
+        for fd in fds:
+            os.close(fd)
+        isp_in.close()
+        unicam.close()
+    consumed = [(index, timestamp, sequence, bytesused) for (index, timestamp, sequence, _, bytesused) in isp_device.consumed]
+    assert consumed == captured
+    assert all(timestamp > 0 for (_, timestamp, _, _) in consumed)